@@ -0,0 +1,106 @@
+import base64
+import requests
+import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from Modules.catalog import DISPLAY_COLUMNS
+
+class SearchClient:
+    """
+    HTTP client for the FashionSense search API (api.py).
+
+    Mirrors the SearchService methods the Streamlit app uses, so the app
+    can run against a shared search tier instead of loading models itself.
+    """
+
+    def __init__(self, base_url: str, timeout: tuple = (5, 60), max_retries: int = 3):
+        """
+        Args:
+            base_url: Service URL, e.g. http://localhost:8000
+            timeout: (connect, read) timeouts in seconds
+            max_retries: Retries of idempotent requests on connection errors and 502/503/504
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        retry = Retry(total=max_retries, backoff_factor=0.3, status_forcelist=[502, 503, 504], allowed_methods=["GET"])
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=16, max_retries=retry))
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=16, max_retries=retry))
+
+    def _get(self, path: str, **params) -> dict:
+        response = self.session.get(self.base_url + path, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _post(self, path: str, payload: dict) -> dict:
+        response = self.session.post(self.base_url + path, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def health(self) -> dict:
+        return self._get("/health")
+
+    def trend_string(self) -> str:
+        return self._get("/trends")["trend_string"]
+
+    def filter_values(self, column: str) -> list:
+        return self._get(f"/filters/{column}")["values"]
+
+    def search(self, image=None, text: str = "", top_k: int = 5, filters: dict = None, image_weight: float = 0.5) -> list[str]:
+        """
+        Args:
+            image: Encoded image bytes (e.g. an upload), or None
+        """
+        payload = {
+            "text": text or "",
+            "image_base64": base64.b64encode(image).decode("ascii") if image else None,
+            "top_k": int(top_k),
+            "image_weight": image_weight,
+            "filters": {col: list(cond) if isinstance(cond, tuple) else cond for col, cond in (filters or {}).items()},
+        }
+        return self._post("/search", payload)["product_ids"]
+
+    def get_products(self, product_ids: list) -> pd.DataFrame:
+        products = self._post("/products", {"product_ids": list(product_ids)})["products"]
+        return pd.DataFrame(products, columns=DISPLAY_COLUMNS if not products else None)
+
+    def sample_product_ids(self, n: int) -> list[str]:
+        return self._get("/products/sample", n=int(n))["product_ids"]
+
+    def new_user_id(self) -> str:
+        return self._post("/users", {})["user_id"]
+
+    def set_history(self, user_id: str, product_ids: list):
+        self._post(f"/users/{user_id}/history", {"product_ids": list(product_ids), "replace": True})
+
+    def add_history(self, user_id: str, product_ids: list):
+        self._post(f"/users/{user_id}/history", {"product_ids": list(product_ids), "replace": False})
+
+    def get_history(self, user_id: str) -> list[str]:
+        return self._get(f"/users/{user_id}/history")["product_ids"]
+
+    def recommend(self, user_id: str, top_k: int = 5) -> list[str]:
+        return self._get(f"/users/{user_id}/recommendations", top_k=int(top_k))["product_ids"]
+
+    def stream_outfit(self, product_id: str, user_id: str, hf_token: str, number_of_suggestions: int = 5):
+        """
+        Yields:
+            str: Text chunks as the service streams them
+        """
+        payload = {"product_id": product_id, "user_id": user_id, "hf_token": hf_token, "number_of_suggestions": number_of_suggestions}
+        with self.session.post(self.base_url + "/outfit", json=payload, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            response.encoding = "utf-8"
+            for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                if chunk:
+                    yield chunk
+
+    def outfit_cache_stats(self) -> dict:
+        return self._get("/outfit/cache")
+
+
+# from Modules.api_client import SearchClient
+
+# client = SearchClient("http://localhost:8000")
+# top_ids = client.search(text="floral maxi dress", top_k=10)
+# cards = client.get_products(top_ids)
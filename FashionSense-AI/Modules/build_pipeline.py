@@ -0,0 +1,196 @@
+import os
+import pickle
+import argparse
+import faiss
+import numpy as np
+from Modules.dataloader import iter_catalog_chunks
+from Modules.preprocessing import prepare_text_for_embedding
+from Modules.embedding import (
+    generate_all_image_embeddings, generate_all_text_embeddings, combine_embeddings,
+    CLIP_MODEL_NAME, TEXT_MODEL_NAME
+)
+from Modules.embedding_cache import EmbeddingCache
+from Modules.models import cache_namespace
+from Modules.faiss_index import (
+    make_index, train_index, with_labels, base_index, build_modality_indexes, write_modality_indexes,
+    remove_modality_indexes, load_combined_vectors
+)
+from Modules.dedup import find_duplicates, collapse_duplicates
+from Modules.utils import NpyAppender, log
+
+def build_assets_streaming(
+    dress_path: str,
+    jeans_path: str,
+    image_base_dir: str,
+    save_dir: str = "Assets",
+    chunksize: int = 5000,
+    index_spec="flat",
+    min_train: int = 50_000,
+    image_cache: EmbeddingCache = None,
+    text_cache: EmbeddingCache = None,
+    modality_indexes: bool = False,
+    dedup_threshold: float = None,
+    drop_duplicates: bool = False
+) -> int:
+    """
+    Build the FAISS assets chunk by chunk.
+
+    Each CSV chunk is cleaned, embedded and combined, then its vectors are
+    appended to a temporary combined_vectors.npy on disk and added to the
+    index before the next chunk is read. The vectors, index and product IDs
+    replace those in `save_dir` together, only after the build succeeds.
+    Outside the index itself, peak memory is bounded by the chunk size; pick
+    a compressed index spec (e.g. "ivf_pq") to bound the index too. Indexes
+    that need training buffer vectors until `min_train` are available.
+
+    Args:
+        dress_path: Path to the dresses CSV file
+        jeans_path: Path to the jeans CSV file
+        image_base_dir: Directory containing {product_id}.jpg images
+        save_dir: Output directory for the index, product IDs and vectors
+        chunksize: CSV rows per chunk
+        index_spec: Index spec, see Modules.faiss_index.INDEX_SPECS
+        min_train: Vectors to collect before training IVF/PQ indexes
+        image_cache: Optional EmbeddingCache for image embeddings
+        text_cache: Optional EmbeddingCache for text embeddings
+        modality_indexes: Also build image-only and text-only indexes from
+            the written vectors, see Modules.faiss_index.build_modality_indexes
+        dedup_threshold: Cosine similarity above which products are clustered
+            as near-duplicates, see Modules.dedup (None skips the dedup stage)
+        drop_duplicates: Remove all but one product per duplicate cluster from the index
+
+    Returns:
+        int: Number of products written (before any duplicates are dropped)
+    """
+    os.makedirs(save_dir, exist_ok=True)
+    vectors_file = NpyAppender(os.path.join(save_dir, "combined_vectors.npy"))
+    product_ids = []
+    seen = set()
+    index = None
+    untrained = []  # vectors waiting for the index to be trained
+
+    # Per-chunk cache saves must not evict entries later chunks still need,
+    # so size caps are only enforced once the whole catalog has been seen
+    caches = [cache for cache in [image_cache, text_cache] if cache is not None]
+    size_caps = [cache.max_entries for cache in caches]
+    for cache in caches:
+        cache.max_entries = None
+
+    def add_to_index(block: np.ndarray, first_label: int):
+        index.add_with_ids(block, np.arange(first_label, first_label + len(block), dtype="int64"))
+
+    def train_and_flush():
+        # Recreate the index so IVF lists are sized from the vectors actually buffered
+        nonlocal index, untrained
+        training = np.concatenate([b for _, b in untrained])
+        base = make_index(training.shape[1], index_spec, n_train=len(training))
+        train_index(base, training)
+        index = with_labels(base)
+        for label, pending in untrained:
+            add_to_index(pending, label)
+        untrained = []
+
+    try:
+        for i, chunk in enumerate(iter_catalog_chunks(dress_path, jeans_path, chunksize)):
+            # Keep the first occurrence of products re-listed across chunks
+            chunk = chunk[~chunk["product_id"].isin(seen)].drop_duplicates("product_id")
+            if chunk.empty:
+                continue
+
+            text_inputs = prepare_text_for_embedding(chunk)
+            image_embeddings = generate_all_image_embeddings(chunk, image_base_dir, cache=image_cache)
+            text_embeddings = generate_all_text_embeddings(chunk, text_inputs, cache=text_cache)
+            combined = combine_embeddings(image_embeddings, text_embeddings, chunk["product_id"].tolist())
+            if not combined:
+                continue
+
+            ids = list(combined.keys())
+            block = np.stack([combined[pid] for pid in ids]).astype("float32")
+            first_label = len(product_ids)
+            vectors_file.append(block)
+            product_ids.extend(ids)
+            seen.update(ids)
+
+            if index is None:
+                index = with_labels(make_index(block.shape[1], index_spec, n_train=min_train))
+            if not base_index(index).is_trained:
+                untrained.append((first_label, block))
+                if sum(len(b) for _, b in untrained) >= min_train:
+                    train_and_flush()
+            else:
+                add_to_index(block, first_label)
+            log(f"Chunk {i}: indexed {len(product_ids)} products so far")
+
+        if untrained:
+            # Catalog smaller than min_train: train on everything that was read
+            train_and_flush()
+        if index is None:
+            raise ValueError("❌ No products could be embedded.")
+    except BaseException:
+        # Leave any assets already in save_dir untouched
+        vectors_file.discard()
+        raise
+    finally:
+        for cache, cap in zip(caches, size_caps):
+            cache.max_entries = cap
+            cache.save()
+
+    # Publish the vectors, index and IDs only once all three are complete, so a
+    # failed build never leaves vectors that disagree with the index
+    vectors_path = os.path.join(save_dir, "combined_vectors.npy")
+    index_path = os.path.join(save_dir, "faiss_index.index")
+    ids_path = os.path.join(save_dir, "product_ids.pkl")
+    staged = {vectors_path: vectors_file.finish(), index_path: index_path + ".tmp", ids_path: ids_path + ".tmp"}
+    faiss.write_index(index, staged[index_path])
+    with open(staged[ids_path], "wb") as f:
+        pickle.dump(product_ids, f)
+    # Sub-indexes from an earlier build are labeled for the old catalog
+    remove_modality_indexes(save_dir)
+    for path, tmp_path in staged.items():
+        os.replace(tmp_path, path)
+
+    if modality_indexes:
+        # Reads the vectors back from disk, so memory stays bounded by the indexes
+        vectors = load_combined_vectors(save_dir, mmap=True)
+        write_modality_indexes(build_modality_indexes(vectors, product_ids, index_spec), save_dir)
+        log("✅ Built image and text sub-indexes")
+
+    if dedup_threshold is not None:
+        canonical_ids = find_duplicates(save_dir, dedup_threshold)
+        if drop_duplicates:
+            collapse_duplicates(save_dir, canonical_ids)
+
+    log(f"✅ Streaming build finished: {len(product_ids)} products in {save_dir}")
+    return len(product_ids)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build FashionSense FAISS assets from CSVs in bounded memory.")
+    parser.add_argument("--dress", default=os.path.join("Data", "dresses_bd_processed_data.csv"))
+    parser.add_argument("--jeans", default=os.path.join("Data", "jeans_bd_processed_data.csv"))
+    parser.add_argument("--images", required=True, help="Directory containing {product_id}.jpg images")
+    parser.add_argument("--output", default="Assets")
+    parser.add_argument("--chunksize", type=int, default=5000)
+    parser.add_argument("--index", default="flat", help="flat, ivf_flat, hnsw or ivf_pq")
+    parser.add_argument("--cache-dir", help="Reuse embeddings from this EmbeddingCache directory")
+    parser.add_argument("--modality-indexes", action="store_true", help="Also build image-only and text-only indexes")
+    parser.add_argument("--dedup-threshold", type=float, help="Cluster near-duplicates above this cosine similarity")
+    parser.add_argument("--drop-duplicates", action="store_true", help="Keep one product per duplicate cluster in the index")
+    args = parser.parse_args()
+
+    image_cache = text_cache = None
+    if args.cache_dir:
+        # Separate caches per backend and precision (see cache_namespace)
+        image_cache = EmbeddingCache(args.cache_dir, cache_namespace(CLIP_MODEL_NAME))
+        text_cache = EmbeddingCache(args.cache_dir, cache_namespace(TEXT_MODEL_NAME))
+    build_assets_streaming(
+        args.dress, args.jeans, args.images, args.output,
+        chunksize=args.chunksize, index_spec=args.index,
+        image_cache=image_cache, text_cache=text_cache, modality_indexes=args.modality_indexes,
+        dedup_threshold=args.dedup_threshold, drop_duplicates=args.drop_duplicates
+    )
+
+if __name__ == "__main__":
+    main()
+
+
+# python -m Modules.build_pipeline --images Data/Images --chunksize 5000 --index ivf_pq --cache-dir Assets/embedding_cache --modality-indexes
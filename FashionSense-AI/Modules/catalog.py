@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+# Fields needed to render a product card
+DISPLAY_COLUMNS = ["product_id", "feature_image_s3", "product_name", "selling_price"]
+
+# Columns search results can be filtered on: numeric ranges and sets of values
+RANGE_FILTER_COLUMNS = ["selling_price", "mrp"]
+SET_FILTER_COLUMNS = ["brand", "category_id"]
+
+class Catalog:
+    """
+    Constant-time product lookups over the catalog DataFrame.
+
+    Built once at load time: maps product_id to row position and to FAISS
+    label (position in product_ids), and FAISS label to row position, so
+    rendering a page of results costs one dict lookup per product instead
+    of a scan of the product_id column.
+    """
+
+    def __init__(self, df: pd.DataFrame, product_ids: list = None):
+        """
+        Args:
+            df: Product metadata DataFrame
+            product_ids: Product IDs in FAISS label order (None for deleted slots)
+        """
+        self.df = df
+        pids = df["product_id"].tolist()
+        # Iterate in reverse so the first row wins for duplicated product_ids
+        self.row_of = dict(zip(reversed(pids), range(len(pids) - 1, -1, -1)))
+        self.label_rows = np.array(
+            [self.row_of.get(pid, -1) for pid in (product_ids or [])], dtype=np.int64
+        )
+        self.label_of = {pid: label for label, pid in enumerate(product_ids or []) if pid is not None}
+
+        # Filterable columns as arrays aligned with FAISS labels: prices as
+        # float32 (NaN when unknown), brand/category as integer codes (-1 when unknown)
+        missing = self.label_rows < 0
+        self.label_values = {}
+        for col in RANGE_FILTER_COLUMNS:
+            if col in df.columns:
+                values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float32, na_value=np.nan)
+                self.label_values[col] = np.where(missing, np.nan, values[self.label_rows]).astype(np.float32)
+        self.label_codes, self.categories = {}, {}
+        for col in SET_FILTER_COLUMNS:
+            if col in df.columns:
+                codes = pd.Categorical(df[col])
+                self.categories[col] = codes.categories
+                self.label_codes[col] = np.where(missing, -1, codes.codes[self.label_rows]).astype(np.int32)
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def __contains__(self, product_id) -> bool:
+        return product_id in self.row_of
+
+    def get_row(self, product_id) -> pd.Series:
+        """
+        Return the full metadata row of one product.
+
+        Raises:
+            KeyError: If the product is not in the catalog
+        """
+        return self.df.iloc[self.row_of[product_id]]
+
+    def get_rows(self, product_ids: list, columns: list = DISPLAY_COLUMNS) -> pd.DataFrame:
+        """
+        Return rows for many products in one vectorized take.
+
+        Args:
+            product_ids: Product IDs in the desired order; unknown IDs are skipped
+            columns: Columns to return (None for all)
+
+        Returns:
+            pd.DataFrame: One row per known product, in input order
+        """
+        positions = [self.row_of[pid] for pid in product_ids if pid in self.row_of]
+        rows = self.df.take(positions)
+        return rows if columns is None else rows[columns]
+
+    def filter_values(self, column: str) -> list:
+        """
+        Distinct values of a brand/category column, e.g. to fill a filter widget.
+        """
+        return self.categories[column].tolist()
+
+    def filter_mask(self, filters: dict) -> np.ndarray:
+        """
+        Evaluate metadata filters for every FAISS label at once.
+
+        Args:
+            filters (dict): {column: condition}. Price columns take a
+                (low, high) tuple, inclusive, with None for an open end;
+                brand and category_id take one value or a list of allowed values.
+
+        Returns:
+            np.ndarray: Boolean mask over labels; deleted and unknown products are False
+
+        Raises:
+            ValueError: If a column cannot be filtered on
+        """
+        mask = self.label_rows >= 0
+        for col, condition in filters.items():
+            if col in self.label_values:
+                low, high = condition
+                values = self.label_values[col]
+                if low is not None:
+                    mask &= values >= low
+                if high is not None:
+                    mask &= values <= high
+            elif col in self.label_codes:
+                allowed = [condition] if np.isscalar(condition) else list(condition)
+                codes = self.categories[col].get_indexer(allowed)
+                mask &= np.isin(self.label_codes[col], codes[codes >= 0])
+            else:
+                raise ValueError(f"Cannot filter on column {col!r}. Expected one of {RANGE_FILTER_COLUMNS + SET_FILTER_COLUMNS}")
+        return mask
+
+    def rows_for_labels(self, labels, columns: list = DISPLAY_COLUMNS) -> pd.DataFrame:
+        """
+        Return rows for FAISS search results without going through product IDs.
+
+        Args:
+            labels: FAISS labels; -1 and deleted or unknown slots are skipped
+
+        Returns:
+            pd.DataFrame: One row per valid label, in input order
+        """
+        labels = np.asarray(labels, dtype=np.int64)
+        labels = labels[(labels >= 0) & (labels < len(self.label_rows))]
+        positions = self.label_rows[labels]
+        rows = self.df.take(positions[positions >= 0])
+        return rows if columns is None else rows[columns]
+
+
+# from Modules.catalog import Catalog
+
+# catalog = Catalog(df, product_ids)
+# cards = catalog.get_rows(top_product_ids)            # product_id, image, name, price
+# row = catalog.get_row(top_product_ids[0])            # full metadata
+# mask = catalog.filter_mask({"selling_price": (None, 2000), "brand": ["Zara"]})
@@ -1,5 +1,18 @@
 import pandas as pd
 import os
+import ast
+import argparse
+from Modules.preprocessing import fill_missing_fields
+
+# Columns kept for search, display, profiles and outfit prompts
+CATALOG_COLUMNS = [
+    "product_id", "feature_image_s3", "product_name", "brand",
+    "description", "category_id", "style_attributes", "mrp",
+    "selling_price", "meta_info"
+]
+CATEGORICAL_COLUMNS = ["brand", "category_id"]
+TEXT_COLUMNS = ["product_id", "feature_image_s3", "product_name", "description", "style_attributes", "meta_info"]
+SNAPSHOT_PATH = os.path.join("Assets", "catalog.parquet")
 
 def load_csvs(dress_path: str, jeans_path: str) -> tuple[pd.DataFrame, pd.DataFrame]:
     """
@@ -41,36 +54,163 @@ def merge_datasets(dress: pd.DataFrame, jeans: pd.DataFrame) -> pd.DataFrame:
     """
     return pd.concat([dress, jeans], ignore_index=True)
 
+def parse_price(value):
+    """
+    Extract the INR (or else USD) amount from a stringified price dictionary.
+
+    Args:
+        value: e.g. "{'INR': 1299.0}"; already-numeric values pass through.
+
+    Returns:
+        Price as a number, or None if no known currency is present.
+    """
+    if not isinstance(value, str):
+        return value
+    prices = ast.literal_eval(value)
+    return prices.get("INR") or prices.get("USD")
+
 def clean_price_fields(df: pd.DataFrame) -> pd.DataFrame:
     """
     Extract numerical prices from stringified dictionaries.
 
+    Each distinct price string is parsed once and mapped back onto the column.
+
     Args:
         df: Input DataFrame with 'selling_price' and 'mrp' columns.
 
     Returns:
         Updated DataFrame with cleaned price columns.
     """
-    df["selling_price"] = df["selling_price"].apply(lambda x: eval(x).get("INR") or eval(x).get("USD"))
-    df["mrp"] = df["mrp"].apply(lambda x: eval(x).get("INR") or eval(x).get("USD"))
+    for col in ["selling_price", "mrp"]:
+        prices = {value: parse_price(value) for value in df[col].dropna().unique()}
+        df[col] = pd.to_numeric(df[col].map(prices), errors="coerce")
     return df
 
-def filter_columns(df: pd.DataFrame) -> pd.DataFrame:
+def filter_columns(df: pd.DataFrame, extra_columns: list = None) -> pd.DataFrame:
     """
     Select only the relevant columns for downstream processing.
 
     Args:
         df: Full product DataFrame.
+        extra_columns: Columns to keep besides CATALOG_COLUMNS (e.g. a listing date).
 
     Returns:
         Filtered DataFrame with selected columns.
     """
-    return df[[
-        "product_id", "feature_image_s3", "product_name", "brand",
-        "description", "category_id", "style_attributes", "mrp",
-        "selling_price", "meta_info"
-    ]]
+    return df[CATALOG_COLUMNS + [col for col in extra_columns or [] if col not in CATALOG_COLUMNS]]
+
+def iter_catalog_chunks(dress_path: str, jeans_path: str, chunksize: int = 5000):
+    """
+    Stream the dress and jeans CSVs as cleaned chunks.
+
+    Each chunk goes through the same cleaning as the in-memory pipeline, so
+    only `chunksize` raw rows are held at a time.
+
+    Args:
+        dress_path (str): Path to the dresses CSV file.
+        jeans_path (str): Path to the jeans CSV file.
+        chunksize (int): Rows per chunk.
+
+    Yields:
+        Cleaned DataFrame chunks with CATALOG_COLUMNS.
+    """
+    dress_header = pd.read_csv(dress_path, nrows=0)
+    jeans_header = pd.read_csv(jeans_path, nrows=0)
+    if not verify_column_match(dress_header, jeans_header):
+        raise ValueError("❌ Mismatch in column structure between dress and jeans datasets.")
+
+    for path in [dress_path, jeans_path]:
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            chunk = clean_price_fields(chunk)
+            chunk = filter_columns(chunk).copy()
+            yield fill_missing_fields(chunk)
+
+def optimize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Shrink the catalog in memory: categorical brand/category columns,
+    Arrow-backed strings for text and float32 prices.
+
+    Args:
+        df: Cleaned catalog DataFrame.
+
+    Returns:
+        DataFrame with compact dtypes.
+    """
+    df = df.copy()
+    for col in CATEGORICAL_COLUMNS:
+        df[col] = df[col].astype("category")
+    for col in TEXT_COLUMNS:
+        df[col] = df[col].astype("string[pyarrow]")
+    for col in ["selling_price", "mrp"]:
+        df[col] = df[col].astype("float32")
+    return df
+
+def build_catalog_snapshot(dress_path: str, jeans_path: str, snapshot_path: str = SNAPSHOT_PATH, date_column: str = None) -> pd.DataFrame:
+    """
+    Offline ETL: clean the raw CSVs once and write a columnar Parquet snapshot.
+
+    Args:
+        dress_path (str): Path to the dresses CSV file.
+        jeans_path (str): Path to the jeans CSV file.
+        snapshot_path (str): Output Parquet file.
+        date_column (str): Listing-date column to keep as well, for trend
+            time windows (see Modules.trends).
+
+    Returns:
+        The cleaned catalog DataFrame.
+    """
+    dress, jeans = load_csvs(dress_path, jeans_path)
+    if not verify_column_match(dress, jeans):
+        raise ValueError("❌ Mismatch in column structure between dress and jeans datasets.")
+
+    df = merge_datasets(dress, jeans)
+    if date_column and date_column not in df.columns:
+        raise ValueError(f"❌ Date column '{date_column}' not found in the catalog CSVs.")
+    df = clean_price_fields(df)
+    df = filter_columns(df, [date_column] if date_column else None)
+    df = fill_missing_fields(df)
+    df = optimize_dtypes(df)
+
+    os.makedirs(os.path.dirname(snapshot_path) or ".", exist_ok=True)
+    df.to_parquet(snapshot_path + ".tmp", index=False)
+    os.replace(snapshot_path + ".tmp", snapshot_path)
+    print(f"✅ Wrote catalog snapshot with {len(df)} products to {snapshot_path}")
+    return df
+
+def load_catalog_snapshot(snapshot_path: str = SNAPSHOT_PATH, columns: list = None) -> pd.DataFrame:
+    """
+    Load the preprocessed catalog snapshot, reading only the requested columns.
+
+    Args:
+        snapshot_path (str): Parquet file written by build_catalog_snapshot.
+        columns (list): Columns to load (None for all).
+
+    Returns:
+        Catalog DataFrame with the dtypes set at build time.
+    """
+    df = pd.read_parquet(snapshot_path, columns=columns)
+    # Parquet only round-trips string categoricals; restore the rest
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the preprocessed FashionSense catalog snapshot.")
+    parser.add_argument("--dress", default=os.path.join("Data", "dresses_bd_processed_data.csv"))
+    parser.add_argument("--jeans", default=os.path.join("Data", "jeans_bd_processed_data.csv"))
+    parser.add_argument("--output", default=SNAPSHOT_PATH)
+    parser.add_argument("--date-column", help="Listing-date column to keep for trend time windows")
+    args = parser.parse_args()
+    build_catalog_snapshot(args.dress, args.jeans, args.output, args.date_column)
+
+if __name__ == "__main__":
+    main()
+
 
+# python -m Modules.dataloader --dress Data/dresses_bd_processed_data.csv --jeans Data/jeans_bd_processed_data.csv
+# python -m Modules.dataloader --date-column listing_date   # keep listing dates for trend windows
 
 # from modules.dataloader import load_csvs, verify_column_match, merge_datasets, clean_price_fields, filter_columns
 
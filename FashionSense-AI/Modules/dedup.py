@@ -0,0 +1,150 @@
+import os
+import pickle
+import argparse
+import numpy as np
+from Modules.faiss_index import load_faiss_assets, remove_from_faiss_assets
+from Modules.utils import log
+
+CANONICAL_IDS_FILE = "canonical_ids.pkl"
+
+def find_duplicate_pairs(index, vectors: np.ndarray, product_ids: list, threshold: float = 0.97, batch_size: int = 4096) -> np.ndarray:
+    """
+    Find pairs of products whose combined vectors are near-identical.
+
+    Runs one FAISS range search per batch of stored vectors, so memory is
+    bounded by the batch size plus the pairs found. Candidates from
+    approximate indexes are re-checked against the exact vectors.
+
+    Args:
+        index: FAISS index over the combined vectors
+        vectors: Combined vectors in label order (may be memory-mapped)
+        product_ids: Product IDs in label order (None for deleted slots)
+        threshold: Minimum cosine similarity of a duplicate pair
+        batch_size: Query vectors per range search
+
+    Returns:
+        np.ndarray: Label pairs of shape [n_pairs, 2], smaller label first
+    """
+    # Combined vectors have squared norm 2, so cosine >= t means squared L2 <= 4 * (1 - t)
+    radius = 4.0 * (1.0 - threshold)
+    live = np.array([pid is not None for pid in product_ids])
+    pairs = []
+    for start in range(0, len(product_ids), batch_size):
+        batch = np.ascontiguousarray(vectors[start:start + batch_size], dtype=np.float32)
+        lims, _, hits = index.range_search(batch, radius)
+        queries = start + np.repeat(np.arange(len(batch)), np.diff(lims).astype(np.int64))
+        keep = (hits != queries) & (hits >= 0) & live[queries] & live[np.maximum(hits, 0)]
+        if not keep.any():
+            continue
+        queries, hits = queries[keep], hits[keep]
+        cosines = np.einsum("ij,ij->i", batch[queries - start], np.asarray(vectors[hits], dtype=np.float32)) / 2.0
+        close = cosines >= threshold
+        pairs.append(np.sort(np.stack([queries[close], hits[close]], axis=1), axis=1))
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64)
+    # Approximate indexes may find a pair from one side only, so collect both and dedupe
+    return np.unique(np.concatenate(pairs), axis=0)
+
+def cluster_duplicates(pairs: np.ndarray, n_labels: int) -> np.ndarray:
+    """
+    Group duplicate pairs into clusters with union-find.
+
+    Args:
+        pairs: Label pairs from find_duplicate_pairs
+        n_labels: Number of labels in the index
+
+    Returns:
+        np.ndarray: Canonical label of each label; the smallest label (first
+        listing) of a cluster represents it, singletons map to themselves
+    """
+    parent = np.arange(n_labels)
+
+    def find(label: int) -> int:
+        root = label
+        while parent[root] != root:
+            root = parent[root]
+        while parent[label] != root:
+            parent[label], label = root, parent[label]
+        return root
+
+    for a, b in pairs:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+    return np.array([find(label) for label in range(n_labels)])
+
+def find_duplicates(load_dir: str = "Assets", threshold: float = 0.97, batch_size: int = 4096) -> dict:
+    """
+    Detect near-duplicate products in the saved FAISS assets and write the
+    canonical-id map next to them.
+
+    Returns:
+        dict: {duplicate product_id: canonical product_id}, only for products
+        that are not their own canonical
+    """
+    index, product_ids, vectors = load_faiss_assets(load_dir, mmap=True)
+    pairs = find_duplicate_pairs(index, vectors, product_ids, threshold, batch_size)
+    canonical = cluster_duplicates(pairs, len(product_ids))
+    canonical_ids = {
+        product_ids[label]: product_ids[root]
+        for label, root in enumerate(canonical) if root != label
+    }
+
+    path = os.path.join(load_dir, CANONICAL_IDS_FILE)
+    with open(path + ".tmp", "wb") as f:
+        pickle.dump(canonical_ids, f)
+    os.replace(path + ".tmp", path)
+    n_clusters = len(set(canonical_ids.values()))
+    log(f"✅ Found {len(canonical_ids)} near-duplicates of {n_clusters} products (cosine >= {threshold})")
+    return canonical_ids
+
+def load_canonical_ids(load_dir: str = "Assets") -> dict:
+    """
+    Load the {duplicate product_id: canonical product_id} map, or {} if none was written.
+    """
+    path = os.path.join(load_dir, CANONICAL_IDS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+def collapse_duplicates(load_dir: str = "Assets", canonical_ids: dict = None, batch_size: int = 65536):
+    """
+    Remove duplicates from the serving index, keeping one product per cluster.
+
+    The combined vectors are rewritten from a memory map in batches (see
+    remove_from_faiss_assets), so only the indexes are held in memory.
+
+    Args:
+        load_dir: Directory holding the FAISS assets
+        canonical_ids: Map from find_duplicates (loaded from load_dir if omitted)
+        batch_size: Vector rows rewritten at a time
+    """
+    canonical_ids = load_canonical_ids(load_dir) if canonical_ids is None else canonical_ids
+    if canonical_ids:
+        remove_from_faiss_assets(list(canonical_ids), load_dir=load_dir, batch_size=batch_size)
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster near-duplicate products in the FashionSense index.")
+    parser.add_argument("--assets", default="Assets")
+    parser.add_argument("--threshold", type=float, default=0.97, help="Minimum cosine similarity of duplicates")
+    parser.add_argument("--batch-size", type=int, default=4096)
+    parser.add_argument(
+        "--collapse", action="store_true",
+        help="Also remove duplicates from the index (streams the vectors; the index itself is loaded into memory)"
+    )
+    args = parser.parse_args()
+
+    canonical_ids = find_duplicates(args.assets, args.threshold, args.batch_size)
+    if args.collapse:
+        collapse_duplicates(args.assets, canonical_ids)
+
+if __name__ == "__main__":
+    main()
+
+
+# python -m Modules.dedup --assets Assets --threshold 0.97 --collapse
+
+# from Modules.dedup import load_canonical_ids
+# canonical_ids = load_canonical_ids()
+# history_ids = [canonical_ids.get(pid, pid) for pid in history_ids]
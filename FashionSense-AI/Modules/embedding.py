@@ -1,22 +1,32 @@
+import io
 import os
-import torch
+import time
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 from tqdm import tqdm
-# from transformers import CLIPModel, CLIPProcessor
-from sentence_transformers import SentenceTransformer
-from transformers import AutoProcessor, AutoModelForZeroShotImageClassification
+from Modules.embedding_cache import hash_file, hash_text
+from Modules.models import (
+    CLIP_MODEL_NAME, TEXT_MODEL_NAME, BACKEND,
+    get_clip, get_clip_processor, get_text_model, get_onnx_image_encoder, get_device, cache_namespace
+)
 
-# Load models once globally
-device = "cuda" if torch.cuda.is_available() else "cpu"
+# Models are loaded on first use by Modules.models (torch is imported there
+# too), so importing this module is cheap. Call Modules.models.warmup() to
+# load them ahead of the first query. FASHIONSENSE_BACKEND=onnx switches
+# encoding to the quantized ONNX Runtime models.
 
-clip_processor = AutoProcessor.from_pretrained("openai/clip-vit-base-patch32", use_fast=False)
-clip_model = AutoModelForZeroShotImageClassification.from_pretrained("openai/clip-vit-base-patch32").to(device).eval()
-
-# clip_model = CLIPModel.from_pretrained("openai/clip-vit-large-patch14").to(device).eval()
-# clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-large-patch14", use_fast=True)
-
-text_model = SentenceTransformer("all-MiniLM-L6-v2")
+def __getattr__(name: str):
+    # Backwards compatible module attributes: `from Modules.embedding import clip_model` still works
+    if name == "clip_processor":
+        return get_clip()[0]
+    if name == "clip_model":
+        return get_clip()[1]
+    if name == "text_model":
+        return get_text_model()
+    if name == "device":
+        return get_device()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def get_image_embedding(image_path: str) -> np.ndarray:
     """
@@ -25,9 +35,11 @@ def get_image_embedding(image_path: str) -> np.ndarray:
     Returns:
         np.ndarray: L2-normalized image embedding (768D)
     """
+    import torch
     try:
+        clip_processor, clip_model = get_clip()
         image = Image.open(image_path).convert("RGB")
-        inputs = clip_processor(images=image, return_tensors="pt").to(device)
+        inputs = clip_processor(images=image, return_tensors="pt").to(get_device())
         with torch.no_grad():
             features = clip_model.get_image_features(**inputs)
             return torch.nn.functional.normalize(features, p=2, dim=-1).cpu().numpy()[0]
@@ -43,50 +55,216 @@ def get_text_embedding(text: str) -> np.ndarray:
         np.ndarray: Text embedding (384D)
     """
     try:
-        return text_model.encode(text, show_progress_bar=False)
+        return get_text_model().encode(text, show_progress_bar=False)
     except Exception as e:
         print(f"❌ Text error: {text[:60]}... — {e}")
         return None
 
-def generate_all_image_embeddings(df, image_base_dir: str) -> dict:
+def open_image(image) -> Image.Image:
+    """
+    Open an image given as a file path, raw encoded bytes or a PIL image.
+
+    Returns:
+        PIL.Image.Image: RGB image
+    """
+    if isinstance(image, Image.Image):
+        return image.convert("RGB")
+    if isinstance(image, (bytes, bytearray)):
+        image = io.BytesIO(image)
+    return Image.open(image).convert("RGB")
+
+def load_image_pixels(image_path) -> np.ndarray:
+    """
+    Decode, resize and normalize a single image into CLIP pixel values.
+
+    Safe to call from worker threads; PIL releases the GIL while decoding.
+
+    Args:
+        image_path: File path, raw encoded bytes or PIL image
+
+    Returns:
+        np.ndarray: Pixel values (3, 224, 224), or None if the image failed to load
+    """
+    try:
+        image = open_image(image_path)
+        return get_clip_processor()(images=image, return_tensors="np")["pixel_values"][0]
+    except Exception as e:
+        label = f"<{len(image_path)} bytes>" if isinstance(image_path, (bytes, bytearray)) else image_path
+        print(f"❌ Image error: {label} — {e}")
+        return None
+
+def embed_pixel_batch(pixel_values: np.ndarray) -> np.ndarray:
+    """
+    Run one batched CLIP forward pass over preprocessed pixel values.
+
+    Args:
+        pixel_values: Array of shape (batch, 3, 224, 224)
+
+    Returns:
+        np.ndarray: L2-normalized image embeddings, one row per input
+    """
+    if BACKEND == "onnx":
+        return get_onnx_image_encoder().embed(pixel_values)
+
+    import torch
+    _, clip_model = get_clip()
+    with torch.inference_mode():
+        features = clip_model.get_image_features(pixel_values=torch.from_numpy(pixel_values).to(get_device()))
+        return torch.nn.functional.normalize(features, p=2, dim=-1).cpu().numpy()
+
+def embed_image_paths(pids: list, paths: list[str], batch_size: int = 64, num_workers: int = 4) -> dict:
+    """
+    Embed images from disk in batches, decoding in a pool of worker threads.
+
+    Images are decoded and resized while the previous batch runs through
+    CLIP. Images that fail to load are skipped without affecting the rest
+    of their batch.
+
+    Args:
+        pids: Product IDs aligned with paths
+        paths: Image file paths
+        batch_size: Number of images per CLIP forward pass
+        num_workers: Number of threads used for decoding and resizing
+
+    Returns:
+        dict: {product_id: embedding}
+    """
+    starts = range(0, len(pids), batch_size)
+
+    image_embeddings = {}
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        def submit(b):
+            return [pool.submit(load_image_pixels, path) for path in paths[b:b + batch_size]]
+
+        # Keep one batch decoding in the background while the model runs
+        pending = submit(starts[0]) if len(starts) else []
+        progress = tqdm(total=len(pids), desc="Image Embeddings", unit="img")
+        for i, b in enumerate(starts):
+            futures = pending
+            pending = submit(starts[i + 1]) if i + 1 < len(starts) else []
+
+            loaded = [(pid, f.result()) for pid, f in zip(pids[b:b + batch_size], futures)]
+            loaded = [(pid, pixels) for pid, pixels in loaded if pixels is not None]
+            if loaded:
+                embeddings = embed_pixel_batch(np.stack([pixels for _, pixels in loaded]))
+                for (pid, _), emb in zip(loaded, embeddings):
+                    image_embeddings[pid] = emb
+            progress.update(len(futures))
+        progress.close()
+
+    elapsed = time.perf_counter() - start_time
+    rate = len(image_embeddings) / elapsed if elapsed > 0 else 0.0
+    print(f"✅ Embedded {len(image_embeddings)}/{len(pids)} images in {elapsed:.1f}s ({rate:.1f} images/sec)")
+    return image_embeddings
+
+def _check_cache(cache, model_name: str):
+    # Vectors cached by another backend or precision must not mix with this encoder's
+    expected = cache_namespace(model_name)
+    if cache.model_name != expected:
+        raise ValueError(f"❌ Embedding cache '{cache.model_name}' does not match the active encoder '{expected}'")
+
+def generate_all_image_embeddings(df, image_base_dir: str, batch_size: int = 64, num_workers: int = 4, cache=None) -> dict:
     """
     Generate image embeddings for all product_ids.
 
+    Args:
+        df: DataFrame with product_id column
+        image_base_dir: Directory containing {product_id}.jpg images
+        batch_size: Number of images per CLIP forward pass
+        num_workers: Number of threads used for hashing, decoding and resizing
+        cache: Optional EmbeddingCache keyed by image bytes, named with
+            cache_namespace(CLIP_MODEL_NAME); only misses are embedded
+
     Returns:
         dict: {product_id: embedding}
     """
+    pids = df["product_id"].tolist()
+    paths = [os.path.join(image_base_dir, f"{pid}.jpg") for pid in pids]
+    if cache is None:
+        return embed_image_paths(pids, paths, batch_size, num_workers)
+    _check_cache(cache, CLIP_MODEL_NAME)
+
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        keys = list(pool.map(hash_file, paths))
+    cached = cache.get_many(keys)
+    misses = [i for i, emb in enumerate(cached) if emb is None]
+    print(f"♻️ Reusing {len(pids) - len(misses)} cached image embeddings, computing {len(misses)}")
+
+    computed = embed_image_paths([pids[i] for i in misses], [paths[i] for i in misses], batch_size, num_workers)
+    cache.put([keys[i] for i in misses if pids[i] in computed], [computed[pids[i]] for i in misses if pids[i] in computed])
+    cache.save()
+
     image_embeddings = {}
-    for _, row in tqdm(df.iterrows(), total=len(df), desc="Image Embeddings"):
-        pid = row["product_id"]
-        image_path = os.path.join(image_base_dir, f"{pid}.jpg")
-        emb = get_image_embedding(image_path)
+    for pid, emb in zip(pids, cached):
+        emb = computed.get(pid) if emb is None else emb
         if emb is not None:
             image_embeddings[pid] = emb
     return image_embeddings
 
-def generate_all_text_embeddings(df, text_inputs: list[str]) -> dict:
+def encode_texts(texts: list[str], batch_size: int = 256) -> np.ndarray:
+    """
+    Encode many texts in large, length-bucketed batches.
+
+    Texts are sorted by length so each batch holds strings of similar size
+    and carries little padding. Embeddings are returned in the input order.
+
+    Args:
+        texts: List of input strings
+        batch_size: Number of texts per encoder call
+
+    Returns:
+        np.ndarray: Text embeddings of shape (len(texts), 384)
+    """
+    text_model = get_text_model()
+    order = np.argsort([len(t) for t in texts], kind="stable")
+    embeddings = np.zeros((len(texts), text_model.get_sentence_embedding_dimension()), dtype=np.float32)
+    for b in tqdm(range(0, len(order), batch_size), desc="Text Embeddings"):
+        bucket = order[b:b + batch_size]
+        embeddings[bucket] = text_model.encode(
+            [texts[i] for i in bucket], batch_size=len(bucket), show_progress_bar=False
+        )
+    return embeddings
+
+def generate_all_text_embeddings(df, text_inputs: list[str], batch_size: int = 256, cache=None) -> dict:
     """
     Generate text embeddings for all rows in df.
 
     Args:
         df: DataFrame with product_id column
         text_inputs: List of combined text fields
+        batch_size: Number of texts per encoder call
+        cache: Optional EmbeddingCache keyed by input text, named with
+            cache_namespace(TEXT_MODEL_NAME); only misses are encoded
 
     Returns:
         dict: {product_id: embedding}
     """
-    text_embeddings = {}
-    for i, (_, row) in enumerate(tqdm(df.iterrows(), total=len(df), desc="Text Embeddings")):
-        pid = row["product_id"]
-        emb = get_text_embedding(text_inputs[i])
-        if emb is not None:
-            text_embeddings[pid] = emb
-    return text_embeddings
+    pids = df["product_id"].tolist()
+    if cache is None:
+        return dict(zip(pids, encode_texts(text_inputs, batch_size=batch_size)))
+    _check_cache(cache, TEXT_MODEL_NAME)
+
+    keys = [hash_text(text) for text in text_inputs]
+    embeddings = cache.get_many(keys)
+    misses = [i for i, emb in enumerate(embeddings) if emb is None]
+    print(f"♻️ Reusing {len(pids) - len(misses)} cached text embeddings, computing {len(misses)}")
+
+    if misses:
+        computed = encode_texts([text_inputs[i] for i in misses], batch_size=batch_size)
+        for i, emb in zip(misses, computed):
+            embeddings[i] = emb
+        cache.put([keys[i] for i in misses], computed)
+    cache.save()
+    return dict(zip(pids, embeddings))
 
 def combine_embeddings(image_embeddings: dict, text_embeddings: dict, product_ids: list) -> dict:
     """
     Combine image and text embeddings into one vector.
 
+    Products missing either modality (e.g. an image that failed to load)
+    are left out.
+
     Returns:
         dict: {product_id: [image + text] embedding}
     """
@@ -107,4 +285,12 @@ def combine_embeddings(image_embeddings: dict, text_embeddings: dict, product_id
 # image_embeddings = generate_all_image_embeddings(df, "/kaggle/input/dataset-ecomerce/Images/Images")
 # text_embeddings = generate_all_text_embeddings(df, text_inputs)
 
+# # Incremental rebuild: only new or changed images/texts are embedded
+# from Modules.embedding_cache import EmbeddingCache
+# from Modules.models import cache_namespace
+# image_cache = EmbeddingCache("Assets/embedding_cache", cache_namespace(CLIP_MODEL_NAME), max_entries=200_000)
+# text_cache = EmbeddingCache("Assets/embedding_cache", cache_namespace(TEXT_MODEL_NAME), max_entries=200_000)
+# image_embeddings = generate_all_image_embeddings(df, "/kaggle/input/dataset-ecomerce/Images/Images", cache=image_cache)
+# text_embeddings = generate_all_text_embeddings(df, text_inputs, cache=text_cache)
+
 # combined_embeddings = combine_embeddings(image_embeddings, text_embeddings, df["product_id"].tolist())
\ No newline at end of file
@@ -0,0 +1,181 @@
+import os
+import re
+import pickle
+import hashlib
+import numpy as np
+
+def hash_bytes(data: bytes) -> str:
+    """
+    Content hash used as a cache key for raw bytes (e.g. image files).
+    """
+    return hashlib.sha1(data).hexdigest()
+
+def hash_text(text: str) -> str:
+    """
+    Content hash used as a cache key for input text.
+    """
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def hash_file(path: str) -> str:
+    """
+    Hash the bytes of a file on disk.
+
+    Returns:
+        str: Content hash, or None if the file cannot be read
+    """
+    try:
+        with open(path, "rb") as f:
+            return hash_bytes(f.read())
+    except OSError:
+        return None
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed embedding store for one model.
+
+    Vectors live in a raw float32 file that is memory-mapped on read, and a
+    small pickled index maps content hashes to rows. Entries are stored
+    under a per-model directory, so the effective key is model name + hash;
+    name the cache with Modules.models.cache_namespace so vectors from
+    different backends or precisions get separate directories.
+
+    Every key looked up or stored since the cache was opened is treated as
+    referenced by the current catalog. When the cache grows past
+    `max_entries`, `prune()` evicts the oldest unreferenced entries and
+    compacts the vector file.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str, max_entries: int = None):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.dir = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+        self.index_path = os.path.join(self.dir, "keys.pkl")
+        self.vectors_path = os.path.join(self.dir, "vectors.f32")
+        os.makedirs(self.dir, exist_ok=True)
+
+        self.dim = None
+        self.keys = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as f:
+                meta = pickle.load(f)
+            self.dim = meta["dim"]
+            self.keys = meta["keys"]
+
+        # Drop rows appended after the last save (e.g. an interrupted build)
+        if os.path.exists(self.vectors_path):
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(len(self.keys) * (self.dim or 0) * 4)
+
+        self.touched = set()
+        self._vectors = None
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _mmap(self) -> np.ndarray:
+        if self._vectors is None and self.keys:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(self.keys), self.dim))
+        return self._vectors
+
+    def get_many(self, keys: list) -> list:
+        """
+        Look up embeddings for a list of content keys.
+
+        Args:
+            keys: Content hashes; None entries are treated as misses
+
+        Returns:
+            list: One np.ndarray per key, or None where the key is not cached
+        """
+        self.touched.update(k for k in keys if k is not None)
+        positions = [i for i, k in enumerate(keys) if k in self.keys]
+        results = [None] * len(keys)
+        if positions:
+            rows = self._mmap()[[self.keys[keys[i]] for i in positions]]
+            for i, vec in zip(positions, rows):
+                results[i] = vec
+        return results
+
+    def put(self, keys: list, vectors) -> None:
+        """
+        Append new embeddings to the cache. Keys already present are ignored.
+
+        Args:
+            keys: Content hashes
+            vectors: Sequence or array of embeddings aligned with keys
+        """
+        new = {}
+        for key, vec in zip(keys, vectors):
+            if key is not None and key not in self.keys and key not in new:
+                new[key] = vec
+        self.touched.update(new)
+        if not new:
+            return
+
+        block = np.stack(list(new.values())).astype(np.float32)
+        if self.dim is None:
+            self.dim = block.shape[1]
+        elif block.shape[1] != self.dim:
+            raise ValueError(f"Embedding dim {block.shape[1]} does not match cache dim {self.dim}")
+
+        with open(self.vectors_path, "ab") as f:
+            f.write(block.tobytes())
+        for key in new:
+            self.keys[key] = len(self.keys)
+        self._vectors = None
+
+    def prune(self, live_keys=None) -> int:
+        """
+        Enforce `max_entries` by evicting entries not referenced by the catalog.
+
+        Args:
+            live_keys: Keys referenced by the current catalog (defaults to every
+                key looked up or stored since the cache was opened)
+
+        Returns:
+            int: Number of evicted entries
+        """
+        if self.max_entries is None or len(self.keys) <= self.max_entries:
+            return 0
+        live = self.touched if live_keys is None else set(live_keys)
+
+        # Keys are stored in insertion order, so the oldest candidates go first
+        excess = len(self.keys) - self.max_entries
+        evicted = set([k for k in self.keys if k not in live][:excess])
+        if not evicted:
+            return 0
+
+        kept = [k for k in self.keys if k not in evicted]
+        vectors = self._mmap()
+        tmp_path = self.vectors_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            rows = np.fromiter((self.keys[k] for k in kept), dtype=np.int64, count=len(kept))
+            for b in range(0, len(rows), 65536):
+                f.write(np.ascontiguousarray(vectors[rows[b:b + 65536]]).tobytes())
+        self._vectors = None
+        os.replace(tmp_path, self.vectors_path)
+        self.keys = {k: i for i, k in enumerate(kept)}
+        self._write_index()
+        print(f"🧹 Evicted {len(evicted)} stale entries from {self.model_name} embedding cache")
+        return len(evicted)
+
+    def save(self) -> None:
+        """
+        Persist the key index, pruning first if the cache is over its size cap.
+        """
+        self.prune()
+        self._write_index()
+
+    def _write_index(self) -> None:
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"model_name": self.model_name, "dim": self.dim, "keys": self.keys}, f)
+        os.replace(tmp_path, self.index_path)
+
+
+# from Modules.embedding_cache import EmbeddingCache
+
+# cache = EmbeddingCache("Assets/embedding_cache", cache_namespace(CLIP_MODEL_NAME), max_entries=200_000)
+# vectors = cache.get_many(keys)        # None for misses
+# cache.put(miss_keys, miss_vectors)
+# cache.save()
@@ -2,26 +2,195 @@ import faiss
 import numpy as np
 import os
 import pickle
+from Modules.utils import NpyAppender
 
-def build_faiss_index(combined_embeddings: dict) -> tuple[faiss.IndexFlatL2, list]:
+# Default build and search parameters per index type. `nlist=None` sizes
+# the IVF lists from the number of training vectors.
+INDEX_SPECS = {
+    "flat": {"type": "flat"},
+    "ivf_flat": {"type": "ivf_flat", "nlist": None, "nprobe": 16},
+    "hnsw": {"type": "hnsw", "M": 32, "efConstruction": 200, "efSearch": 64},
+    "ivf_pq": {"type": "ivf_pq", "nlist": None, "m": 64, "nbits": 8, "nprobe": 16},
+}
+
+# Columns of each modality inside the combined [image | text] vectors, and
+# the file its sub-index is saved to next to faiss_index.index
+IMAGE_DIM = 512
+MODALITY_SLICES = {"image": slice(0, IMAGE_DIM), "text": slice(IMAGE_DIM, None)}
+MODALITY_FILES = {"image": "faiss_index_image.index", "text": "faiss_index_text.index"}
+
+def resolve_index_spec(index_spec="flat") -> dict:
     """
-    Build a FAISS L2 index from combined embeddings.
+    Expand an index spec into a full parameter dict.
+
+    Args:
+        index_spec: Name from INDEX_SPECS, or a dict with a "type" key and
+            any parameters to override (e.g. {"type": "hnsw", "efSearch": 128})
+
+    Returns:
+        dict: Spec with defaults filled in
+    """
+    if isinstance(index_spec, str):
+        index_spec = {"type": index_spec}
+    if index_spec.get("type") not in INDEX_SPECS:
+        raise ValueError(f"Unknown index type: {index_spec.get('type')}. Expected one of {list(INDEX_SPECS)}")
+    return {**INDEX_SPECS[index_spec["type"]], **index_spec}
+
+def make_index(d: int, index_spec="flat", n_train: int = None) -> faiss.Index:
+    """
+    Create an empty (untrained) FAISS index from a spec.
+
+    Args:
+        d: Vector dimension
+        index_spec: Index spec, see resolve_index_spec
+        n_train: Number of training vectors, used to size nlist when unset
+
+    Returns:
+        faiss.Index using L2 distance
+    """
+    spec = resolve_index_spec(index_spec)
+    kind = spec["type"]
+    if kind == "flat":
+        return faiss.IndexFlatL2(d)
+
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(d, spec["M"])
+        index.hnsw.efConstruction = spec["efConstruction"]
+        index.hnsw.efSearch = spec["efSearch"]
+        return index
+
+    nlist = spec["nlist"]
+    if nlist is None:
+        # ~4 * sqrt(n) lists, capped so each list gets the 39 training points faiss expects
+        n = n_train or 1
+        nlist = max(1, min(int(4 * np.sqrt(n)), n // 39))
+    quantizer = faiss.IndexFlatL2(d)
+    if kind == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, d, nlist)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, d, nlist, spec["m"], spec["nbits"])
+    index.nprobe = spec["nprobe"]
+    return index
+
+def train_index(index: faiss.Index, vectors: np.ndarray, max_train: int = 100_000, seed: int = 0):
+    """
+    Train an IVF/PQ index on (a random sample of) the vectors. No-op for
+    indexes that need no training.
+    """
+    if index.is_trained:
+        return
+    if len(vectors) > max_train:
+        rows = np.sort(np.random.default_rng(seed).choice(len(vectors), max_train, replace=False))
+        vectors = vectors[rows]
+    index.train(np.ascontiguousarray(vectors, dtype="float32"))
+
+def base_index(index: faiss.Index) -> faiss.Index:
+    """
+    Return the index that does the searching, unwrapping an IndexIDMap2.
+    """
+    return faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else faiss.downcast_index(index)
+
+def with_labels(base: faiss.Index) -> faiss.Index:
+    """
+    Make an empty index store caller-chosen labels (add_with_ids / remove_ids).
+
+    IVF indexes keep labels in their inverted lists natively; a hash-table
+    direct map lets them reconstruct and remove by label. They must not be
+    wrapped in IndexIDMap2: its remove_ids compacts the label table as if the
+    inner index shifted its remaining vectors down, which IVF lists do not,
+    so every later result would come back under the wrong label. Flat and
+    HNSW indexes get the IndexIDMap2 wrapper.
+    """
+    if isinstance(base, faiss.IndexIVF):
+        base.set_direct_map_type(faiss.DirectMap.Hashtable)
+        return base
+    return faiss.IndexIDMap2(base)
+
+def is_labeled(index: faiss.Index) -> bool:
+    """
+    True if the index stores product labels (see with_labels).
+    """
+    if isinstance(index, faiss.IndexIDMap2):
+        return not isinstance(base_index(index), faiss.IndexIVF)
+    index = faiss.downcast_index(index)
+    return isinstance(index, faiss.IndexIVF) and index.direct_map.type == faiss.DirectMap.Hashtable
+
+def set_search_params(index: faiss.Index, nprobe: int = None, ef_search: int = None):
+    """
+    Tune query-time parameters on an IVF or HNSW index (wrapped or not).
+
+    Args:
+        index: FAISS index
+        nprobe: Number of inverted lists visited per query (IVF indexes)
+        ef_search: Size of the HNSW candidate queue per query
+    """
+    inner = base_index(index)
+    if nprobe is not None and isinstance(inner, faiss.IndexIVF):
+        inner.nprobe = nprobe
+    if ef_search is not None and isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = ef_search
+
+def build_faiss_index(combined_embeddings: dict, index_spec="flat") -> tuple[faiss.Index, list]:
+    """
+    Build a labeled FAISS L2 index from combined embeddings (see with_labels).
+
+    Each vector is stored under a stable integer label equal to its position
+    in the returned product ID list, so search results index straight into
+    that list and products can later be updated or removed in place.
 
     Args:
         combined_embeddings (dict): {product_id: embedding}
+        index_spec: "flat" (exact), "ivf_flat", "hnsw", "ivf_pq" or a spec dict,
+            see INDEX_SPECS for the tunable parameters
 
     Returns:
-        Tuple of (FAISS index, list of product IDs in index order)
+        Tuple of (FAISS index, list of product IDs in label order)
     """
     ids = list(combined_embeddings.keys())
     vectors = np.stack([combined_embeddings[pid] for pid in ids]).astype("float32")
 
-    index = faiss.IndexFlatL2(vectors.shape[1])
-    index.add(vectors)
+    base = make_index(vectors.shape[1], index_spec, n_train=len(vectors))
+    train_index(base, vectors)
+    index = with_labels(base)
+    index.add_with_ids(vectors, np.arange(len(ids), dtype="int64"))
 
     return index, ids
 
-def save_faiss_assets(index: faiss.IndexFlatL2, combined_embeddings: dict, save_dir: str = "Assets"):
+def build_modality_indexes(vectors: np.ndarray, product_ids: list, index_spec="flat", batch_size: int = 65536) -> dict:
+    """
+    Build one index per modality over the image and text columns of the
+    combined vectors.
+
+    Labels match the combined index, so results from any of the indexes
+    map into the same product_ids list. Deleted (None) slots are skipped.
+
+    Args:
+        vectors: Combined vectors in label order (may be memory-mapped)
+        product_ids: Product IDs in label order
+        index_spec: Index spec, see resolve_index_spec
+        batch_size: Rows copied out of the vectors per add call
+
+    Returns:
+        dict: {"image": labeled index, "text": labeled index}
+    """
+    live = np.array([label for label, pid in enumerate(product_ids) if pid is not None], dtype="int64")
+    indexes = {}
+    for name, cols in MODALITY_SLICES.items():
+        d = len(range(vectors.shape[1])[cols])
+        base = make_index(d, index_spec, n_train=len(live))
+        if not base.is_trained:
+            sample = live
+            if len(live) > 100_000:
+                sample = np.sort(np.random.default_rng(0).choice(live, 100_000, replace=False))
+            train_index(base, vectors[sample][:, cols])
+        index = with_labels(base)
+        for b in range(0, len(live), batch_size):
+            labels = live[b:b + batch_size]
+            index.add_with_ids(np.ascontiguousarray(vectors[labels][:, cols], dtype="float32"), labels)
+        indexes[name] = index
+    return indexes
+
+def save_faiss_assets(index: faiss.Index, combined_embeddings: dict, save_dir: str = "Assets"):
     """
     Save FAISS index and product ID order.
 
@@ -30,35 +199,478 @@ def save_faiss_assets(index: faiss.IndexFlatL2, combined_embeddings: dict, save_
         combined_embeddings: Dictionary of product embeddings
         save_dir: Output directory to store index and metadata
     """
+    ids = list(combined_embeddings.keys())
+    write_faiss_assets(index, ids, np.stack([combined_embeddings[pid] for pid in ids]), save_dir)
+
+def write_faiss_assets(index: faiss.Index, product_ids: list, vectors: np.ndarray, save_dir: str = "Assets"):
+    """
+    Atomically replace the index, product ID list and vectors in save_dir.
+
+    Each file is written to a temporary path and swapped in with os.replace,
+    so readers never observe a partially written asset.
+    """
     os.makedirs(save_dir, exist_ok=True)
 
-    faiss.write_index(index, os.path.join(save_dir, "faiss_index.index"))
+    index_path = os.path.join(save_dir, "faiss_index.index")
+    faiss.write_index(index, index_path + ".tmp")
+    os.replace(index_path + ".tmp", index_path)
 
-    with open(os.path.join(save_dir, "product_ids.pkl"), "wb") as f:
-        pickle.dump(list(combined_embeddings.keys()), f)
+    ids_path = os.path.join(save_dir, "product_ids.pkl")
+    with open(ids_path + ".tmp", "wb") as f:
+        pickle.dump(product_ids, f)
+    os.replace(ids_path + ".tmp", ids_path)
 
-    np.save(os.path.join(save_dir, "combined_vectors.npy"), np.stack([combined_embeddings[pid] for pid in combined_embeddings]))
+    vectors_path = os.path.join(save_dir, "combined_vectors.npy")
+    with open(vectors_path + ".tmp", "wb") as f:
+        np.save(f, vectors)
+    os.replace(vectors_path + ".tmp", vectors_path)
 
-def load_faiss_assets(load_dir: str = "Assets") -> tuple[faiss.IndexFlatL2, list, np.ndarray]:
+def write_modality_indexes(modality_indexes: dict, save_dir: str = "Assets"):
+    """
+    Atomically replace the per-modality indexes in save_dir.
+    """
+    os.makedirs(save_dir, exist_ok=True)
+    for name, index in modality_indexes.items():
+        index_path = os.path.join(save_dir, MODALITY_FILES[name])
+        faiss.write_index(index, index_path + ".tmp")
+        os.replace(index_path + ".tmp", index_path)
+
+def _mmap_flags() -> int:
+    # IO_FLAG_MMAP_IFC maps flat and IVF codes straight from the file (faiss >= 1.10)
+    return getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+def load_combined_vectors(load_dir: str = "Assets", mmap: bool = True) -> np.ndarray:
+    """
+    Load the combined vectors matrix.
+
+    With mmap=True nothing is read up front: rows are paged in on access
+    and shared through the OS page cache by every process on the host.
+    """
+    return np.load(os.path.join(load_dir, "combined_vectors.npy"), mmap_mode="r" if mmap else None)
+
+def load_faiss_assets(
+    load_dir: str = "Assets",
+    nprobe: int = None,
+    ef_search: int = None,
+    mmap: bool = False,
+    load_vectors: bool = True
+) -> tuple[faiss.Index, list, np.ndarray]:
     """
     Load FAISS index and metadata.
 
     Args:
         load_dir: Directory from which to load assets
+        nprobe: Override the saved nprobe of an IVF index
+        ef_search: Override the saved efSearch of an HNSW index
+        mmap: Memory-map the index and vectors instead of reading them into
+            the heap; the index is then read-only
+        load_vectors: Return None instead of the combined vectors
 
     Returns:
         Tuple: (index, list of product_ids, combined_vectors array)
+
+    Removed products leave a None entry in product_ids (and a zero row in
+    the vectors) until the assets are compacted.
     """
-    index = faiss.read_index(os.path.join(load_dir, "faiss_index.index"))
+    index_path = os.path.join(load_dir, "faiss_index.index")
+    index = faiss.read_index(index_path, _mmap_flags()) if mmap else faiss.read_index(index_path)
+    set_search_params(index, nprobe=nprobe, ef_search=ef_search)
 
     with open(os.path.join(load_dir, "product_ids.pkl"), "rb") as f:
         ids = pickle.load(f)
 
-    vectors = np.load(os.path.join(load_dir, "combined_vectors.npy"))
+    vectors = load_combined_vectors(load_dir, mmap=mmap) if load_vectors else None
 
     return index, ids, vectors
 
-def search_index(index: faiss.IndexFlatL2, query_vector: np.ndarray, top_k: int = 5) -> list[int]:
+def load_modality_indexes(
+    load_dir: str = "Assets",
+    nprobe: int = None,
+    ef_search: int = None,
+    mmap: bool = False,
+    ntotal: int = None
+) -> dict:
+    """
+    Load the per-modality indexes saved next to the combined index.
+
+    Args:
+        load_dir: Directory from which to load assets
+        nprobe: Override the saved nprobe of IVF indexes
+        ef_search: Override the saved efSearch of HNSW indexes
+        mmap: Memory-map the indexes instead of reading them into the heap
+        ntotal: Vector count of the combined index; sub-indexes holding a
+            different number were built for another catalog and are skipped
+
+    Returns:
+        dict: {modality: index} for every usable sub-index found (empty if none were built)
+    """
+    indexes = {}
+    for name, filename in MODALITY_FILES.items():
+        index_path = os.path.join(load_dir, filename)
+        if not os.path.exists(index_path):
+            continue
+        index = faiss.read_index(index_path, _mmap_flags()) if mmap else faiss.read_index(index_path)
+        if ntotal is not None and index.ntotal != ntotal:
+            print(f"❌ Ignoring {filename}: {index.ntotal} vectors, combined index has {ntotal}")
+            continue
+        set_search_params(index, nprobe=nprobe, ef_search=ef_search)
+        indexes[name] = index
+    return indexes
+
+def remove_modality_indexes(save_dir: str = "Assets"):
+    """
+    Delete any per-modality indexes in save_dir, e.g. before a rebuild
+    renumbers the combined index they were built against.
+    """
+    for filename in MODALITY_FILES.values():
+        index_path = os.path.join(save_dir, filename)
+        if os.path.exists(index_path):
+            os.remove(index_path)
+
+def _product_labels(product_ids: list) -> dict:
+    return {pid: label for label, pid in enumerate(product_ids) if pid is not None}
+
+def _supports_remove(index: faiss.Index) -> bool:
+    # HNSW graphs cannot drop vectors; their deleted slots stay in the graph
+    # as tombstones that search skips until the index is compacted
+    return not isinstance(base_index(index), faiss.IndexHNSW)
+
+def _remove_labels(index: faiss.Index, labels: np.ndarray):
+    labels = np.ascontiguousarray(labels, dtype="int64")
+    if isinstance(base_index(index), faiss.IndexIVF):
+        # The hash-table direct map looks each label up, but only accepts an explicit array
+        index.remove_ids(faiss.IDSelectorArray(len(labels), faiss.swig_ptr(labels)))
+    else:
+        index.remove_ids(faiss.IDSelectorBatch(labels))
+
+def _index_views(index: faiss.Index, modality_indexes: dict = None) -> list:
+    # The combined index plus each sub-index with the vector columns it holds
+    views = [(index, slice(None))]
+    for name, sub_index in (modality_indexes or {}).items():
+        views.append((sub_index, MODALITY_SLICES[name]))
+    return views
+
+def ensure_id_map(index: faiss.Index, vectors: np.ndarray) -> faiss.Index:
+    """
+    Convert an index into a labeled one (see with_labels).
+
+    Legacy positional indexes are rebuilt as a flat index over the vectors.
+    IVF indexes wrapped in IndexIDMap2 by older builds are unwrapped, keeping
+    their trained quantizer and the labels they hold.
+
+    Args:
+        index: Loaded FAISS index
+        vectors: Combined (or per-modality) vectors in label order
+
+    Returns:
+        Labeled index with label == row in vectors
+    """
+    if is_labeled(index):
+        return index
+    if isinstance(index, faiss.IndexIDMap2):
+        labels = faiss.vector_to_array(index.id_map).astype("int64")
+        return _refill_index(index, vectors, rows=labels, labels=labels)
+    base = base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        # Positional IVF index: its internal ids already equal the row labels
+        base.set_direct_map_type(faiss.DirectMap.Hashtable)
+        return base
+    id_map = faiss.IndexIDMap2(faiss.IndexFlatL2(index.d))
+    id_map.add_with_ids(np.ascontiguousarray(vectors, dtype="float32"), np.arange(len(vectors), dtype="int64"))
+    return id_map
+
+def upsert_products(
+    index: faiss.Index,
+    product_ids: list,
+    vectors: np.ndarray,
+    embeddings: dict,
+    modality_indexes: dict = None
+) -> np.ndarray:
+    """
+    Insert new products or replace the vectors of existing ones.
+
+    Existing products keep their label; new products are appended. On HNSW
+    indexes, which cannot remove vectors, updated products move to a new
+    label instead. Updates product_ids in place.
+
+    Args:
+        index: Labeled FAISS index (see with_labels)
+        product_ids: Product IDs in label order
+        vectors: Combined vectors in label order
+        embeddings (dict): {product_id: combined embedding}
+        modality_indexes (dict): Optional per-modality indexes, kept in step
+
+    Returns:
+        np.ndarray: Updated combined vectors
+    """
+    if not embeddings:
+        return vectors
+    views = _index_views(index, modality_indexes)
+    labels = _product_labels(product_ids)
+    updated = [pid for pid in embeddings if pid in labels]
+    added = [pid for pid in embeddings if pid not in labels]
+    if updated and not all(_supports_remove(idx) for idx, _ in views):
+        vectors = remove_products(index, product_ids, vectors, updated, modality_indexes)
+        updated, added = [], list(embeddings)
+
+    if updated:
+        update_labels = np.array([labels[pid] for pid in updated], dtype="int64")
+        update_vectors = np.stack([embeddings[pid] for pid in updated]).astype("float32")
+        for idx, cols in views:
+            _remove_labels(idx, update_labels)
+            idx.add_with_ids(np.ascontiguousarray(update_vectors[:, cols]), update_labels)
+        vectors = np.array(vectors)
+        vectors[update_labels] = update_vectors
+
+    if added:
+        add_labels = np.arange(len(product_ids), len(product_ids) + len(added), dtype="int64")
+        add_vectors = np.stack([embeddings[pid] for pid in added]).astype("float32")
+        for idx, cols in views:
+            idx.add_with_ids(np.ascontiguousarray(add_vectors[:, cols]), add_labels)
+        product_ids.extend(added)
+        vectors = np.concatenate([vectors, add_vectors])
+
+    return vectors
+
+def remove_products(
+    index: faiss.Index,
+    product_ids: list,
+    vectors: np.ndarray,
+    remove_ids: list,
+    modality_indexes: dict = None
+) -> np.ndarray:
+    """
+    Remove products from the index, leaving a tombstone in their slot.
+
+    The product_ids entry becomes None and the vector row is zeroed until
+    `compact_faiss_assets` reclaims the slot. Updates product_ids in place.
+
+    Args:
+        index: Labeled FAISS index (see with_labels)
+        product_ids: Product IDs in label order
+        vectors: Combined vectors in label order
+        remove_ids: Product IDs to delete; unknown IDs are ignored
+        modality_indexes (dict): Optional per-modality indexes, kept in step
+
+    Returns:
+        np.ndarray: Updated combined vectors
+    """
+    labels = _product_labels(product_ids)
+    remove_labels = np.array([labels[pid] for pid in remove_ids if pid in labels], dtype="int64")
+    if len(remove_labels) == 0:
+        return vectors
+
+    for idx, _ in _index_views(index, modality_indexes):
+        if _supports_remove(idx):
+            _remove_labels(idx, remove_labels)
+    vectors = np.array(vectors)
+    vectors[remove_labels] = 0
+    for label in remove_labels:
+        product_ids[label] = None
+    return vectors
+
+def _refill_index(
+    index: faiss.Index,
+    vectors: np.ndarray,
+    rows: np.ndarray = None,
+    labels: np.ndarray = None,
+    cols: slice = slice(None),
+    batch_size: int = 65536
+) -> faiss.Index:
+    # Same index type and trained quantizer, emptied and refilled with
+    # vectors[rows][:, cols] under new labels, one batch of rows at a time
+    base = faiss.clone_index(base_index(index))
+    base.reset()
+    refilled = with_labels(base)
+    if rows is None:
+        rows = np.arange(len(vectors), dtype="int64")
+    if labels is None:
+        labels = np.arange(len(rows), dtype="int64")
+    for b in range(0, len(rows), batch_size):
+        block = np.asarray(vectors[rows[b:b + batch_size]], dtype="float32")[:, cols]
+        refilled.add_with_ids(np.ascontiguousarray(block), labels[b:b + batch_size])
+    return refilled
+
+def compact_faiss_assets(
+    index: faiss.Index,
+    product_ids: list,
+    vectors: np.ndarray,
+    modality_indexes: dict = None
+) -> tuple[faiss.Index, list, np.ndarray]:
+    """
+    Reclaim deleted slots by renumbering live products to contiguous labels.
+
+    The index is refilled with the same type and parameters; IVF/PQ indexes
+    keep their trained quantizers. Per-modality indexes, when given, are
+    refilled too and replaced in the dict.
+
+    Returns:
+        Tuple: (new index, compacted product_ids, compacted vectors)
+    """
+    live = np.array([label for label, pid in enumerate(product_ids) if pid is not None], dtype="int64")
+    vectors = np.ascontiguousarray(vectors[live], dtype="float32")
+    for name in list(modality_indexes or {}):
+        modality_indexes[name] = _refill_index(modality_indexes[name], vectors, cols=MODALITY_SLICES[name])
+    return _refill_index(index, vectors), [product_ids[label] for label in live], vectors
+
+def apply_catalog_delta(upserts: dict = None, removals: list = None, load_dir: str = "Assets", compact_ratio: float = 0.2):
+    """
+    Apply a catalog delta to the persisted FAISS assets in place.
+
+    Per-modality indexes found in load_dir are updated along with the
+    combined one.
+
+    Args:
+        upserts (dict): {product_id: combined embedding} for new or changed products
+        removals (list): Product IDs to delete
+        load_dir: Directory holding the FAISS assets
+        compact_ratio: Compact when the fraction of deleted slots exceeds this
+
+    Returns:
+        Tuple: (index, product_ids, combined_vectors) after the update
+    """
+    index, product_ids, vectors = load_faiss_assets(load_dir)
+    index = ensure_id_map(index, vectors)
+    modality_indexes = {
+        name: ensure_id_map(sub_index, vectors[:, MODALITY_SLICES[name]])
+        for name, sub_index in load_modality_indexes(load_dir, ntotal=index.ntotal).items()
+    }
+
+    vectors = remove_products(index, product_ids, vectors, removals or [], modality_indexes)
+    vectors = upsert_products(index, product_ids, vectors, upserts or {}, modality_indexes)
+
+    deleted = sum(pid is None for pid in product_ids)
+    if product_ids and deleted / len(product_ids) > compact_ratio:
+        index, product_ids, vectors = compact_faiss_assets(index, product_ids, vectors, modality_indexes)
+        print(f"🧹 Compacted {deleted} deleted slots")
+
+    write_modality_indexes(modality_indexes, load_dir)
+    write_faiss_assets(index, product_ids, vectors, load_dir)
+    print(f"✅ Applied catalog delta: {len(upserts or {})} upserts, {len(removals or [])} removals")
+    return index, product_ids, vectors
+
+def remove_from_faiss_assets(removals: list, load_dir: str = "Assets", compact_ratio: float = 0.2, batch_size: int = 65536) -> int:
+    """
+    Delete products from the persisted FAISS assets without loading the vectors.
+
+    Same result as apply_catalog_delta(removals=...), but the combined
+    vectors stay memory-mapped and are rewritten batch_size rows at a time
+    (zeroing removed rows, or keeping only the live rows when compacting),
+    so memory beyond the indexes themselves is bounded by the batch size.
+    The indexes are still read into memory to be edited: a flat index holds
+    a full copy of the vectors, so use a compressed spec for catalogs that
+    do not fit in RAM.
+
+    Args:
+        removals (list): Product IDs to delete; unknown IDs are ignored
+        load_dir: Directory holding the FAISS assets
+        compact_ratio: Compact when the fraction of deleted slots exceeds this
+        batch_size: Vector rows read and written at a time
+
+    Returns:
+        int: Number of products removed
+    """
+    index, product_ids, _ = load_faiss_assets(load_dir, load_vectors=False)
+    vectors = load_combined_vectors(load_dir, mmap=True)
+    index = ensure_id_map(index, vectors)
+    modality_indexes = {
+        name: ensure_id_map(sub_index, vectors[:, MODALITY_SLICES[name]])
+        for name, sub_index in load_modality_indexes(load_dir, ntotal=index.ntotal).items()
+    }
+    labels = _product_labels(product_ids)
+    remove_labels = np.array(sorted({labels[pid] for pid in removals if pid in labels}), dtype="int64")
+    if len(remove_labels) == 0:
+        return 0
+
+    views = _index_views(index, modality_indexes)
+    for idx, _ in views:
+        if _supports_remove(idx):
+            _remove_labels(idx, remove_labels)
+    for label in remove_labels:
+        product_ids[label] = None
+
+    vectors_file = NpyAppender(os.path.join(load_dir, "combined_vectors.npy"))
+    deleted = sum(pid is None for pid in product_ids)
+    if deleted / len(product_ids) > compact_ratio:
+        live = np.array([label for label, pid in enumerate(product_ids) if pid is not None], dtype="int64")
+        index = _refill_index(index, vectors, rows=live, batch_size=batch_size)
+        for name in modality_indexes:
+            modality_indexes[name] = _refill_index(
+                modality_indexes[name], vectors, rows=live, cols=MODALITY_SLICES[name], batch_size=batch_size
+            )
+        for b in range(0, len(live), batch_size):
+            vectors_file.append(vectors[live[b:b + batch_size]])
+        product_ids = [product_ids[label] for label in live]
+        print(f"🧹 Compacted {deleted} deleted slots")
+    else:
+        removed = np.zeros(len(product_ids), dtype=bool)
+        removed[remove_labels] = True
+        for b in range(0, len(product_ids), batch_size):
+            block = np.array(vectors[b:b + batch_size], dtype="float32")
+            block[removed[b:b + batch_size]] = 0
+            vectors_file.append(block)
+
+    write_modality_indexes(modality_indexes, load_dir)
+    index_path = os.path.join(load_dir, "faiss_index.index")
+    faiss.write_index(index, index_path + ".tmp")
+    os.replace(index_path + ".tmp", index_path)
+    ids_path = os.path.join(load_dir, "product_ids.pkl")
+    with open(ids_path + ".tmp", "wb") as f:
+        pickle.dump(product_ids, f)
+    os.replace(ids_path + ".tmp", ids_path)
+    vectors_file.close()
+    print(f"✅ Removed {len(remove_labels)} products")
+    return len(remove_labels)
+
+def make_id_selector(mask: np.ndarray) -> faiss.IDSelector:
+    """
+    Build a FAISS ID selector from a boolean mask over labels.
+
+    Sparse masks become a hash set of the selected labels; denser ones a
+    bitmap of len(mask) / 8 bytes.
+
+    Args:
+        mask: Boolean array, True for labels that may be returned; labels
+            past its end (e.g. products upserted since it was built) are rejected
+
+    Returns:
+        faiss.IDSelector to pass to search_index / search_index_batch
+    """
+    labels = np.flatnonzero(mask).astype("int64")
+    if len(labels) * 64 < len(mask):
+        return faiss.IDSelectorBatch(labels)
+    bitmap = np.packbits(mask, bitorder="little")
+    selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))  # size in bytes
+    selector.referenced_objects = [bitmap]  # the selector only holds a pointer; keep the array alive
+    return selector
+
+def make_exclusion_selector(labels) -> faiss.IDSelector:
+    """
+    Build a FAISS ID selector that accepts every label except the given ones.
+
+    Costs O(len(labels)) regardless of the index size, unlike a mask over all labels.
+
+    Args:
+        labels: Labels (positions in product_ids) to exclude
+
+    Returns:
+        faiss.IDSelector to pass to search_index / search_index_batch
+    """
+    excluded = faiss.IDSelectorBatch(np.asarray(labels, dtype="int64"))
+    selector = faiss.IDSelectorNot(excluded)
+    selector.referenced_objects = [excluded]  # IDSelectorNot does not own the wrapped selector
+    return selector
+
+def _search_params(index: faiss.Index, selector: faiss.IDSelector) -> faiss.SearchParameters:
+    # Search parameters replace the index's own nprobe/efSearch, so carry them over
+    inner = base_index(index)
+    if isinstance(inner, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=inner.nprobe)
+    if isinstance(inner, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=inner.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+def search_index(index: faiss.Index, query_vector: np.ndarray, top_k: int = 5, selector: faiss.IDSelector = None) -> list[int]:
     """
     Perform a top-k similarity search on the FAISS index.
 
@@ -66,24 +678,87 @@ def search_index(index: faiss.IndexFlatL2, query_vector: np.ndarray, top_k: int
         index: FAISS index
         query_vector: Combined image + text vector (shape: [1408] or [1, 1408])
         top_k: Number of top results to retrieve
+        selector: Optional ID selector (see make_id_selector); only selected
+            labels are scored and returned
 
     Returns:
-        List of index positions of top_k most similar vectors
+        List of labels (positions in product_ids) of top_k most similar vectors;
+        -1 marks empty result slots
     """
     if query_vector.ndim == 1:
         query_vector = query_vector[np.newaxis, :]
-    distances, indices = index.search(query_vector.astype("float32"), top_k)
+    distances, indices = search_index_batch(index, query_vector, top_k, selector)
     return indices[0].tolist()
 
+def search_index_batch(
+    index: faiss.Index,
+    query_vectors: np.ndarray,
+    top_k: int = 5,
+    selector: faiss.IDSelector = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Search many query vectors in a single FAISS call.
+
+    Args:
+        index: FAISS index
+        query_vectors: Matrix of shape [n_queries, d]
+        top_k: Number of results per query
+        selector: Optional ID selector restricting the searchable labels
+
+    Returns:
+        Tuple: (distances, labels), each of shape [n_queries, top_k]; -1 labels mark empty slots
+    """
+    query_vectors = np.ascontiguousarray(query_vectors, dtype="float32")
+    if selector is None:
+        return index.search(query_vectors, top_k)
+    return index.search(query_vectors, top_k, params=_search_params(index, selector))
+
+def reconstruct_vectors(index: faiss.Index, labels, vectors: np.ndarray = None) -> np.ndarray:
+    """
+    Fetch the stored vectors of indexed products.
+
+    Reads rows of the (possibly memory-mapped) combined vectors when given,
+    otherwise asks the index to reconstruct them. Compressed indexes (IVF-PQ)
+    only return approximations, so prefer passing the vectors.
+
+    Args:
+        index: Labeled FAISS index (see with_labels)
+        labels: Labels (positions in product_ids) to fetch
+        vectors: Optional combined vectors in label order
+
+    Returns:
+        np.ndarray: Matrix of shape [len(labels), d]
+    """
+    labels = np.asarray(labels, dtype="int64")
+    if vectors is not None:
+        return np.asarray(vectors[labels], dtype="float32")
+    return index.reconstruct_batch(labels)
+
 # from modules.faiss_index import build_faiss_index, save_faiss_assets, load_faiss_assets, search_index
 
 # # Build and save index
 # faiss_index, ids = build_faiss_index(combined_embeddings)
 # save_faiss_assets(faiss_index, combined_embeddings)
 
+# # Approximate index for large catalogs
+# faiss_index, ids = build_faiss_index(combined_embeddings, {"type": "hnsw", "M": 32, "efSearch": 128})
+
 # # Later: Load index and perform search
 # faiss_index, ids, _ = load_faiss_assets()
+# faiss_index, ids, _ = load_faiss_assets(nprobe=32)   # IVF: trade latency for recall
+# faiss_index, ids, _ = load_faiss_assets(mmap=True, load_vectors=False)   # serving workers share pages
 
 # # Example query
 # top_indices = search_index(faiss_index, combined_embeddings[ids[0]], top_k=5)
-# print("Top similar indices:", top_indices)
\ No newline at end of file
+# print("Top similar indices:", top_indices)
+
+# # Separate image and text indexes for single-modality queries
+# modality_indexes = build_modality_indexes(load_combined_vectors(), ids)
+# write_modality_indexes(modality_indexes)
+# modality_indexes = load_modality_indexes(mmap=True)
+
+# # Only search products that pass a filter
+# top_indices = search_index(faiss_index, query_vector, top_k=5, selector=make_id_selector(catalog.filter_mask(filters)))
+
+# # Daily catalog delta: changed/new products and delistings, written back to Assets/
+# apply_catalog_delta(upserts={pid: vector}, removals=[delisted_pid])
\ No newline at end of file
@@ -0,0 +1,131 @@
+import os
+import json
+import time
+import argparse
+import faiss
+import numpy as np
+from Modules.faiss_index import make_index, train_index, set_search_params, resolve_index_spec
+
+# Each entry builds one index and sweeps its query-time parameter
+DEFAULT_CONFIGS = [
+    {"spec": {"type": "flat"}},
+    {"spec": {"type": "ivf_flat"}, "nprobe": [4, 16, 64]},
+    {"spec": {"type": "hnsw", "M": 32}, "ef_search": [32, 64, 128]},
+    {"spec": {"type": "ivf_pq", "m": 64}, "nprobe": [8, 32, 128]},
+]
+
+def recall_at_k(approx: np.ndarray, exact: np.ndarray) -> float:
+    """
+    Mean fraction of the exact top-k neighbors found by the approximate search.
+    """
+    k = exact.shape[1]
+    hits = [len(set(a[a >= 0]) & set(e)) for a, e in zip(approx, exact)]
+    return float(np.mean(hits)) / k
+
+def time_single_queries(index: faiss.Index, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Search one query at a time, as the app does.
+
+    Returns:
+        Tuple: (result labels, per-query latencies in milliseconds)
+    """
+    labels = np.empty((len(queries), k), dtype="int64")
+    latencies = np.empty(len(queries))
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        _, labels[i:i + 1] = index.search(queries[i:i + 1], k)
+        latencies[i] = (time.perf_counter() - start) * 1000
+    return labels, latencies
+
+def benchmark_indexes(vectors: np.ndarray, configs: list = None, n_queries: int = 1000, k: int = 10, seed: int = 0) -> list[dict]:
+    """
+    Compare index configurations against exact search.
+
+    Queries are held out of the indexed vectors so no query trivially finds
+    itself.
+
+    Args:
+        vectors: Combined product vectors
+        configs: List of {"spec": index spec, "nprobe": [...], "ef_search": [...]}
+        n_queries: Number of held-out query vectors
+        k: Neighbors per query for recall@k
+        seed: Random seed for the query split
+
+    Returns:
+        list[dict]: One result row per (index, search parameter) pair
+    """
+    configs = configs or DEFAULT_CONFIGS
+    rng = np.random.default_rng(seed)
+    is_query = np.zeros(len(vectors), dtype=bool)
+    is_query[rng.choice(len(vectors), min(n_queries, len(vectors) // 10), replace=False)] = True
+    queries = np.ascontiguousarray(vectors[is_query], dtype="float32")
+    base = np.ascontiguousarray(vectors[~is_query], dtype="float32")
+
+    exact_index = faiss.IndexFlatL2(base.shape[1])
+    exact_index.add(base)
+    _, exact = exact_index.search(queries, k)
+
+    results = []
+    for config in configs:
+        spec = resolve_index_spec(config["spec"])
+        index = make_index(base.shape[1], spec, n_train=len(base))
+        start = time.perf_counter()
+        train_index(index, base)
+        index.add(base)
+        build_seconds = time.perf_counter() - start
+        memory_mb = faiss.serialize_index(index).nbytes / 2**20
+
+        sweep = [("nprobe", v) for v in config.get("nprobe", [])] + [("ef_search", v) for v in config.get("ef_search", [])]
+        for param, value in sweep or [(None, None)]:
+            if param:
+                set_search_params(index, **{param: value})
+            labels, latencies = time_single_queries(index, queries, k)
+            results.append({
+                "index": spec,
+                "search_param": param,
+                "search_value": value,
+                f"recall@{k}": round(recall_at_k(labels, exact), 4),
+                "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+                "memory_mb": round(memory_mb, 1),
+                "build_s": round(build_seconds, 2),
+            })
+            print(_format_row(results[-1], k))
+    return results
+
+def _format_row(row: dict, k: int) -> str:
+    name = row["index"]["type"] + (f" {row['search_param']}={row['search_value']}" if row["search_param"] else "")
+    return (f"{name:<24} recall@{k}={row[f'recall@{k}']:.3f}  p50={row['p50_ms']:.3f}ms  "
+            f"p99={row['p99_ms']:.3f}ms  mem={row['memory_mb']:.1f}MB  build={row['build_s']:.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index types on the saved combined vectors.")
+    parser.add_argument("--vectors", default=os.path.join("Assets", "combined_vectors.npy"))
+    parser.add_argument("--configs", help="JSON file with a list of configs (defaults to DEFAULT_CONFIGS)")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--threads", type=int, help="FAISS OpenMP threads")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    if args.threads:
+        faiss.omp_set_num_threads(args.threads)
+    configs = None
+    if args.configs:
+        with open(args.configs) as f:
+            configs = json.load(f)
+
+    vectors = np.load(args.vectors, mmap_mode="r")
+    print(f"📊 Benchmarking {len(vectors)} vectors of dim {vectors.shape[1]}")
+    results = benchmark_indexes(vectors, configs, n_queries=args.queries, k=args.k)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Saved results to {args.output}")
+
+if __name__ == "__main__":
+    main()
+
+
+# python -m Modules.index_benchmark --vectors Assets/combined_vectors.npy -k 10 --output index_benchmark.json
@@ -0,0 +1,284 @@
+import os
+import pickle
+import argparse
+import faiss
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from Modules.faiss_index import load_faiss_assets, search_index_batch
+from Modules.utils import log
+
+NEIGHBORS_FILE = "knn_neighbors.npy"
+SCORES_FILE = "knn_scores.npy"
+# product_ids the graph was computed for, used to remap labels after catalog changes
+GRAPH_IDS_FILE = "knn_product_ids.pkl"
+
+def _scores(distances: np.ndarray) -> np.ndarray:
+    # Combined vectors are two unit vectors side by side (squared norm 2): cosine = 1 - d / 4
+    return 1.0 - distances / 4.0
+
+def compute_neighbors(
+    index: faiss.Index,
+    vectors: np.ndarray,
+    product_ids: list,
+    labels: np.ndarray,
+    n_neighbors: int = 20,
+    batch_size: int = 1024,
+    num_workers: int = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Find the top-n_neighbors products of each given product.
+
+    Query batches run on a pool of threads; FAISS releases the GIL, and each
+    search is kept single-threaded so the pool does not oversubscribe the
+    cores with OpenMP threads.
+
+    Args:
+        index: FAISS index over the combined vectors
+        vectors: Combined vectors in label order (may be memory-mapped)
+        product_ids: Product IDs in label order (None for deleted slots)
+        labels: Labels of the query products
+        n_neighbors: Neighbors kept per product (the product itself excluded)
+        batch_size: Queries per FAISS search call
+        num_workers: Threads searching batches in parallel (defaults to the CPU count)
+
+    Returns:
+        Tuple: (neighbor labels int32 [len(labels), n_neighbors], cosine scores
+        float16 of the same shape); -1 pads rows with fewer neighbors
+    """
+    labels = np.asarray(labels, dtype=np.int64)
+    live = np.array([pid is not None for pid in product_ids])
+    # Over-fetch past the product itself and any HNSW tombstones
+    fetch = n_neighbors + 1 + min(int((~live).sum()), n_neighbors)
+    neighbors = np.full((len(labels), n_neighbors), -1, dtype=np.int32)
+    scores = np.zeros((len(labels), n_neighbors), dtype=np.float16)
+
+    def run(start: int):
+        batch = labels[start:start + batch_size]
+        distances, hits = search_index_batch(index, np.asarray(vectors[batch]), fetch)
+        for i, label in enumerate(batch):
+            keep = (hits[i] >= 0) & (hits[i] != label)
+            keep[keep] = live[hits[i][keep]]
+            row_hits, row_distances = hits[i][keep][:n_neighbors], distances[i][keep][:n_neighbors]
+            neighbors[start + i, :len(row_hits)] = row_hits
+            scores[start + i, :len(row_hits)] = _scores(row_distances)
+
+    omp_threads = faiss.omp_get_max_threads()
+    faiss.omp_set_num_threads(1)
+    try:
+        with ThreadPoolExecutor(max_workers=num_workers or os.cpu_count()) as pool:
+            list(pool.map(run, range(0, len(labels), batch_size)))
+    finally:
+        faiss.omp_set_num_threads(omp_threads)
+    return neighbors, scores
+
+def build_knn_graph(
+    load_dir: str = "Assets",
+    n_neighbors: int = 20,
+    batch_size: int = 1024,
+    num_workers: int = None,
+    shard: tuple = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the neighbor graph of the whole catalog and save it next to the index.
+
+    Args:
+        load_dir: Directory holding the FAISS assets; the graph is written there
+        n_neighbors: Neighbors kept per product
+        batch_size: Queries per FAISS search call
+        num_workers: Threads searching batches in parallel
+        shard: Optional (shard_index, n_shards) to compute only one contiguous
+            slice of the labels, e.g. one slice per machine; combine the parts
+            with merge_knn_shards
+
+    Returns:
+        Tuple: (neighbors, scores) for the computed rows
+    """
+    index, product_ids, vectors = load_faiss_assets(load_dir, mmap=True)
+    labels = np.arange(len(product_ids))
+    if shard is not None:
+        shard_index, n_shards = shard
+        labels = np.array_split(labels, n_shards)[shard_index]
+
+    log(f"Computing {n_neighbors} neighbors for {len(labels)} products")
+    neighbors, scores = compute_neighbors(index, vectors, product_ids, labels, n_neighbors, batch_size, num_workers)
+    neighbors[[product_ids[label] is None for label in labels]] = -1
+
+    if shard is None:
+        save_knn_graph(neighbors, scores, product_ids, load_dir)
+    else:
+        path = os.path.join(load_dir, f"knn_shard_{shard[0]}_of_{shard[1]}.npz")
+        np.savez(path, labels=labels, neighbors=neighbors, scores=scores)
+        log(f"✅ Saved graph shard to {path}")
+    return neighbors, scores
+
+def merge_knn_shards(load_dir: str = "Assets", n_shards: int = 1):
+    """
+    Combine the shard files written by build_knn_graph(shard=...) into one graph.
+    """
+    with open(os.path.join(load_dir, "product_ids.pkl"), "rb") as f:
+        product_ids = pickle.load(f)
+    parts = [np.load(os.path.join(load_dir, f"knn_shard_{i}_of_{n_shards}.npz")) for i in range(n_shards)]
+    n_neighbors = parts[0]["neighbors"].shape[1]
+    neighbors = np.full((len(product_ids), n_neighbors), -1, dtype=np.int32)
+    scores = np.zeros((len(product_ids), n_neighbors), dtype=np.float16)
+    for part in parts:
+        neighbors[part["labels"]] = part["neighbors"]
+        scores[part["labels"]] = part["scores"]
+    save_knn_graph(neighbors, scores, product_ids, load_dir)
+
+def save_knn_graph(neighbors: np.ndarray, scores: np.ndarray, product_ids: list, save_dir: str = "Assets"):
+    """
+    Atomically write the neighbor matrix, scores and the product IDs they refer to.
+    """
+    for filename, array in [(NEIGHBORS_FILE, neighbors), (SCORES_FILE, scores)]:
+        path = os.path.join(save_dir, filename)
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, array)
+        os.replace(path + ".tmp", path)
+    path = os.path.join(save_dir, GRAPH_IDS_FILE)
+    with open(path + ".tmp", "wb") as f:
+        pickle.dump(product_ids, f)
+    os.replace(path + ".tmp", path)
+    log(f"✅ Saved kNN graph: {neighbors.shape[0]} products x {neighbors.shape[1]} neighbors "
+        f"({(neighbors.nbytes + scores.nbytes) / 2**20:.1f}MB)")
+
+def load_knn_graph(load_dir: str = "Assets", product_ids: list = None, mmap: bool = True):
+    """
+    Load the saved neighbor graph.
+
+    Args:
+        load_dir: Directory holding the graph files
+        product_ids: Current product IDs; the graph is only returned if it was
+            computed for exactly this list
+        mmap: Memory-map the matrices instead of reading them into the heap
+
+    Returns:
+        Tuple: (neighbors, scores), or None if no graph exists or it is stale
+    """
+    if not os.path.exists(os.path.join(load_dir, NEIGHBORS_FILE)):
+        return None
+    if product_ids is not None:
+        with open(os.path.join(load_dir, GRAPH_IDS_FILE), "rb") as f:
+            if pickle.load(f) != product_ids:
+                print("❌ kNN graph is stale for the current catalog; run `python -m Modules.knn_graph --refresh`")
+                return None
+    mmap_mode = "r" if mmap else None
+    return (
+        np.load(os.path.join(load_dir, NEIGHBORS_FILE), mmap_mode=mmap_mode),
+        np.load(os.path.join(load_dir, SCORES_FILE), mmap_mode=mmap_mode),
+    )
+
+def _insert_neighbor(neighbors: np.ndarray, scores: np.ndarray, row: int, label: int, score: float):
+    # Insert into a row kept sorted by descending score, dropping the weakest entry
+    valid = neighbors[row] >= 0
+    if label in neighbors[row][valid]:
+        return
+    if valid.all() and score <= scores[row, -1]:
+        return
+    pos = int(np.searchsorted(-scores[row][valid].astype(np.float32), -score, side="right"))
+    neighbors[row, pos + 1:] = neighbors[row, pos:-1].copy()
+    scores[row, pos + 1:] = scores[row, pos:-1].copy()
+    neighbors[row, pos] = label
+    scores[row, pos] = score
+
+def refresh_knn_graph(
+    load_dir: str = "Assets",
+    changed_ids: list = (),
+    batch_size: int = 1024,
+    num_workers: int = None,
+    n_neighbors: int = 20
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Update the saved graph after a catalog delta instead of rebuilding it.
+
+    Rows are first remapped to the current labels (so compaction is handled),
+    then recomputed for new and changed products and for products whose
+    lists point at removed or changed ones. Finally the recomputed products
+    are inserted into the lists of their own neighbors where they now rank
+    in the top n. A product that newly belongs in a list without having the
+    list's owner among its own neighbors is picked up by the next full build.
+    Without a saved graph, the whole graph is built instead.
+
+    Args:
+        load_dir: Directory holding the FAISS assets and the graph
+        changed_ids: Product IDs whose vectors changed (e.g. apply_catalog_delta upserts)
+        n_neighbors: Neighbors per product when no graph exists yet (a saved
+            graph keeps its own width)
+
+    Returns:
+        Tuple: (neighbors, scores) after the refresh
+    """
+    graph = load_knn_graph(load_dir, mmap=False)
+    if graph is None:
+        log(f"No kNN graph in {load_dir}; building it from scratch")
+        return build_knn_graph(load_dir, n_neighbors, batch_size, num_workers)
+    old_neighbors, old_scores = graph
+    index, product_ids, vectors = load_faiss_assets(load_dir, mmap=True)
+    with open(os.path.join(load_dir, GRAPH_IDS_FILE), "rb") as f:
+        old_ids = pickle.load(f)
+    n_neighbors = old_neighbors.shape[1]
+
+    label_of = {pid: label for label, pid in enumerate(product_ids) if pid is not None}
+    new_label = np.array([label_of.get(pid, -1) for pid in old_ids] + [-1], dtype=np.int32)  # [-1] maps padding
+    neighbors = np.full((len(product_ids), n_neighbors), -1, dtype=np.int32)
+    scores = np.zeros((len(product_ids), n_neighbors), dtype=np.float16)
+    kept = new_label[:-1] >= 0
+    neighbors[new_label[:-1][kept]] = new_label[old_neighbors[kept]]
+    scores[new_label[:-1][kept]] = old_scores[kept]
+
+    old_id_set = set(old_ids)
+    changed = {label_of[pid] for pid in changed_ids if pid in label_of}
+    changed |= {label for pid, label in label_of.items() if pid not in old_id_set}
+    lost_neighbor = ((old_neighbors >= 0) & (new_label[old_neighbors] < 0)).any(axis=1)
+    stale = set(new_label[:-1][kept & lost_neighbor].tolist())
+    if changed:
+        stale |= set(np.flatnonzero(np.isin(neighbors, list(changed)).any(axis=1)).tolist())
+    recompute = np.array(sorted((changed | stale) & set(label_of.values())), dtype=np.int64)
+
+    log(f"Refreshing {len(recompute)} rows ({len(changed)} new or changed products)")
+    if len(recompute):
+        rows, row_scores = compute_neighbors(index, vectors, product_ids, recompute, n_neighbors, batch_size, num_workers)
+        neighbors[recompute], scores[recompute] = rows, row_scores
+        for label in changed:
+            position = int(np.searchsorted(recompute, label))
+            for neighbor, score in zip(rows[position], row_scores[position]):
+                if neighbor >= 0:
+                    _insert_neighbor(neighbors, scores, neighbor, label, float(score))
+
+    save_knn_graph(neighbors, scores, product_ids, load_dir)
+    return neighbors, scores
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the top-N similar products of every product.")
+    parser.add_argument("--assets", default="Assets")
+    parser.add_argument("-n", "--neighbors", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--workers", type=int, help="Search threads (defaults to the CPU count)")
+    parser.add_argument("--shard", help="Compute one slice of the catalog, e.g. 0/4")
+    parser.add_argument("--merge", type=int, metavar="N_SHARDS", help="Merge N shard files into the graph")
+    parser.add_argument("--refresh", action="store_true", help="Update the saved graph instead of rebuilding it")
+    parser.add_argument("--changed", help="With --refresh: file with one changed product_id per line")
+    args = parser.parse_args()
+
+    if args.merge:
+        merge_knn_shards(args.assets, args.merge)
+    elif args.refresh:
+        changed = []
+        if args.changed:
+            with open(args.changed) as f:
+                changed = [line.strip() for line in f if line.strip()]
+        refresh_knn_graph(args.assets, changed, args.batch_size, args.workers, args.neighbors)
+    else:
+        shard = tuple(int(x) for x in args.shard.split("/")) if args.shard else None
+        build_knn_graph(args.assets, args.neighbors, args.batch_size, args.workers, shard)
+
+if __name__ == "__main__":
+    main()
+
+
+# python -m Modules.knn_graph --assets Assets -n 20
+# python -m Modules.knn_graph --shard 0/4 ... --shard 3/4, then: python -m Modules.knn_graph --merge 4
+# python -m Modules.knn_graph --refresh --changed changed_ids.txt     # after apply_catalog_delta
+
+# from Modules.knn_graph import load_knn_graph
+# knn_graph = load_knn_graph("Assets", product_ids)    # (neighbors, scores) or None
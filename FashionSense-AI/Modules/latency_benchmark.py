@@ -0,0 +1,310 @@
+import io
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import faiss
+import numpy as np
+import pandas as pd
+from PIL import Image
+from Modules.catalog import Catalog, DISPLAY_COLUMNS
+from Modules.dataloader import load_catalog_snapshot, SNAPSHOT_PATH
+from Modules.embedding import load_image_pixels, embed_pixel_batch
+from Modules.faiss_index import make_index, train_index, with_labels, load_faiss_assets, search_index, search_index_batch, IMAGE_DIM
+from Modules.models import get_text_model, warmup, BACKEND
+from Modules.search import search_similar, text_query_cache, image_query_cache
+
+# Stages of one search_similar call, timed separately
+STAGES = ["image_decode", "clip_encode", "text_encode", "concat", "faiss_search", "row_lookup"]
+
+QUERY_WORDS = ["floral", "maxi", "denim", "black", "slim", "linen", "party", "summer", "ruffle", "wide leg"]
+
+def make_synthetic_catalog(n_products: int, seed: int = 0) -> tuple[pd.DataFrame, list, np.ndarray]:
+    """
+    Random catalog with combined vectors shaped like the real ones (a unit
+    512-d image half and a unit 384-d text half).
+
+    Returns:
+        Tuple: (catalog DataFrame, product_ids in label order, vectors [n, 896])
+    """
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n_products, 896), dtype=np.float32)
+    vectors[:, :IMAGE_DIM] /= np.linalg.norm(vectors[:, :IMAGE_DIM], axis=1, keepdims=True)
+    vectors[:, IMAGE_DIM:] /= np.linalg.norm(vectors[:, IMAGE_DIM:], axis=1, keepdims=True)
+    product_ids = [f"synthetic-{i}" for i in range(n_products)]
+    df = pd.DataFrame({
+        "product_id": product_ids,
+        "feature_image_s3": [f"https://example.com/{pid}.jpg" for pid in product_ids],
+        "product_name": [f"Product {i}" for i in range(n_products)],
+        "selling_price": rng.uniform(300, 5000, n_products).round(),
+    })
+    return df, product_ids, vectors
+
+def make_synthetic_images(n_images: int, size: int = 512, seed: int = 0) -> list[bytes]:
+    """
+    Random JPEG-encoded images, as a user upload would arrive.
+    """
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(n_images):
+        buffer = io.BytesIO()
+        Image.fromarray(rng.integers(0, 256, (size, size, 3), dtype=np.uint8)).save(buffer, format="JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+def make_queries(n_queries: int, seed: int = 0) -> list[str]:
+    """
+    Distinct text queries, so the query-embedding cache never hits.
+    """
+    rng = np.random.default_rng(seed)
+    return [f"{' '.join(rng.choice(QUERY_WORDS, 3))} {i}" for i in range(n_queries)]
+
+def build_index(vectors: np.ndarray, index_spec="flat") -> faiss.Index:
+    """
+    ID-mapped index over the vectors, as build_faiss_index makes it.
+    """
+    base = make_index(vectors.shape[1], index_spec, n_train=len(vectors))
+    train_index(base, vectors)
+    index = with_labels(base)
+    index.add_with_ids(vectors, np.arange(len(vectors), dtype="int64"))
+    return index
+
+def latency_stats(latencies_ms: list, queries_per_call: int = 1) -> dict:
+    """
+    Returns:
+        dict: n, mean and p50/p95/p99 in milliseconds, and queries per second
+    """
+    latencies = np.asarray(latencies_ms, dtype=np.float64)
+    return {
+        "n": len(latencies),
+        "mean_ms": round(float(latencies.mean()), 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "qps": round(queries_per_call * 1000 / float(latencies.mean()), 2),
+    }
+
+def _timed(timings: dict, stage: str, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    timings.setdefault(stage, []).append((time.perf_counter() - start) * 1000)
+    return result
+
+def time_search_stages(index, catalog: Catalog, product_ids: list, images: list, texts: list, top_k: int = 10, batch_size: int = 1) -> dict:
+    """
+    Time each stage of the search path, one query or one batch per call.
+
+    Args:
+        index: FAISS index over the combined vectors
+        catalog: Catalog for the row lookup
+        product_ids: Product IDs in label order
+        images: Encoded query images (one per query)
+        texts: Text queries (one per query)
+        top_k: Results per query
+        batch_size: Queries per call; 1 times the single-query path
+
+    Returns:
+        dict: {stage: list of per-call latencies in ms}
+    """
+    text_model = get_text_model()
+    timings = {}
+    for start in range(0, len(texts) - batch_size + 1, batch_size):
+        batch_images, batch_texts = images[start:start + batch_size], texts[start:start + batch_size]
+        call_start = time.perf_counter()
+        pixels = _timed(timings, "image_decode", lambda: np.stack([load_image_pixels(image) for image in batch_images]))
+        image_embeddings = _timed(timings, "clip_encode", embed_pixel_batch, pixels)
+        text_embeddings = _timed(timings, "text_encode", lambda: np.atleast_2d(
+            text_model.encode(batch_texts, batch_size=batch_size, show_progress_bar=False)
+        ))
+        query_vectors = _timed(timings, "concat", lambda: np.concatenate([image_embeddings, text_embeddings], axis=1).astype("float32"))
+        if batch_size == 1:
+            labels = [_timed(timings, "faiss_search", search_index, index, query_vectors[0], top_k)]
+        else:
+            labels = _timed(timings, "faiss_search", search_index_batch, index, query_vectors, top_k)[1]
+        _timed(timings, "row_lookup", lambda: [catalog.get_rows([product_ids[i] for i in row if i >= 0]) for row in labels])
+        timings.setdefault("total", []).append((time.perf_counter() - call_start) * 1000)
+    return timings
+
+def time_search_similar(index, product_ids: list, images: list, texts: list, top_k: int = 10) -> list:
+    """
+    End-to-end search_similar latencies in ms, with the query caches cleared.
+    """
+    latencies = []
+    for image, text in zip(images, texts):
+        text_query_cache.clear()
+        image_query_cache.clear()
+        start = time.perf_counter()
+        search_similar(index, product_ids, image, text, top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def set_threads(threads: int):
+    """
+    Set the intra-op threads of FAISS and PyTorch (ONNX Runtime sessions use
+    FASHIONSENSE_ONNX_THREADS, fixed when they are created).
+    """
+    faiss.omp_set_num_threads(threads)
+    if BACKEND == "torch":
+        import torch
+        torch.set_num_threads(threads)
+
+def run_benchmark(
+    catalog_sizes: list = (10_000, 100_000),
+    thread_counts: list = (1, 4),
+    batch_sizes: list = (1, 8, 32),
+    n_queries: int = 64,
+    top_k: int = 10,
+    index_spec="flat",
+    image_size: int = 512,
+    assets_dir: str = None,
+    seed: int = 0
+) -> dict:
+    """
+    Benchmark the search path over catalog sizes, thread counts and batch sizes.
+
+    Args:
+        catalog_sizes: Synthetic catalog sizes (ignored when assets_dir is set)
+        thread_counts: FAISS/PyTorch thread counts to sweep
+        batch_sizes: Queries per call; 1 is the single-query path the app uses
+        n_queries: Queries timed per configuration
+        top_k: Results per query
+        index_spec: Index type for synthetic catalogs (see Modules.faiss_index.INDEX_SPECS)
+        image_size: Side of the synthetic query images in pixels
+        assets_dir: Benchmark the saved assets in this directory instead
+        seed: Random seed for catalogs, images and queries
+
+    Returns:
+        dict: {"meta": environment, "results": one row per configuration and stage}
+
+    Raises:
+        ValueError: If every batch size is larger than n_queries
+    """
+    # A batch larger than the query set would never run, leaving no timings
+    skipped = [batch_size for batch_size in batch_sizes if batch_size > n_queries]
+    batch_sizes = [batch_size for batch_size in batch_sizes if batch_size <= n_queries]
+    if not batch_sizes:
+        raise ValueError(f"❌ Every batch size in {skipped} is larger than n_queries={n_queries}")
+    if skipped:
+        print(f"❌ Skipping batch sizes {skipped}: larger than n_queries={n_queries}")
+    warmup()
+    images = make_synthetic_images(n_queries, image_size, seed)
+    texts = make_queries(n_queries, seed)
+
+    catalogs = []
+    if assets_dir:
+        index, product_ids, _ = load_faiss_assets(assets_dir, mmap=True, load_vectors=False)
+        snapshot = os.path.join(assets_dir, os.path.basename(SNAPSHOT_PATH))
+        if os.path.exists(snapshot):
+            df = load_catalog_snapshot(snapshot)
+        else:
+            # No metadata saved with the index: look up placeholder rows of the same shape
+            df = pd.DataFrame({"product_id": [pid for pid in product_ids if pid is not None]})
+            df = df.reindex(columns=DISPLAY_COLUMNS, fill_value="")
+        catalogs.append((index, product_ids, df))
+    else:
+        for size in catalog_sizes:
+            df, product_ids, vectors = make_synthetic_catalog(size, seed)
+            catalogs.append((build_index(vectors, index_spec), product_ids, df))
+
+    results = []
+    for index, product_ids, df in catalogs:
+        catalog = Catalog(df, product_ids)
+        for threads in thread_counts:
+            set_threads(threads)
+            config = {"catalog_size": index.ntotal, "threads": threads}
+            for batch_size in batch_sizes:
+                timings = time_search_stages(index, catalog, product_ids, images, texts, top_k, batch_size)
+                for stage in STAGES + ["total"]:
+                    row = {**config, "mode": "single" if batch_size == 1 else "batch", "batch_size": batch_size, "stage": stage}
+                    results.append({**row, **latency_stats(timings[stage], batch_size)})
+                total = results[-1]
+                print(f"📊 {index.ntotal:>9} products  {threads:>2} threads  batch {batch_size:>3}: "
+                      f"p50={total['p50_ms']:.1f}ms  p95={total['p95_ms']:.1f}ms  p99={total['p99_ms']:.1f}ms  {total['qps']:.1f} q/s")
+            latencies = time_search_similar(index, product_ids, images, texts, top_k)
+            results.append({**config, "mode": "single", "batch_size": 1, "stage": "search_similar", **latency_stats(latencies)})
+
+    meta = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "faiss": faiss.__version__,
+        "backend": BACKEND,
+        "index_spec": index_spec if not assets_dir else assets_dir,
+        "n_queries": n_queries,
+        "top_k": top_k,
+        "image_size": image_size,
+    }
+    return {"meta": meta, "results": results}
+
+def compare_results(baseline: dict, current: dict, metric: str = "p95_ms", tolerance: float = 0.1, min_delta_ms: float = 0.5) -> list[dict]:
+    """
+    Match two benchmark outputs row by row and flag slowdowns.
+
+    Args:
+        baseline: Output of run_benchmark from an earlier release
+        current: Output of run_benchmark to check
+        metric: Latency field to compare
+        tolerance: Allowed relative slowdown before a row counts as a regression
+        min_delta_ms: Ignore slowdowns smaller than this, e.g. timer noise on sub-ms stages
+
+    Returns:
+        list[dict]: Rows slower than baseline by more than `tolerance`
+    """
+    def key(row):
+        return row["catalog_size"], row["threads"], row["batch_size"], row["stage"]
+
+    before = {key(row): row for row in baseline["results"]}
+    regressions = []
+    for row in current["results"]:
+        old = before.get(key(row))
+        if old and row[metric] > old[metric] * (1 + tolerance) and row[metric] - old[metric] >= min_delta_ms:
+            regressions.append({**dict(zip(["catalog_size", "threads", "batch_size", "stage"], key(row))),
+                                "before": old[metric], "after": row[metric], "change": round(row[metric] / old[metric] - 1, 3)})
+    for r in regressions:
+        print(f"❌ {r['stage']} ({r['catalog_size']} products, {r['threads']} threads, batch {r['batch_size']}): "
+              f"{metric} {r['before']:.2f} -> {r['after']:.2f} ({r['change']:+.0%})")
+    if not regressions:
+        print(f"✅ No {metric} regressions beyond {tolerance:.0%}")
+    return regressions
+
+def _int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(",")]
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage latency benchmark of the FashionSense search path.")
+    parser.add_argument("--sizes", type=_int_list, default=[10_000, 100_000], help="Synthetic catalog sizes, comma-separated")
+    parser.add_argument("--threads", type=_int_list, default=[1, 4], help="Thread counts, comma-separated")
+    parser.add_argument("--batch-sizes", type=_int_list, default=[1, 8, 32], help="Queries per call, comma-separated")
+    parser.add_argument("--queries", type=int, default=64)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--index", default="flat", help="Index type for synthetic catalogs")
+    parser.add_argument("--image-size", type=int, default=512)
+    parser.add_argument("--assets", help="Benchmark saved assets instead of synthetic catalogs")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="Baseline JSON to check the new results against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative p95 slowdown")
+    args = parser.parse_args()
+    if min(args.batch_sizes) > args.queries:
+        parser.error(f"--queries ({args.queries}) must be at least the smallest batch size")
+
+    report = run_benchmark(
+        args.sizes, args.threads, args.batch_sizes, args.queries, args.k, args.index, args.image_size, args.assets
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Saved results to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(json.load(f), report, tolerance=args.tolerance)
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
+
+
+# python -m Modules.latency_benchmark --sizes 10000,100000,1000000 --threads 1,4,8 --output latency_v1.json
+# python -m Modules.latency_benchmark --assets Assets --threads 4 --compare latency_v1.json
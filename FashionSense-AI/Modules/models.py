@@ -0,0 +1,146 @@
+import os
+import threading
+
+CLIP_MODEL_NAME = "openai/clip-vit-base-patch32"
+TEXT_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Inference backend for query and catalog encoding: "torch" (default) or
+# "onnx" (int8 ONNX Runtime models exported by Modules.onnx_backend)
+BACKEND = os.environ.get("FASHIONSENSE_BACKEND", "torch")
+ONNX_MODEL_DIR = os.environ.get("FASHIONSENSE_ONNX_DIR", os.path.join("Assets", "onnx"))
+ONNX_THREADS = int(os.environ.get("FASHIONSENSE_ONNX_THREADS", "0")) or None
+
+# Loaded models by name; each entry is created once, under its own lock, on first use
+_models = {}
+_locks = {name: threading.Lock() for name in ["device", "clip_processor", "clip", "text", "onnx_image", "onnx_text"]}
+
+def _get_or_load(name: str, loader):
+    model = _models.get(name)
+    if model is not None:
+        return model
+    with _locks[name]:
+        # Another thread may have finished loading while we waited
+        if name not in _models:
+            _models[name] = loader()
+        return _models[name]
+
+def _load_device() -> str:
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+def _load_clip_processor():
+    # from transformers import CLIPProcessor
+    from transformers import AutoProcessor
+    # return CLIPProcessor.from_pretrained("openai/clip-vit-large-patch14", use_fast=True)
+    return AutoProcessor.from_pretrained(CLIP_MODEL_NAME, use_fast=False)
+
+def _load_clip_model():
+    # from transformers import CLIPModel
+    from transformers import AutoModelForZeroShotImageClassification
+    # return CLIPModel.from_pretrained("openai/clip-vit-large-patch14").to(get_device()).eval()
+    return AutoModelForZeroShotImageClassification.from_pretrained(CLIP_MODEL_NAME).to(get_device()).eval()
+
+def _load_text_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(TEXT_MODEL_NAME)
+
+def get_device() -> str:
+    """
+    Return the torch device the encoders run on ("cuda" or "cpu").
+    """
+    return _get_or_load("device", _load_device)
+
+def get_clip_processor():
+    """
+    Return the CLIP image processor (resize + normalize), loading it on first call.
+    """
+    return _get_or_load("clip_processor", _load_clip_processor)
+
+def get_clip() -> tuple:
+    """
+    Return the PyTorch CLIP processor and model, loading them on first call.
+
+    Thread-safe: concurrent first calls load the model once and share it.
+
+    Returns:
+        Tuple: (processor, model)
+    """
+    return get_clip_processor(), _get_or_load("clip", _load_clip_model)
+
+def get_torch_text_model():
+    """
+    Return the PyTorch SentenceTransformer text encoder, loading it on first call.
+    """
+    return _get_or_load("text", _load_text_model)
+
+def get_onnx_image_encoder():
+    """
+    Return the ONNX Runtime CLIP image encoder from ONNX_MODEL_DIR.
+    """
+    from Modules.onnx_backend import OnnxImageEncoder
+    return _get_or_load("onnx_image", lambda: OnnxImageEncoder(ONNX_MODEL_DIR, ONNX_THREADS))
+
+def get_text_model():
+    """
+    Return the text encoder of the configured backend, loading it on first call.
+
+    Both backends expose the SentenceTransformer `encode` interface.
+    """
+    if BACKEND == "onnx":
+        from Modules.onnx_backend import OnnxTextEncoder
+        return _get_or_load("onnx_text", lambda: OnnxTextEncoder(ONNX_MODEL_DIR, ONNX_THREADS))
+    return get_torch_text_model()
+
+def cache_namespace(model_name: str) -> str:
+    """
+    EmbeddingCache name for the vectors a model produces on the configured backend.
+
+    PyTorch vectors keep the bare model name; ONNX vectors are tagged with
+    their precision (e.g. "openai/clip-vit-base-patch32@onnx-int8"), so a
+    cache never mixes vectors from different encoders.
+    """
+    if BACKEND != "onnx":
+        return model_name
+    from Modules.onnx_backend import is_quantized, IMAGE_MODEL_FILE, TEXT_MODEL_FILE
+    filename = IMAGE_MODEL_FILE if model_name == CLIP_MODEL_NAME else TEXT_MODEL_FILE
+    return f"{model_name}@onnx-{'int8' if is_quantized(ONNX_MODEL_DIR, filename) else 'fp32'}"
+
+def is_loaded() -> bool:
+    """
+    True once both encoders of the configured backend are in memory.
+    """
+    if BACKEND == "onnx":
+        return "onnx_image" in _models and "onnx_text" in _models
+    return "clip" in _models and "text" in _models
+
+def warmup(background: bool = False):
+    """
+    Load both encoders and run one tiny forward pass through each, so the
+    first real query does not pay for model loading or kernel setup.
+
+    Args:
+        background: Load in a daemon thread and return immediately
+
+    Returns:
+        threading.Thread when background=True, else None
+    """
+    if background:
+        thread = threading.Thread(target=warmup, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    import numpy as np
+    from Modules.embedding import embed_pixel_batch
+    pixels = get_clip_processor()(images=np.zeros((224, 224, 3), dtype=np.uint8), return_tensors="np")["pixel_values"]
+    embed_pixel_batch(pixels)
+    get_text_model().encode("warmup", show_progress_bar=False)
+    print(f"✅ Encoders loaded and warmed up ({BACKEND} backend)")
+    return None
+
+
+# from Modules.models import get_clip, get_text_model, warmup
+
+# warmup(background=True)                  # start loading at app startup, serve the catalog meanwhile
+# clip_processor, clip_model = get_clip()  # blocks until CLIP is loaded
+# text_model = get_text_model()
+# image_cache = EmbeddingCache("Assets/embedding_cache", cache_namespace(CLIP_MODEL_NAME))
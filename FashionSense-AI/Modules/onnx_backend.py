@@ -0,0 +1,310 @@
+import os
+import sys
+import copy
+import json
+import argparse
+import numpy as np
+
+# File names inside the ONNX model directory
+IMAGE_MODEL_FILE = "clip_image.onnx"
+TEXT_MODEL_FILE = "text_encoder.onnx"
+CONFIG_FILE = "encoders.json"
+
+# Sample queries used by the parity check when no texts are given
+PARITY_TEXTS = [
+    "red floral maxi dress",
+    "black skinny jeans",
+    "white cotton summer dress with puff sleeves",
+    "high waisted blue denim",
+    "sequin party dress",
+]
+
+# Lowest per-input cosine to the PyTorch embedding the parity check accepts;
+# int8 weights cost the CLIP tower more precision than MiniLM
+PARITY_MIN_COSINE = {"text": 0.98, "image": 0.95}
+
+def _session_options(intra_op_threads: int = None):
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if intra_op_threads:
+        options.intra_op_num_threads = intra_op_threads
+    # One query at a time: run operators sequentially and parallelize inside each
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    return options
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+class OnnxImageEncoder:
+    """
+    CLIP image tower running under ONNX Runtime.
+
+    Takes the same preprocessed pixel values as the PyTorch model.
+    """
+
+    def __init__(self, model_dir: str, intra_op_threads: int = None):
+        import onnxruntime as ort
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, _model_file(model_dir, IMAGE_MODEL_FILE)),
+            _session_options(intra_op_threads), providers=["CPUExecutionProvider"]
+        )
+
+    def embed(self, pixel_values: np.ndarray) -> np.ndarray:
+        """
+        Args:
+            pixel_values: Array of shape (batch, 3, 224, 224)
+
+        Returns:
+            np.ndarray: L2-normalized image embeddings, one row per input
+        """
+        (features,) = self.session.run(None, {"pixel_values": np.ascontiguousarray(pixel_values, dtype=np.float32)})
+        return _normalize(features)
+
+class OnnxTextEncoder:
+    """
+    MiniLM text encoder running under ONNX Runtime.
+
+    Mirrors the parts of the SentenceTransformer interface the app uses
+    (`encode` and `get_sentence_embedding_dimension`), so it can stand in
+    for the PyTorch model.
+    """
+
+    def __init__(self, model_dir: str, intra_op_threads: int = None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        with open(os.path.join(model_dir, CONFIG_FILE)) as f:
+            self.config = json.load(f)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, _model_file(model_dir, TEXT_MODEL_FILE)),
+            _session_options(intra_op_threads), providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config["text_dim"]
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        """
+        Encode one string or a list of strings.
+
+        Returns:
+            np.ndarray: L2-normalized embedding (1-D for a single string)
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = np.zeros((len(texts), self.config["text_dim"]), dtype=np.float32)
+        for b in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(
+                texts[b:b + batch_size], padding=True, truncation=True,
+                max_length=self.config["text_max_length"], return_tensors="np"
+            )
+            feeds = {name: tokens[name].astype(np.int64) for name in self.input_names}
+            (embeddings[b:b + batch_size],) = self.session.run(None, feeds)
+        embeddings = _normalize(embeddings)
+        return embeddings[0] if single else embeddings
+
+def is_quantized(model_dir: str, filename: str) -> bool:
+    """
+    True if an int8 copy of the model was exported, which the encoders then load.
+    """
+    return os.path.exists(os.path.join(model_dir, filename.replace(".onnx", ".int8.onnx")))
+
+def _model_file(model_dir: str, filename: str) -> str:
+    # Prefer the int8 model when it was exported
+    return filename.replace(".onnx", ".int8.onnx") if is_quantized(model_dir, filename) else filename
+
+def _text_wrapper(text_model):
+    import torch
+    from sentence_transformers.models import Pooling
+
+    # Older sentence-transformers releases store one boolean flag per pooling mode
+    pooling = [m.get_config_dict() for m in text_model if isinstance(m, Pooling)]
+    if not pooling or not (pooling[0].get("pooling_mode") == "mean" or pooling[0].get("pooling_mode_mean_tokens")):
+        raise ValueError("❌ Only mean-pooled SentenceTransformer models can be exported.")
+
+    class MeanPooledEncoder(torch.nn.Module):
+        def __init__(self, transformer):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, input_ids, attention_mask):
+            tokens = self.transformer(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+            mask = attention_mask.unsqueeze(-1).to(tokens.dtype)
+            return (tokens * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+
+    return MeanPooledEncoder(copy.deepcopy(text_model[0].auto_model).float().cpu()).eval()
+
+def _image_wrapper(clip_model):
+    import torch
+
+    class ImageTower(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, pixel_values):
+            return self.model.get_image_features(pixel_values=pixel_values)
+
+    return ImageTower(copy.deepcopy(clip_model).float().cpu()).eval()
+
+def quantize_model(model_path: str) -> str:
+    """
+    Apply dynamic int8 quantization to the weights of an ONNX model.
+
+    Activations stay in float and are quantized on the fly, so no
+    calibration data is needed.
+
+    Returns:
+        str: Path of the quantized model (next to the input, with .int8.onnx)
+    """
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    output_path = model_path.replace(".onnx", ".int8.onnx")
+    quantize_dynamic(model_path, output_path, weight_type=QuantType.QInt8)
+    return output_path
+
+def export_onnx_models(output_dir: str = os.path.join("Assets", "onnx"), quantize: bool = True, opset: int = 17) -> dict:
+    """
+    Export the CLIP image tower and the MiniLM encoder to ONNX.
+
+    Both graphs take a dynamic batch dimension; the text graph also takes a
+    dynamic sequence length. L2 normalization is applied outside the graph.
+
+    Args:
+        output_dir: Directory for the .onnx files, tokenizer and config
+        quantize: Also write dynamically int8-quantized copies, which the
+            runtime then prefers
+        opset: ONNX opset version
+
+    Returns:
+        dict: Written config (model names, dimensions, max text length)
+    """
+    import torch
+    from Modules.models import get_clip, get_torch_text_model, CLIP_MODEL_NAME, TEXT_MODEL_NAME
+
+    os.makedirs(output_dir, exist_ok=True)
+    _, clip_model = get_clip()
+    text_model = get_torch_text_model()
+
+    image_path = os.path.join(output_dir, IMAGE_MODEL_FILE)
+    image_tower = _image_wrapper(clip_model)
+    dummy_pixels = torch.zeros(1, 3, 224, 224)
+    torch.onnx.export(
+        image_tower, (dummy_pixels,), image_path, input_names=["pixel_values"], output_names=["embeddings"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "embeddings": {0: "batch"}}, opset_version=opset, dynamo=False
+    )
+
+    text_path = os.path.join(output_dir, TEXT_MODEL_FILE)
+    text_encoder = _text_wrapper(text_model)
+    dummy = text_model.tokenizer(["a dress"], return_tensors="pt")
+    torch.onnx.export(
+        text_encoder, (dummy["input_ids"], dummy["attention_mask"]), text_path,
+        input_names=["input_ids", "attention_mask"], output_names=["embeddings"],
+        dynamic_axes={"input_ids": {0: "batch", 1: "tokens"}, "attention_mask": {0: "batch", 1: "tokens"}, "embeddings": {0: "batch"}},
+        opset_version=opset, dynamo=False
+    )
+    text_model.tokenizer.save_pretrained(output_dir)
+
+    with torch.inference_mode():
+        image_dim = int(image_tower(dummy_pixels).shape[1])
+    config = {
+        "clip_model": CLIP_MODEL_NAME,
+        "text_model": TEXT_MODEL_NAME,
+        "image_dim": image_dim,
+        "text_dim": text_model.get_sentence_embedding_dimension(),
+        "text_max_length": text_model.max_seq_length,
+        "quantized": quantize,
+    }
+    with open(os.path.join(output_dir, CONFIG_FILE), "w") as f:
+        json.dump(config, f, indent=2)
+
+    if quantize:
+        for path in [image_path, text_path]:
+            quantized = quantize_model(path)
+            print(f"✅ Quantized {os.path.basename(path)}: {os.path.getsize(path) / 2**20:.1f}MB -> "
+                  f"{os.path.getsize(quantized) / 2**20:.1f}MB")
+    print(f"✅ Exported ONNX encoders to {output_dir}")
+    return config
+
+def _cosines(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return np.sum(_normalize(a) * _normalize(b), axis=1)
+
+def check_parity(
+    model_dir: str = os.path.join("Assets", "onnx"),
+    images: list = None,
+    texts: list = None,
+    intra_op_threads: int = None,
+    min_cosine: dict = None
+) -> dict:
+    """
+    Compare ONNX Runtime embeddings with the PyTorch ones.
+
+    Args:
+        model_dir: Directory written by export_onnx_models
+        images: Image paths (or bytes / PIL images) to compare; skipped if empty
+        texts: Texts to compare (defaults to PARITY_TEXTS)
+        intra_op_threads: ONNX Runtime intra-op threads
+        min_cosine: Per-modality thresholds overriding PARITY_MIN_COSINE
+
+    Returns:
+        dict: Min and mean cosine similarity per modality (1.0 means
+        identical), and whether the min reached the modality's threshold
+    """
+    import torch
+    from Modules.models import get_clip, get_clip_processor, get_torch_text_model
+
+    report = {}
+    texts = texts or PARITY_TEXTS
+    reference = get_torch_text_model().encode(texts, show_progress_bar=False)
+    onnx_text = OnnxTextEncoder(model_dir, intra_op_threads).encode(texts)
+    cosines = _cosines(reference, onnx_text)
+    report["text"] = {"n": len(texts), "min_cosine": float(cosines.min()), "mean_cosine": float(cosines.mean())}
+
+    if images:
+        from Modules.embedding import open_image
+        processor = get_clip_processor()
+        _, clip_model = get_clip()
+        pixels = np.concatenate([processor(images=open_image(image), return_tensors="np")["pixel_values"] for image in images])
+        with torch.inference_mode():
+            features = clip_model.get_image_features(pixel_values=torch.from_numpy(pixels).to(clip_model.device))
+        onnx_images = OnnxImageEncoder(model_dir, intra_op_threads).embed(pixels)
+        cosines = _cosines(features.float().cpu().numpy(), onnx_images)
+        report["image"] = {"n": len(images), "min_cosine": float(cosines.min()), "mean_cosine": float(cosines.mean())}
+
+    thresholds = {**PARITY_MIN_COSINE, **(min_cosine or {})}
+    for modality, stats in report.items():
+        stats["passed"] = stats["min_cosine"] >= thresholds[modality]
+        print(f"📊 {modality}: min cosine {stats['min_cosine']:.5f}, mean cosine {stats['mean_cosine']:.5f} "
+              f"over {stats['n']} inputs (drift {1 - stats['min_cosine']:.2e})")
+        if not stats["passed"]:
+            print(f"❌ {modality} embeddings drifted below the {thresholds[modality]} cosine threshold")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Export FashionSense encoders to ONNX and check parity with PyTorch.")
+    parser.add_argument("--output", default=os.path.join("Assets", "onnx"))
+    parser.add_argument("--no-quantize", action="store_true", help="Skip the int8 copies")
+    parser.add_argument("--skip-export", action="store_true", help="Only run the parity check")
+    parser.add_argument("--parity-images", help="Directory of images for the parity check")
+    parser.add_argument("--parity-limit", type=int, default=32)
+    parser.add_argument("--threads", type=int, help="ONNX Runtime intra-op threads")
+    args = parser.parse_args()
+
+    if not args.skip_export:
+        export_onnx_models(args.output, quantize=not args.no_quantize)
+    images = []
+    if args.parity_images:
+        names = sorted(os.listdir(args.parity_images))[:args.parity_limit]
+        images = [os.path.join(args.parity_images, name) for name in names]
+    report = check_parity(args.output, images=images, intra_op_threads=args.threads)
+    if not all(stats["passed"] for stats in report.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
+
+
+# python -m Modules.onnx_backend --output Assets/onnx --parity-images Data/Images
+# FASHIONSENSE_BACKEND=onnx FASHIONSENSE_ONNX_THREADS=4 streamlit run app.py
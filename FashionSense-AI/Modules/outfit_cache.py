@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from Modules.embedding_cache import hash_text
+
+OUTFIT_CACHE_PATH = os.path.join("Assets", "outfit_cache.db")
+
+def outfit_cache_key(product_id, preferences: tuple, trend_version: str, number_of_suggestions: int, model_name: str = "") -> str:
+    """
+    Cache key of one outfit request.
+
+    Args:
+        product_id: Product the outfit is built around
+        preferences: (brands, styles, description) from summarize_user_preferences;
+            users with the same summary share entries
+        trend_version: Version of the trend string (e.g. its hash_text digest)
+        number_of_suggestions: Number of items requested
+        model_name: LLM the suggestions came from
+
+    Returns:
+        str: Content hash of all the inputs
+    """
+    return hash_text(json.dumps(
+        [str(product_id), hash_text(json.dumps(list(preferences))), trend_version, int(number_of_suggestions), model_name]
+    ))
+
+class OutfitCache:
+    """
+    Persistent cache of generated outfit suggestions, stored in SQLite.
+
+    Entries expire `ttl` seconds after they were written. Beyond
+    `max_entries`, the least recently used entries are evicted on write.
+    Hit and miss counters cover the lifetime of this object.
+    """
+
+    def __init__(self, db_path: str = OUTFIT_CACHE_PATH, ttl: float = 7 * 24 * 3600, max_entries: int = 5000):
+        """
+        Args:
+            db_path: SQLite database file (":memory:" for a throwaway cache)
+            ttl: Seconds an entry stays valid
+            max_entries: Entries kept before LRU eviction
+        """
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS outfit_cache (
+                    key TEXT PRIMARY KEY, response TEXT, created REAL, last_used REAL
+                );
+                CREATE INDEX IF NOT EXISTS outfit_cache_lru ON outfit_cache (last_used);
+            """)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outfit_cache").fetchone()[0]
+
+    def get(self, key: str) -> str:
+        """
+        Return the cached suggestions (marking them recently used), or None
+        when missing or expired.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT response FROM outfit_cache WHERE key = ? AND created > ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE outfit_cache SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        """
+        Store suggestions, dropping expired entries and evicting the least
+        recently used ones when over `max_entries`.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO outfit_cache VALUES (?, ?, ?, ?)", (key, response, now, now))
+            self._conn.execute("DELETE FROM outfit_cache WHERE created <= ?", (now - self.ttl,))
+            self._conn.execute(
+                """DELETE FROM outfit_cache WHERE key IN (
+                       SELECT key FROM outfit_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                   )""",
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        """
+        Remove every entry.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM outfit_cache")
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: hits, misses, hit_rate and number of stored entries
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+        }
+
+
+# from Modules.outfit_cache import OutfitCache
+
+# cache = OutfitCache("Assets/outfit_cache.db", ttl=24 * 3600, max_entries=5000)
+# suggestions = generate_outfit_gemma(image_url, row, user_id, df, user_history, trend_string, hf_token=hf_token, cache=cache)
+# print("📊 Outfit cache:", cache.stats())
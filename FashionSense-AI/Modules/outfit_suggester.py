@@ -1,38 +1,66 @@
 import os
 import json
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from Modules.user_profile import summarize_user_preferences
+from Modules.outfit_cache import outfit_cache_key
+from Modules.embedding_cache import hash_text
 
-def generate_outfit_gemma(image_url, row, user_id, df, user_history, trend_string, number_of_suggestions=5, hf_token=None):
+API_URL = "https://router.huggingface.co/featherless-ai/v1/chat/completions"
+MODEL_NAME = "google/gemma-3-12b-it"
+
+# (connect, read) timeouts in seconds; when streaming, the read timeout applies between chunks
+REQUEST_TIMEOUT = (5, 60)
+MAX_RETRIES = 3
+
+class _CompletionRetry(Retry):
+    # urllib3 also retries 413/503 responses that carry Retry-After; a 503 may
+    # come after the completion was already run and billed
+    RETRY_AFTER_STATUS_CODES = frozenset([429])
+
+# One keep-alive session shared by all requests, so repeated clicks reuse the TLS connection
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
     """
-    Generate outfit suggestions using HF API + image_url.
+    Return the shared HTTP session, creating it on first call.
+
+    Connections are pooled and kept alive. Completions are billed per call,
+    so a POST is only re-sent when the provider cannot have run it: on
+    connection errors and 429 responses, with exponential backoff
+    (honouring Retry-After). Read timeouts and 5xx responses are not retried.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = _CompletionRetry(
+                total=MAX_RETRIES, connect=MAX_RETRIES, read=0, other=0, backoff_factor=0.5,
+                status_forcelist=[429], allowed_methods=["POST"], respect_retry_after_header=True
+            )
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry))
+            _session = session
+        return _session
+
+def build_outfit_prompt(row, user_brands, user_styles, user_description, trend_string, number_of_suggestions=5) -> str:
+    """
+    Build the outfit-completion prompt for a product and a user profile.
 
     Args:
-        image_url (str): Public URL of the product image
         row (pd.Series): Product metadata
-        user_id (str): Unique user identifier
-        df (pd.DataFrame): Product dataframe
-        user_history (dict): Dictionary of user browsing history
+        user_brands (str): Favorite brands
+        user_styles (str): Preferred style features
+        user_description (str): Descriptions of liked products
         trend_string (str): Current trending fashion keywords
         number_of_suggestions (int): Number of items to suggest
-        hf_token (str): Hugging Face access token
 
     Returns:
-        str: Generated fashion outfit suggestions
+        str: Prompt text
     """
-
-    assert hf_token is not None, "❌ HF_TOKEN must be provided."
-    
-    print('Generating Outfit suggestions')
-
-    API_URL = "https://router.huggingface.co/featherless-ai/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {hf_token}"}
-
-    # Step 1: Get user preference summaries
-    user_brands, user_styles, user_description = summarize_user_preferences(user_id, df, user_history, top_k=3)
-
-    # Step 2: Construct prompt
-    prompt_text = f"""
+    return f"""
 Using the image below and the following product and user profile information,
 suggest {number_of_suggestions} stylish outfit items to complete this look.
 
@@ -54,9 +82,25 @@ suggest {number_of_suggestions} stylish outfit items to complete this look.
 💡 Provide creative, trendy outfit pieces. Use bullet points and add a short reason for each. Do not ask follow-up questions.
 """
 
+def _outfit_request(image_url, row, user_id, df, user_history, trend_string, number_of_suggestions, hf_token, catalog, profile_store, cache, stream):
+    assert hf_token is not None, "❌ HF_TOKEN must be provided."
+
+    # Step 1: Get user preference summaries
+    preferences = summarize_user_preferences(
+        user_id, df, user_history, top_k=3, catalog=catalog, store=profile_store
+    )
+    user_brands, user_styles, user_description = preferences
+    cache_key = None
+    if cache is not None:
+        cache_key = outfit_cache_key(row["product_id"], preferences, hash_text(trend_string), number_of_suggestions, MODEL_NAME)
+
+    # Step 2: Construct prompt
+    prompt_text = build_outfit_prompt(row, user_brands, user_styles, user_description, trend_string, number_of_suggestions)
+
+    headers = {"Authorization": f"Bearer {hf_token}"}
     payload = {
-        "model": "google/gemma-3-12b-it",
-        "stream": False,
+        "model": MODEL_NAME,
+        "stream": stream,
         "messages": [
             {
                 "role": "user",
@@ -67,14 +111,110 @@ suggest {number_of_suggestions} stylish outfit items to complete this look.
             }
         ]
     }
+    return headers, payload, cache_key
+
+def generate_outfit_gemma(image_url, row, user_id, df, user_history, trend_string, number_of_suggestions=5, hf_token=None, catalog=None, profile_store=None, cache=None):
+    """
+    Generate outfit suggestions using HF API + image_url.
+
+    Args:
+        image_url (str): Public URL of the product image
+        row (pd.Series): Product metadata
+        user_id (str): Unique user identifier
+        df (pd.DataFrame): Product dataframe
+        user_history (dict): Dictionary of user browsing history
+        trend_string (str): Current trending fashion keywords
+        number_of_suggestions (int): Number of items to suggest
+        hf_token (str): Hugging Face access token
+        catalog (Catalog): Optional product lookup for the user's history
+        profile_store (UserProfileStore): Optional incremental user profiles
+        cache (OutfitCache): Optional cache of earlier suggestions for the same
+            product, preference summary, trends and count
+
+    Returns:
+        str: Generated fashion outfit suggestions
+    """
+    print('Generating Outfit suggestions')
+    headers, payload, cache_key = _outfit_request(
+        image_url, row, user_id, df, user_history, trend_string, number_of_suggestions, hf_token, catalog, profile_store, cache, stream=False
+    )
+    if cache_key is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            print('♻️ Outfit suggestions served from cache')
+            return cached
 
     # Step 3: Call the API
     try:
-        response = requests.post(API_URL, headers=headers, json=payload)
+        response = get_session().post(API_URL, headers=headers, json=payload, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         result = response.json()
         print('Outfit suggestions generated successfully')
-        return result["choices"][0]["message"]["content"]
+        suggestions = result["choices"][0]["message"]["content"]
+        if cache_key is not None:
+            cache.put(cache_key, suggestions)
+        return suggestions
     except Exception as e:
         return f"❌ Error generating outfit: {str(e)}"
 
+def stream_outfit_gemma(image_url, row, user_id, df, user_history, trend_string, number_of_suggestions=5, hf_token=None, catalog=None, profile_store=None, cache=None):
+    """
+    Stream outfit suggestions token by token from the server-sent event stream.
+
+    Takes the same arguments as generate_outfit_gemma. Cached suggestions
+    are yielded as a single chunk; only streams that reached the [DONE]
+    event are written to the cache.
+
+    Yields:
+        str: Text chunks as the model produces them; on failure a final
+        "❌ Error generating outfit: ..." chunk
+    """
+    print('Streaming Outfit suggestions')
+    headers, payload, cache_key = _outfit_request(
+        image_url, row, user_id, df, user_history, trend_string, number_of_suggestions, hf_token, catalog, profile_store, cache, stream=True
+    )
+    if cache_key is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            print('♻️ Outfit suggestions served from cache')
+            yield cached
+            return
+
+    tokens = []
+    done = False
+    try:
+        with get_session().post(API_URL, headers=headers, json=payload, timeout=REQUEST_TIMEOUT, stream=True) as response:
+            response.raise_for_status()
+            # SSE responses often omit the charset, which requests would decode as Latin-1
+            response.encoding = "utf-8"
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    done = True
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                token = (choices[0].get("delta") or {}).get("content")
+                if token:
+                    tokens.append(token)
+                    yield token
+        if not done:
+            # The connection closed mid-answer: show what arrived, but never cache it
+            print('❌ Outfit stream ended before [DONE]')
+            return
+        print('Outfit suggestions streamed successfully')
+        if cache_key is not None and tokens:
+            cache.put(cache_key, "".join(tokens))
+    except Exception as e:
+        yield f"❌ Error generating outfit: {str(e)}"
+
+
+# from Modules.outfit_suggester import generate_outfit_gemma, stream_outfit_gemma
+
+# # whole answer at once
+# text = generate_outfit_gemma(image_url, row, user_id, df, user_history, trend_string, hf_token=hf_token)
+
+# # progressive rendering, e.g. st.write_stream(stream_outfit_gemma(...))
+# for token in stream_outfit_gemma(image_url, row, user_id, df, user_history, trend_string, hf_token=hf_token):
+#     print(token, end="", flush=True)
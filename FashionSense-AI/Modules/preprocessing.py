@@ -56,11 +56,9 @@ def prepare_text_for_embedding(df: pd.DataFrame) -> list[str]:
     Returns:
         list[str]: Combined text inputs for SentenceTransformer.
     """
-    texts = []
-    for _, row in df.iterrows():
-        combined = f"{row['product_name']} {row['description']} {row['meta_info']} {row['style_attributes']}"
-        texts.append(combined)
-    return texts
+    columns = ["product_name", "description", "meta_info", "style_attributes"]
+    parts = [df[col].map(str) for col in columns]
+    return parts[0].str.cat(parts[1:], sep=" ").tolist()
 
 # from modules.preprocessing import fill_missing_fields, prepare_text_for_embedding
 
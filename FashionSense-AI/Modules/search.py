@@ -1,90 +1,612 @@
 import os
 import numpy as np
 from PIL import Image as PILImage
-import torch
-from Modules.embedding import clip_model, clip_processor, text_model
-from Modules.faiss_index import search_index
+from Modules.embedding import load_image_pixels, embed_pixel_batch
+from Modules.models import get_text_model
+from Modules.embedding_cache import hash_bytes
+from Modules.faiss_index import (
+    search_index, search_index_batch, reconstruct_vectors, make_id_selector, make_exclusion_selector, MODALITY_SLICES, IMAGE_DIM
+)
+from Modules.utils import LRUCache
 
-# Use CUDA if available
-device = "cuda" if torch.cuda.is_available() else "cpu"
+# Candidates fetched per modality (as a multiple of top_k) before late fusion
+FUSION_DEPTH = 4
 
-def encode_image(image_path: str) -> np.ndarray:
+# Filters matching at most this many products are ranked exactly over the
+# stored vectors instead of searching the index with an ID selector
+EXACT_FILTER_LIMIT = 20_000
+
+# Query embeddings survive Streamlit reruns: keyed by normalized text and image bytes
+text_query_cache = LRUCache(maxsize=1024)
+image_query_cache = LRUCache(maxsize=256)
+
+def _image_cache_key(image) -> str:
+    if isinstance(image, PILImage.Image):
+        return hash_bytes(f"{image.mode}{image.size}".encode() + image.tobytes())
+    if isinstance(image, (bytes, bytearray)):
+        return hash_bytes(bytes(image))
+    with open(image, "rb") as f:
+        return hash_bytes(f.read())
+
+def _has_image(image) -> bool:
+    return image is not None and not (isinstance(image, (str, bytes, bytearray)) and len(image) == 0)
+
+def encode_image(image_path) -> np.ndarray:
     """
-    Encode an image using CLIP to get its 768D embedding.
+    Encode an image using CLIP to get its 512D embedding.
+
+    Results are cached by a hash of the image content, so re-encoding the
+    same upload skips the model.
 
     Args:
-        image_path (str): Path to the image.
+        image_path: Path to the image, raw encoded image bytes (e.g. an
+            upload) or a PIL image.
 
     Returns:
-        np.ndarray: Image embedding.
+        np.ndarray: Image embedding (read-only).
     """
     try:
-        image = PILImage.open(image_path).convert("RGB")
-        inputs = clip_processor(images=image, return_tensors="pt").to(device)
-
-        with torch.no_grad():
-            features = clip_model.get_image_features(**inputs)
-            emb = torch.nn.functional.normalize(features, p=2, dim=-1).cpu().numpy()[0]
-        return emb
-    except Exception as e:
+        key = _image_cache_key(image_path)
+    except OSError as e:
         raise ValueError(f"Error processing image {image_path}: {e}")
+    emb = image_query_cache.get(key)
+    if emb is not None:
+        return emb
+
+    pixels = load_image_pixels(image_path)
+    if pixels is None:
+        raise ValueError(f"Error processing image {image_path if isinstance(image_path, str) else type(image_path).__name__}")
+    emb = embed_pixel_batch(pixels[np.newaxis])[0]
+    emb.setflags(write=False)
+    image_query_cache.put(key, emb)
+    return emb
+
+def normalize_query(text_query: str) -> str:
+    """
+    Normalize a text query for caching: lowercase and collapse whitespace.
+    The MiniLM tokenizer is uncased, so this does not change the embedding.
+    """
+    return " ".join(text_query.lower().split())
 
 def encode_text(text_query: str) -> np.ndarray:
     """
     Encode a text query using SentenceTransformer.
 
+    Results are cached by normalized query text.
+
     Args:
         text_query (str): Input query string.
 
     Returns:
-        np.ndarray: Text embedding.
+        np.ndarray: Text embedding (read-only).
+    """
+    key = normalize_query(text_query)
+    emb = text_query_cache.get(key)
+    if emb is None:
+        emb = get_text_model().encode(key, show_progress_bar=False)
+        emb.setflags(write=False)
+        text_query_cache.put(key, emb)
+    return emb
+
+def _similarities(distances: np.ndarray) -> np.ndarray:
+    # Squared L2 between unit vectors: cosine = 1 - d / 2
+    return 1.0 - distances / 2.0
+
+def fuse_modality_results(image_hits: tuple, text_hits: tuple, image_weight: float = 0.5) -> list[int]:
+    """
+    Weighted late fusion of one query's image and text search results.
+
+    Each label is scored image_weight * image cosine + (1 - image_weight) *
+    text cosine. A label found by only one modality gets the lowest cosine
+    returned by the other one, an upper bound on its true score there.
+
+    Args:
+        image_hits: (distances, labels) from the image index, 1-D each
+        text_hits: (distances, labels) from the text index, 1-D each
+        image_weight: Weight of the image similarity, between 0 and 1
+
+    Returns:
+        List of labels, best fused score first
+    """
+    scores = []
+    for distances, labels in [image_hits, text_hits]:
+        valid = labels >= 0
+        sims = _similarities(distances[valid])
+        floor = float(sims.min()) if len(sims) else -1.0
+        scores.append((dict(zip(labels[valid].tolist(), sims.tolist())), floor))
+
+    (image_sims, image_floor), (text_sims, text_floor) = scores
+    fused = {
+        label: image_weight * image_sims.get(label, image_floor) + (1 - image_weight) * text_sims.get(label, text_floor)
+        for label in image_sims.keys() | text_sims.keys()
+    }
+    return sorted(fused, key=fused.get, reverse=True)
+
+def exact_search(vectors: np.ndarray, labels: np.ndarray, query_vector: np.ndarray, top_k: int = 5) -> list[int]:
+    """
+    Rank a small set of products exactly by L2 distance to the query.
+
+    Args:
+        vectors: Combined vectors in label order (may be memory-mapped)
+        labels: Candidate labels
+        query_vector: Combined query vector
+
+    Returns:
+        List of up to top_k labels, closest first
+    """
+    subset = np.asarray(vectors[labels], dtype=np.float32)
+    distances = ((subset - query_vector) ** 2).sum(axis=1)
+    return labels[np.argsort(distances, kind="stable")[:top_k]].tolist()
+
+def search_modalities(
+    modality_indexes: dict,
+    image_embedding: np.ndarray = None,
+    text_embedding: np.ndarray = None,
+    top_k: int = 5,
+    image_weight: float = 0.5,
+    selector=None,
+    candidates: np.ndarray = None,
+    vectors: np.ndarray = None
+) -> list[int]:
+    """
+    Search the per-modality indexes for one query.
+
+    A single-modality query searches only the matching index (512-d image or
+    384-d text vectors). With both embeddings, each index returns
+    FUSION_DEPTH * top_k candidates and the lists are fused by weighted
+    cosine similarity.
+
+    Args:
+        modality_indexes (dict): {"image": index, "text": index}, see load_modality_indexes
+        image_embedding: Optional CLIP query embedding
+        text_embedding: Optional text query embedding
+        top_k: Number of labels to return
+        image_weight: Weight of the image similarity when fusing
+        selector: Optional ID selector restricting the searchable labels
+        candidates: Optional labels to rank exactly from `vectors` instead of
+            searching the indexes (used for selective filters)
+        vectors: Combined vectors in label order, required with candidates
+
+    Returns:
+        List of labels (positions in product_ids), best first
     """
-    return text_model.encode(text_query, show_progress_bar=False)
+    queries = {name: emb for name, emb in [("image", image_embedding), ("text", text_embedding)] if emb is not None}
+    for name, emb in queries.items():
+        if emb.shape[0] != modality_indexes[name].d:
+            raise ValueError(f"Query {name} dim {emb.shape[0]} does not match {name} index dim {modality_indexes[name].d}")
+    weights = {"image": image_weight, "text": 1 - image_weight} if len(queries) == 2 else {name: 1.0 for name in queries}
+
+    if candidates is not None:
+        # Exact weighted cosine over the candidates' stored vectors
+        subset = np.asarray(vectors[candidates], dtype=np.float32)
+        scores = sum(weights[name] * (subset[:, MODALITY_SLICES[name]] @ emb) for name, emb in queries.items())
+        return candidates[np.argsort(-scores, kind="stable")[:top_k]].tolist()
+
+    if len(queries) == 1:
+        name, emb = next(iter(queries.items()))
+        return search_index(modality_indexes[name], emb, top_k=top_k, selector=selector)
+
+    hits = {}
+    for name, emb in queries.items():
+        distances, labels = search_index_batch(modality_indexes[name], emb[np.newaxis], top_k * FUSION_DEPTH, selector)
+        hits[name] = (distances[0], labels[0])
+    return fuse_modality_results(hits["image"], hits["text"], image_weight)[:top_k]
 
 def search_similar(
     faiss_index,
     product_ids: list,
-    query_image_path: str = None,
+    query_image_path=None,
     query_text: str = None,
-    top_k: int = 5
+    top_k: int = 5,
+    modality_indexes: dict = None,
+    image_weight: float = 0.5,
+    filters: dict = None,
+    catalog=None,
+    vectors: np.ndarray = None,
+    query_product_id: str = None,
+    knn_graph: tuple = None
 ) -> list[str]:
     """
     Perform hybrid visual + textual similarity search.
 
+    With per-modality indexes, image-only and text-only queries search the
+    matching index and image + text queries use weighted late fusion.
+    Otherwise the missing modality is zero-filled and the combined index is
+    searched.
+
+    Filters are evaluated for all products at once on the catalog's
+    label-aligned arrays. Selective filters (at most EXACT_FILTER_LIMIT
+    matches) are ranked exactly over the stored vectors when given; others
+    are pushed into FAISS as an ID selector, so only matching products are
+    scored. Exact ranking and flat indexes return top_k results whenever
+    enough products match; IVF/HNSW indexes may return fewer for filters
+    that match few of the probed lists or graph neighbours.
+
+    A catalog product can be the query instead ("more like this"): its
+    precomputed neighbors are read from the kNN graph when it holds enough
+    (after filtering), otherwise its stored vector is searched.
+
     Args:
         faiss_index: Loaded FAISS index
         product_ids: List of product_ids corresponding to FAISS order
-        query_image_path: Optional path to input image
+        query_image_path: Optional input image (path, raw bytes or PIL image)
         query_text: Optional text query
         top_k: Number of results to return
+        modality_indexes: Optional {"image": index, "text": index}, see load_modality_indexes
+        image_weight: Weight of the image similarity for image + text queries
+        filters (dict): Optional metadata filters, e.g. {"selling_price": (None, 2000),
+            "brand": ["Zara"]}; see Catalog.filter_mask
+        catalog: Catalog built with the same product_ids, required with filters
+        vectors: Optional (memory-mapped) combined vectors in FAISS order
+        query_product_id: Optional catalog product to find similar items for;
+            the image and text queries are then ignored
+        knn_graph: Optional (neighbors, scores) from Modules.knn_graph.load_knn_graph
 
     Returns:
         List of product_ids ranked by similarity
     """
-    # Encode image
-    if query_image_path:
-        image_embedding = encode_image(query_image_path)
-    else:
-        image_embedding = np.zeros(512, dtype=np.float32)
+    # Resolve filters to an exact candidate list or a FAISS selector
+    selector = candidates = None
+    if filters:
+        if catalog is None:
+            raise ValueError("search_similar needs the catalog to apply filters")
+        mask = catalog.filter_mask(filters)
+        if not mask.any():
+            return []
+        if vectors is not None and mask.sum() <= EXACT_FILTER_LIMIT:
+            candidates = np.flatnonzero(mask)
+        else:
+            selector = make_id_selector(mask)
+
+    query_label = None
+    if query_product_id is not None:
+        label_of = catalog.label_of if catalog is not None else {pid: label for label, pid in enumerate(product_ids) if pid is not None}
+        if query_product_id not in label_of:
+            raise ValueError(f"Unknown product_id {query_product_id}")
+        query_label = label_of[query_product_id]
+
+        # Fast path: precomputed neighbors are a plain array lookup
+        if knn_graph is not None and query_label < len(knn_graph[0]):
+            row = np.asarray(knn_graph[0][query_label])
+            row = row[row >= 0]
+            if filters:
+                row = row[mask[row]]
+            neighbor_ids = [product_ids[i] for i in row if product_ids[i] is not None]
+            if len(neighbor_ids) >= top_k:
+                return neighbor_ids[:top_k]
 
-    # Encode text
-    if query_text:
-        text_embedding = encode_text(query_text)
+        # Otherwise search with the product's stored vector, skipping the product itself
+        stored = reconstruct_vectors(faiss_index, [query_label], vectors)[0]
+        image_embedding, text_embedding = stored[:IMAGE_DIM], stored[IMAGE_DIM:]
+        top_k += 1
     else:
-        text_embedding = np.zeros(384, dtype=np.float32)
+        # Encode image
+        image_embedding = encode_image(query_image_path) if _has_image(query_image_path) else None
 
-    # Combine embeddings
-    query_vector = np.concatenate([image_embedding, text_embedding]).astype("float32")
+        # Encode text
+        text_embedding = encode_text(query_text) if query_text else None
+
+    used = [name for name, emb in [("image", image_embedding), ("text", text_embedding)] if emb is not None]
+    if used and modality_indexes and all(name in modality_indexes for name in used):
+        top_indices = search_modalities(
+            modality_indexes, image_embedding, text_embedding, top_k, image_weight,
+            selector=selector, candidates=candidates, vectors=vectors
+        )
+    else:
+        # Combine embeddings, zero-filling the missing modality
+        if image_embedding is None:
+            image_embedding = np.zeros(512, dtype=np.float32)
+        if text_embedding is None:
+            text_embedding = np.zeros(384, dtype=np.float32)
+        query_vector = np.concatenate([image_embedding, text_embedding]).astype("float32")
 
-    # Validate input dimension
-    if query_vector.shape[0] != faiss_index.d:
-        raise ValueError(f"Query vector dim {query_vector.shape[0]} does not match FAISS index dim {faiss_index.d}")
+        # Validate input dimension
+        if query_vector.shape[0] != faiss_index.d:
+            raise ValueError(f"Query vector dim {query_vector.shape[0]} does not match FAISS index dim {faiss_index.d}")
 
-    # Search in FAISS
-    top_indices = search_index(faiss_index, query_vector, top_k=top_k)
+        # Search in FAISS
+        if candidates is not None:
+            top_indices = exact_search(vectors, candidates, query_vector, top_k)
+        else:
+            top_indices = search_index(faiss_index, query_vector, top_k=top_k, selector=selector)
 
     # Return product_ids of top results
-    return [product_ids[i] for i in top_indices if i < len(product_ids)]
+    results = [
+        product_ids[i] for i in top_indices
+        if 0 <= i < len(product_ids) and product_ids[i] is not None and i != query_label
+    ]
+    return results[:top_k - 1] if query_label is not None else results
+
+
+def encode_images(images: list) -> np.ndarray:
+    """
+    Encode several images with one batched CLIP forward pass.
+
+    Args:
+        images (list): Image paths, raw bytes or PIL images.
+
+    Returns:
+        np.ndarray: Image embeddings, one row per image.
+    """
+    pixels = [load_image_pixels(image) for image in images]
+    failed = [i for i, p in enumerate(pixels) if p is None]
+    if failed:
+        raise ValueError(f"Error processing images at positions {failed}")
+    return embed_pixel_batch(np.stack(pixels))
+
+def encode_texts_batch(texts: list[str]) -> np.ndarray:
+    """
+    Encode several text queries in one SentenceTransformer call.
+
+    Returns:
+        np.ndarray: Text embeddings, one row per query.
+    """
+    # Same normalization as encode_text, so batched and single queries embed alike
+    texts = [normalize_query(text) for text in texts]
+    return get_text_model().encode(texts, batch_size=len(texts), show_progress_bar=False)
+
+def build_query_vectors(query_images: list = None, query_texts: list = None) -> np.ndarray:
+    """
+    Build combined query vectors for aligned lists of images and texts.
+
+    Either list may be omitted or contain None/empty entries; the missing
+    modality is zero-filled as in search_similar.
+
+    Returns:
+        np.ndarray: Matrix of shape [n_queries, 896]
+    """
+    n_queries = max(len(query_images or []), len(query_texts or []))
+    image_part = np.zeros((n_queries, 512), dtype=np.float32)
+    text_part = np.zeros((n_queries, 384), dtype=np.float32)
+
+    image_rows = [i for i, image in enumerate(query_images or []) if _has_image(image)]
+    if image_rows:
+        image_part[image_rows] = encode_images([query_images[i] for i in image_rows])
+
+    text_rows = [i for i, text in enumerate(query_texts or []) if text]
+    if text_rows:
+        text_part[text_rows] = encode_texts_batch([query_texts[i] for i in text_rows])
+
+    return np.concatenate([image_part, text_part], axis=1)
+
+def merge_search_results(distances: np.ndarray, labels: np.ndarray, product_ids: list, exclude=()) -> tuple[list, list]:
+    """
+    Merge per-query FAISS results into one ranked list.
+
+    Hits from all queries are ordered by distance; each product keeps its
+    best hit, and empty slots, deleted products and excluded IDs are dropped.
+
+    Args:
+        distances: FAISS distances, shape [n_queries, k]
+        labels: FAISS labels, shape [n_queries, k]
+        product_ids: List of product_ids corresponding to FAISS labels
+        exclude: Product IDs to leave out
+
+    Returns:
+        Tuple: (unique product_ids closest first, their distances)
+    """
+    exclude = set(exclude)
+    merged, merged_distances, seen = [], [], set()
+    for flat_pos in np.argsort(distances, axis=None, kind="stable"):
+        label = labels.flat[flat_pos]
+        if label < 0 or label >= len(product_ids):
+            continue
+        pid = product_ids[label]
+        if pid is None or pid in seen or pid in exclude:
+            continue
+        seen.add(pid)
+        merged.append(pid)
+        merged_distances.append(float(distances.flat[flat_pos]))
+    return merged, merged_distances
+
+def split_search_results(distances: np.ndarray, labels: np.ndarray, product_ids: list, top_k: int, exclude=(), dedupe: bool = False) -> tuple[list, list]:
+    """
+    Turn FAISS results into per-query product_id and distance lists.
+
+    Args:
+        distances: FAISS distances, shape [n_queries, k]
+        labels: FAISS labels, shape [n_queries, k]
+        product_ids: List of product_ids corresponding to FAISS labels
+        top_k: Maximum results kept per query
+        exclude: Product IDs to leave out of every query
+        dedupe: Keep each product only under the query it is closest to
+
+    Returns:
+        Tuple: (list of product_id lists, list of distance lists), one entry per query
+    """
+    exclude = set(exclude)
+    owner = {}
+    if dedupe:
+        for flat_pos in np.argsort(distances, axis=None, kind="stable"):
+            label = labels.flat[flat_pos]
+            if label >= 0:
+                owner.setdefault(label, flat_pos // labels.shape[1])
+
+    ids, dists = [], []
+    for q in range(labels.shape[0]):
+        query_ids, query_dists = [], []
+        for label, dist in zip(labels[q], distances[q]):
+            if label < 0 or label >= len(product_ids) or (dedupe and owner[label] != q):
+                continue
+            pid = product_ids[label]
+            if pid is None or pid in exclude:
+                continue
+            query_ids.append(pid)
+            query_dists.append(float(dist))
+            if len(query_ids) == top_k:
+                break
+        ids.append(query_ids)
+        dists.append(query_dists)
+    return ids, dists
+
+def search_similar_batch(
+    faiss_index,
+    product_ids: list,
+    query_images: list = None,
+    query_texts: list = None,
+    query_vectors: np.ndarray = None,
+    top_k: int = 5,
+    exclude_ids=(),
+    dedupe: bool = False,
+    merge: bool = False,
+    filters: dict = None,
+    catalog=None,
+    vectors: np.ndarray = None,
+    query_product_ids: list = None
+) -> tuple[list, list]:
+    """
+    Run many hybrid searches with batched encoding and one FAISS call.
+
+    Queries are given either as aligned lists of image paths and texts
+    (encoded in batches), as ready-made combined vectors, or as catalog
+    products whose stored vectors are searched. Per query, the results are
+    those of search_similar on the combined index.
+
+    Args:
+        faiss_index: Loaded FAISS index
+        product_ids: List of product_ids corresponding to FAISS order
+        query_images: Optional list of images as paths, bytes or PIL images (None entries allowed)
+        query_texts: Optional list of text queries (None/empty entries allowed)
+        query_vectors: Optional matrix of combined vectors, used instead of images/texts
+        top_k: Number of results per query
+        exclude_ids: Product IDs to leave out of all results
+        dedupe: Keep each product only under the query it is closest to
+            (queries may then return fewer than top_k results)
+        merge: Return one list merged across queries instead of per-query lists
+        filters (dict): Optional metadata filters, see search_similar
+        catalog: Catalog built with the same product_ids, required with filters
+        vectors: Optional (memory-mapped) combined vectors in FAISS order
+        query_product_ids: Optional catalog products to find similar items
+            for, used instead of images/texts/vectors; each query's own
+            product is left out of its results
+
+    Returns:
+        Tuple: (product_ids, distances). Per-query lists of lists, or flat
+        lists ranked by distance when merge=True
+    """
+    query_labels = None
+    if query_product_ids is not None:
+        label_of = catalog.label_of if catalog is not None else {pid: label for label, pid in enumerate(product_ids) if pid is not None}
+        unknown = [pid for pid in query_product_ids if pid not in label_of]
+        if unknown:
+            raise ValueError(f"Unknown product_ids {unknown}")
+        query_labels = np.array([label_of[pid] for pid in query_product_ids], dtype="int64")
+        query_vectors = reconstruct_vectors(faiss_index, query_labels, vectors)
+    elif query_vectors is None:
+        query_vectors = build_query_vectors(query_images, query_texts)
+    query_vectors = np.atleast_2d(query_vectors)
+    if len(query_vectors) == 0:
+        return [], []
+    if query_vectors.shape[1] != faiss_index.d:
+        raise ValueError(f"Query vector dim {query_vectors.shape[1]} does not match FAISS index dim {faiss_index.d}")
+
+    selector = None
+    if filters:
+        if catalog is None:
+            raise ValueError("search_similar_batch needs the catalog to apply filters")
+        mask = catalog.filter_mask(filters)
+        if not mask.any():
+            return ([], []) if merge else ([[] for _ in query_vectors], [[] for _ in query_vectors])
+        selector = make_id_selector(mask)
+
+    # Over-fetch so excluded products (and each query's own product) do not leave queries short
+    exclude_ids = set(exclude_ids)
+    extra = len(exclude_ids) + (query_labels is not None)
+    distances, labels = search_index_batch(faiss_index, query_vectors, top_k + extra, selector)
+    if query_labels is not None:
+        labels = np.where(labels == query_labels[:, np.newaxis], -1, labels)
+
+    if merge:
+        return merge_search_results(distances, labels, product_ids, exclude=exclude_ids)
+    return split_search_results(distances, labels, product_ids, top_k, exclude=exclude_ids, dedupe=dedupe)
+
+def search_by_product_ids(
+    faiss_index,
+    product_ids: list,
+    query_ids: list,
+    top_k: int = 5,
+    vectors: np.ndarray = None,
+    label_of: dict = None,
+    knn_graph: tuple = None
+) -> list[str]:
+    """
+    Find products similar to catalog products using their stored vectors.
+
+    No image download or model call is needed: each product's combined
+    vector is read back and all products are searched in one batched call.
+    With a kNN graph the neighbor rows are merged directly and FAISS is not
+    searched at all.
+
+    Args:
+        faiss_index: Loaded FAISS index
+        product_ids: List of product_ids corresponding to FAISS order
+        query_ids: Catalog product_ids to find neighbors for
+        top_k: Neighbors per query product (excluding the product itself)
+        vectors: Optional (memory-mapped) combined vectors in FAISS order
+        label_of: Optional {product_id: FAISS label} map, e.g. Catalog.label_of
+        knn_graph: Optional (neighbors, scores) from Modules.knn_graph.load_knn_graph
+
+    Returns:
+        List of product_ids merged across queries, closest first, without
+        duplicates or the query products themselves
+    """
+    if label_of is None:
+        label_of = {pid: label for label, pid in enumerate(product_ids) if pid is not None}
+    labels = [label_of[pid] for pid in query_ids if pid in label_of]
+    if not labels:
+        return []
+
+    if knn_graph is not None and max(labels) < len(knn_graph[0]):
+        neighbors, scores = knn_graph
+        width = top_k + len(query_ids)
+        # Higher score is closer: negate so merge_search_results can rank it like a distance
+        return merge_search_results(
+            -np.asarray(scores[labels, :width], dtype=np.float32), np.asarray(neighbors[labels, :width]),
+            product_ids, exclude=query_ids
+        )[0]
+
+    query_vectors = reconstruct_vectors(faiss_index, labels, vectors)
+    merged_ids, _ = search_similar_batch(
+        faiss_index, product_ids, query_vectors=query_vectors, top_k=top_k, exclude_ids=query_ids, merge=True
+    )
+    return merged_ids
+
+def search_by_taste(
+    faiss_index,
+    product_ids: list,
+    taste_vector: np.ndarray,
+    exclude_ids: list = (),
+    top_k: int = 5,
+    label_of: dict = None
+) -> list[str]:
+    """
+    Personalized recommendations from a user's taste vector in one FAISS query.
+
+    Args:
+        faiss_index: Loaded FAISS index
+        product_ids: List of product_ids corresponding to FAISS order
+        taste_vector: Combined-space centroid from UserProfileStore.get_taste
+        exclude_ids: Products never to return, e.g. the user's history
+        top_k: Number of recommendations
+        label_of: Optional {product_id: FAISS label} map, e.g. Catalog.label_of
+
+    Returns:
+        List of up to top_k product_ids, closest to the user's taste first
+    """
+    # A centroid of unit vectors is shorter than they are: rescale each
+    # modality back to unit length so it lands among the stored vectors
+    query_vector = np.asarray(taste_vector, dtype=np.float32).copy()
+    for columns in MODALITY_SLICES.values():
+        norm = np.linalg.norm(query_vector[columns])
+        if norm > 0:
+            query_vector[columns] /= norm
+
+    if label_of is None:
+        label_of = {pid: label for label, pid in enumerate(product_ids) if pid is not None}
+    excluded = [label_of[pid] for pid in exclude_ids if pid in label_of]
+    selector = make_exclusion_selector(excluded) if excluded else None
+    top_indices = search_index(faiss_index, query_vector, top_k=top_k, selector=selector)
+    return [product_ids[i] for i in top_indices if 0 <= i < len(product_ids) and product_ids[i] is not None]
 
 
 # from modules.search import search_similar
@@ -101,4 +623,32 @@ def search_similar(
 # # display product details
 # for pid in top_product_ids:
 #     row = df[df["product_id"] == pid].iloc[0]
-#     print(row["product_name"], row["brand"], row["selling_price"])
\ No newline at end of file
+#     print(row["product_name"], row["brand"], row["selling_price"])
+
+# # route to the image/text sub-indexes when they were built
+# modality_indexes = load_modality_indexes("Assets", mmap=True)
+# top_product_ids = search_similar(faiss_index, ids, query_text="floral maxi dress", modality_indexes=modality_indexes)
+
+# # "similar to this, under 2000, from these brands"
+# top_product_ids = search_similar(
+#     faiss_index, ids, query_image_path="path/to/query.jpg", top_k=10,
+#     filters={"selling_price": (None, 2000), "brand": ["Zara", "H&M"]}, catalog=catalog, vectors=vectors
+# )
+
+# # several queries in one call, e.g. offline evaluation or "shop the look"
+# ids_per_query, distances_per_query = search_similar_batch(
+#     faiss_index, ids, query_texts=["floral maxi dress", "black skinny jeans"], top_k=10, dedupe=True
+# )
+# ids_per_query, _ = search_similar_batch(
+#     faiss_index, ids, query_product_ids=cart_ids, top_k=10, filters={"brand": ["Zara"]}, catalog=catalog, vectors=vectors
+# )
+
+# # "more like these" for a user's history, one batched FAISS call
+# similar_ids = search_by_product_ids(faiss_index, ids, history_ids, top_k=3, vectors=vectors)
+
+# # personalized picks from the user's taste vector, history excluded, one FAISS call
+# suggestion_ids = search_by_taste(faiss_index, ids, profile_store.get_taste(user_id), exclude_ids=history_ids, top_k=10)
+
+# # "more like this product" from the precomputed graph (python -m Modules.knn_graph)
+# knn_graph = load_knn_graph("Assets", ids)
+# similar_ids = search_similar(faiss_index, ids, query_product_id=ids[0], top_k=10, knn_graph=knn_graph)
\ No newline at end of file
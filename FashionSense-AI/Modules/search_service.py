@@ -0,0 +1,200 @@
+import os
+import uuid
+import pandas as pd
+from Modules.dataloader import (
+    load_csvs, verify_column_match, merge_datasets, clean_price_fields, filter_columns,
+    load_catalog_snapshot, CATALOG_COLUMNS, SNAPSHOT_PATH
+)
+from Modules.preprocessing import fill_missing_fields
+from Modules.faiss_index import load_faiss_assets, load_modality_indexes, reconstruct_vectors
+from Modules.search import search_similar, search_by_product_ids, search_by_taste
+from Modules.outfit_suggester import stream_outfit_gemma
+from Modules.outfit_cache import OutfitCache, OUTFIT_CACHE_PATH
+from Modules.user_profile import UserProfileStore, PROFILE_DB_PATH
+from Modules.trends import get_combined_trend_string, schedule_trend_refresh, TREND_DATE_COLUMN, TREND_WINDOW_DAYS
+from Modules.catalog import Catalog, DISPLAY_COLUMNS
+from Modules.knn_graph import load_knn_graph
+
+def load_catalog_df() -> pd.DataFrame:
+    """
+    Load the catalog from the snapshot, or from the raw CSVs when there is none.
+    """
+    if os.path.exists(SNAPSHOT_PATH):
+        return load_catalog_snapshot(SNAPSHOT_PATH, columns=CATALOG_COLUMNS)
+
+    # Slow path: build the snapshot once with `python -m Modules.dataloader`
+    dress, jeans = load_csvs(
+        "Data/dresses_bd_processed_data.csv",
+        "Data/jeans_bd_processed_data.csv"
+    )
+    assert verify_column_match(dress, jeans), "Column mismatch in dress and jeans data."
+
+    df = merge_datasets(dress, jeans)
+    df = clean_price_fields(df)
+    df = filter_columns(df)
+    return fill_missing_fields(df)
+
+class SearchService:
+    """
+    Everything the UI needs from search, catalog, user profiles and outfits.
+
+    Loads the catalog and FAISS assets once and can be shared by many users:
+    user state lives in the profile store, not in the service. The Streamlit
+    app uses it in-process, `api.py` serves it over HTTP, and
+    Modules.api_client.SearchClient mirrors its methods for the app.
+    """
+
+    def __init__(self, assets_dir: str = "Assets", profile_db: str = PROFILE_DB_PATH, outfit_cache_db: str = OUTFIT_CACHE_PATH):
+        self.df = load_catalog_df()
+        self.faiss_index, self.product_ids, self.vectors = load_faiss_assets(assets_dir, mmap=True)
+        # Optional image/text sub-indexes, built by the asset pipeline
+        self.modality_indexes = load_modality_indexes(assets_dir, mmap=True, ntotal=self.faiss_index.ntotal)
+        # Optional precomputed "similar items" graph (python -m Modules.knn_graph)
+        self.knn_graph = load_knn_graph(assets_dir, self.product_ids)
+        self.catalog = Catalog(self.df, self.product_ids)
+        # Brand/style counts and taste vectors per user, persisted across restarts
+        self.profile_store = UserProfileStore(profile_db)
+        # Identical outfit requests (same product, profile summary and trends) skip the LLM
+        self.outfit_cache = OutfitCache(outfit_cache_db)
+
+    def start_trend_refresh(self):
+        """
+        Recount trends from the latest catalog snapshot in the background,
+        unless another process already does (see schedule_trend_refresh).
+
+        Set FASHIONSENSE_TREND_DATE_COLUMN (kept in the snapshot by
+        `python -m Modules.dataloader --date-column`) and
+        FASHIONSENSE_TREND_WINDOW_DAYS to score recent listings against older ones.
+        """
+        trend_options = {"date_column": TREND_DATE_COLUMN, "window_days": TREND_WINDOW_DAYS}
+        if os.path.exists(SNAPSHOT_PATH):
+            columns = CATALOG_COLUMNS + ([TREND_DATE_COLUMN] if TREND_DATE_COLUMN else [])
+            return schedule_trend_refresh(lambda: load_catalog_snapshot(SNAPSHOT_PATH, columns=columns), **trend_options)
+        return schedule_trend_refresh(lambda: self.df, **trend_options)
+
+    def trend_string(self) -> str:
+        """
+        Latest published trend keywords.
+        """
+        return get_combined_trend_string(self.df)
+
+    def filter_values(self, column: str) -> list:
+        """
+        Distinct values of a brand/category column for the filter widgets.
+        """
+        return self.catalog.filter_values(column)
+
+    def search(self, image=None, text: str = "", top_k: int = 5, filters: dict = None, image_weight: float = 0.5) -> list[str]:
+        """
+        Hybrid image + text search, see Modules.search.search_similar.
+
+        Returns:
+            List of matching product_ids, closest first
+        """
+        return search_similar(
+            self.faiss_index, self.product_ids, image, text, top_k, modality_indexes=self.modality_indexes,
+            image_weight=image_weight, filters=filters or None, catalog=self.catalog, vectors=self.vectors
+        )
+
+    def get_products(self, product_ids: list, columns: list = DISPLAY_COLUMNS) -> pd.DataFrame:
+        """
+        Catalog rows of products, in input order; unknown IDs are skipped.
+        """
+        return self.catalog.get_rows(product_ids, columns=columns)
+
+    def sample_product_ids(self, n: int) -> list[str]:
+        """
+        Random catalog products, e.g. to simulate a browsing history.
+        """
+        return self.df.sample(min(n, len(self.df)))["product_id"].tolist()
+
+    def new_user_id(self) -> str:
+        """
+        Fresh user ID for a new session, so its history and profile are its own.
+        """
+        return f"user-{uuid.uuid4().hex}"
+
+    def set_history(self, user_id: str, product_ids: list):
+        """
+        Replace a user's history and rebuild their profile and taste vector from it.
+        """
+        self.profile_store.reset(user_id)
+        self.add_history(user_id, product_ids)
+
+    def add_history(self, user_id: str, product_ids: list):
+        """
+        Record products a user viewed, oldest first.
+        """
+        self.profile_store.add_products(user_id, self.catalog.get_rows(product_ids, columns=None))
+        labels = [self.catalog.label_of[pid] for pid in product_ids if pid in self.catalog.label_of]
+        if labels:
+            self.profile_store.update_taste(user_id, reconstruct_vectors(self.faiss_index, labels, self.vectors))
+
+    def get_history(self, user_id: str) -> list[str]:
+        """
+        Products in a user's history, oldest first.
+        """
+        return self.profile_store.product_ids(user_id)
+
+    def recommend(self, user_id: str, top_k: int = 5) -> list[str]:
+        """
+        Personalized suggestions for a user, excluding their history.
+
+        Uses one query around the user's taste vector; users without one fall
+        back to merging the neighbors of each history product.
+        """
+        history_ids = self.get_history(user_id)
+        if not history_ids:
+            return []
+        taste = self.profile_store.get_taste(user_id)
+        if taste is not None:
+            return search_by_taste(
+                self.faiss_index, self.product_ids, taste, exclude_ids=history_ids, top_k=top_k, label_of=self.catalog.label_of
+            )
+        similar = search_by_product_ids(
+            self.faiss_index, self.product_ids, history_ids, top_k=3, vectors=self.vectors,
+            label_of=self.catalog.label_of, knn_graph=self.knn_graph
+        )
+        return similar[:top_k]
+
+    def stream_outfit(self, product_id: str, user_id: str, hf_token: str, number_of_suggestions: int = 5):
+        """
+        Stream outfit suggestions around a product for a user.
+
+        Yields:
+            str: Text chunks, see Modules.outfit_suggester.stream_outfit_gemma
+
+        Raises:
+            KeyError: If the product is not in the catalog
+        """
+        row = self.catalog.get_row(product_id)
+        return stream_outfit_gemma(
+            image_url=row["feature_image_s3"],
+            row=row,
+            user_id=user_id,
+            df=self.df,
+            user_history={},  # the profile store already holds the history
+            trend_string=self.trend_string(),
+            number_of_suggestions=number_of_suggestions,
+            hf_token=hf_token,
+            catalog=self.catalog,
+            profile_store=self.profile_store,
+            cache=self.outfit_cache
+        )
+
+    def outfit_cache_stats(self) -> dict:
+        """
+        Hit/miss counters of the outfit cache.
+        """
+        return self.outfit_cache.stats()
+
+
+# from Modules.search_service import SearchService
+
+# service = SearchService("Assets")
+# top_ids = service.search(text="floral maxi dress", top_k=10, filters={"selling_price": (None, 2000)})
+# user_id = service.new_user_id()
+# service.set_history(user_id, top_ids[:3])
+# suggestion_ids = service.recommend(user_id, top_k=10)
+# for chunk in service.stream_outfit(top_ids[0], user_id, hf_token):
+#     print(chunk, end="")
@@ -109,19 +109,407 @@
 # # print("🔥 Final Trend Keywords:\n", trend_string)
 
 
-import pickle
 import os
+import copy
+import time
+import pickle
+import argparse
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer, ENGLISH_STOP_WORDS
+from Modules.utils import log
+from Modules.dataloader import load_catalog_snapshot, SNAPSHOT_PATH
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+TRENDS_DIR = os.path.join("Assets", "trends")
+CURRENT_FILE = "CURRENT"  # name of the live artifact, swapped atomically
+# Held while a version is computed and published, so concurrent refreshes never share a version
+WRITE_LOCK_FILE = "refresh.lock"
+# Held for its lifetime by the one process running the periodic refresh
+SCHEDULER_LOCK_FILE = "scheduler.lock"
+LEGACY_TREND_PATH = os.path.join("Assets", "trend_string.pkl")
+
+# Artifacts kept on disk besides the live one, for rollback
+KEEP_VERSIONS = 3
+TREND_REFRESH_SECONDS = 6 * 3600
+
+# Listing-date column kept in the catalog snapshot (python -m Modules.dataloader
+# --date-column) and the recent window scored against older listings
+TREND_DATE_COLUMN = os.environ.get("FASHIONSENSE_TREND_DATE_COLUMN") or None
+TREND_WINDOW_DAYS = int(os.environ.get("FASHIONSENSE_TREND_WINDOW_DAYS", "0")) or None
+
+# Period of products without a listing date
+UNDATED = "undated"
+
+# Catalog words that say nothing about style
+TREND_STOP_WORDS = ENGLISH_STOP_WORDS | {
+    "dress", "dresses", "jeans", "women", "womens", "woman", "size", "sizes", "model", "wearing",
+    "wear", "wash", "care", "product", "unknown", "cm", "inch", "inches", "fit", "fits",
+    "xs", "small", "medium", "large", "xl", "xxl",
+}
+
+def _trend_texts(df: pd.DataFrame) -> pd.Series:
+    description = df["description"].fillna("").astype(str)
+    # Only the attribute values ("floral"), not their keys ("pattern")
+    styles = df["style_attributes"].map(
+        lambda attrs: " ".join(map(str, attrs.values())) if isinstance(attrs, dict) else attrs if isinstance(attrs, str) else ""
+    )
+    return description + " " + styles
+
+def _periods(df: pd.DataFrame, date_column: str = None) -> pd.Series:
+    # Listing day of each product, or UNDATED when the catalog has no dates
+    if date_column is None or date_column not in df.columns:
+        return pd.Series(UNDATED, index=df.index)
+    dates = pd.to_datetime(df[date_column], errors="coerce")
+    return dates.dt.strftime("%Y-%m-%d").fillna(UNDATED)
+
+def count_terms(df: pd.DataFrame, date_column: str = None, ngram_range: tuple = (1, 2), stop_words=()) -> tuple[dict, dict]:
+    """
+    Document frequency of every n-gram in the descriptions and style
+    attributes, per listing day.
+
+    One sparse document-term matrix is built for all rows; a sparse
+    period-by-document indicator times that matrix gives the per-period
+    counts in a single product.
+
+    Args:
+        df: Catalog rows with description and style_attributes
+        date_column: Optional listing-date column; without it every row
+            falls in the UNDATED period
+        ngram_range: Word n-gram sizes to count
+        stop_words: Extra words to ignore, e.g. brand names
+
+    Returns:
+        Tuple[dict, dict]: ({period: {term: n_docs}}, {period: n_docs})
+    """
+    if df.empty:
+        return {}, {}
+    vectorizer = CountVectorizer(
+        binary=True, lowercase=True, ngram_range=ngram_range, dtype=np.int32,
+        token_pattern=r"(?u)\b[a-zA-Z][a-zA-Z]+\b", stop_words=sorted(TREND_STOP_WORDS | set(stop_words))
+    )
+    try:
+        docs = vectorizer.fit_transform(_trend_texts(df))
+    except ValueError:
+        # Only stop words in every document
+        return {}, {}
+    terms = vectorizer.get_feature_names_out()
+
+    period_codes, period_names = pd.factorize(_periods(df, date_column))
+    indicator = sparse.csr_matrix(
+        (np.ones(len(df), dtype=np.int32), (period_codes, np.arange(len(df)))), shape=(len(period_names), len(df))
+    )
+    counts = (indicator @ docs).tocsr()
+    doc_counts = {}
+    for p, period in enumerate(period_names):
+        row = counts.getrow(p)
+        doc_counts[period] = dict(zip(terms[row.indices].tolist(), row.data.tolist()))
+    doc_totals = dict(zip(period_names, np.bincount(period_codes, minlength=len(period_names)).tolist()))
+    return doc_counts, doc_totals
+
+def _merge_counts(state: dict, doc_counts: dict, doc_totals: dict):
+    for period, counts in doc_counts.items():
+        merged = state["doc_counts"].setdefault(period, {})
+        for term, n in counts.items():
+            merged[term] = merged.get(term, 0) + n
+    for period, n in doc_totals.items():
+        state["doc_totals"][period] = state["doc_totals"].get(period, 0) + n
+
+def _sum_periods(state: dict, periods: list) -> tuple[pd.Series, int]:
+    counts = [pd.Series(state["doc_counts"][p], dtype=np.int64) for p in periods if state["doc_counts"].get(p)]
+    total = sum(state["doc_totals"].get(p, 0) for p in periods)
+    if not counts:
+        return pd.Series(dtype=np.int64), total
+    return pd.concat(counts).groupby(level=0).sum(), total
+
+def score_terms(state: dict, window_days: int = None, min_df: int = 3, max_df: float = 0.5) -> pd.Series:
+    """
+    Rank terms from the accumulated document frequencies.
+
+    Without a window every product counts and terms are scored by summed
+    binary TF-IDF, df * (ln((1 + n) / (1 + df)) + 1). With a window over
+    dated products, terms are scored by their lift in the last
+    `window_days` against everything before, damped by log frequency.
+
+    Args:
+        state: Trend state from refresh_trends
+        window_days: Recent window in days, or None for the whole catalog
+        min_df: Minimum products (in the window) containing a term
+        max_df: Drop terms found in more than this fraction of products
+
+    Returns:
+        pd.Series: Scores indexed by term, highest first
+    """
+    dated = sorted(p for p in state["doc_totals"] if p != UNDATED)
+    if window_days and dated:
+        cutoff = (pd.Timestamp(dated[-1]) - pd.Timedelta(days=window_days)).strftime("%Y-%m-%d")
+        recent, n_recent = _sum_periods(state, [p for p in dated if p > cutoff])
+        baseline, n_baseline = _sum_periods(state, [p for p in state["doc_totals"] if p == UNDATED or p <= cutoff])
+        if n_baseline:
+            baseline = baseline.reindex(recent.index, fill_value=0)
+            # A trend may cover most recent listings; only drop terms common across the whole catalog
+            keep = (recent >= min_df) & (recent + baseline <= max_df * (n_recent + n_baseline))
+            recent, baseline = recent[keep], baseline[keep]
+            lift = ((recent + 1) / (n_recent + 1)) / ((baseline + 1) / (n_baseline + 1))
+            return (lift * np.log1p(recent)).sort_values(ascending=False, kind="stable")
+
+    counts, n_docs = _sum_periods(state, list(state["doc_totals"]))
+    counts = counts[(counts >= min_df) & (counts <= max_df * n_docs)]
+    scores = counts * (np.log((1 + n_docs) / (1 + counts)) + 1)
+    return scores.sort_values(ascending=False, kind="stable")
+
+def format_trend_string(scores: pd.Series, top_n: int = 50) -> str:
+    """
+    Comma-separated top terms, dropping unigrams already covered by a chosen bigram.
+    """
+    chosen = []
+    covered = set()
+    for term in scores.index:
+        words = term.split()
+        if len(words) == 1 and term in covered:
+            continue
+        chosen.append(term)
+        covered.update(words)
+        if len(chosen) == top_n:
+            break
+    return ", ".join(chosen)
+
+def _empty_state(date_column: str = None, ngram_range: tuple = (1, 2)) -> dict:
+    return {"doc_counts": {}, "doc_totals": {}, "seen_ids": set(), "date_column": date_column, "ngram_range": tuple(ngram_range)}
+
+def lock_file(path: str, blocking: bool = True):
+    """
+    Take an exclusive OS lock on a file, shared by threads and processes.
+
+    The lock is released when the returned file is closed or the process
+    exits, so a crashed holder never leaves it stale.
+
+    Returns:
+        The open lock file, or None when blocking is False and another holder has it
+    """
+    f = open(path, "a+")
+    try:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+    except OSError:
+        f.close()
+        if blocking:
+            raise
+        return None
+    return f
+
+def _replace_with(path: str, mode: str, write):
+    # Unique temp name in the same directory, so concurrent writers never share one
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def _write_artifact(trends: dict, trends_dir: str):
+    filename = f"trends-{trends['version']:06d}.pkl"
+    _replace_with(os.path.join(trends_dir, filename), "wb", lambda f: pickle.dump(trends, f))
+
+    # Readers follow CURRENT, so the new version goes live in one atomic rename
+    _replace_with(os.path.join(trends_dir, CURRENT_FILE), "w", lambda f: f.write(filename))
+
+    artifacts = sorted(name for name in os.listdir(trends_dir) if name.startswith("trends-") and name.endswith(".pkl"))
+    for name in artifacts[:-(KEEP_VERSIONS + 1)]:
+        os.remove(os.path.join(trends_dir, name))
+
+def refresh_trends(
+    df: pd.DataFrame,
+    trends_dir: str = TRENDS_DIR,
+    date_column: str = None,
+    window_days: int = None,
+    top_n: int = 50,
+    full: bool = False,
+    ngram_range: tuple = (1, 2)
+) -> dict:
+    """
+    Update the trend keywords from the catalog and publish a new version.
+
+    Only products not seen by the previous version are vectorized; their
+    counts are added to the stored per-day document frequencies. Products
+    that left the catalog keep counting until the next full rebuild.
+    Refreshes of the same trends_dir (threads, processes) run one at a time.
+
+    Args:
+        df: Catalog with product_id, description, style_attributes and brand
+        trends_dir: Directory of the versioned artifacts
+        date_column: Optional listing-date column for time windows
+        window_days: Score the last N days against the rest (needs dates)
+        top_n: Keywords in the trend string
+        full: Recount the whole catalog instead of only new products
+        ngram_range: Word n-gram sizes
+
+    Returns:
+        dict: The published artifact (version, created, trend_string, keywords, state)
+    """
+    os.makedirs(trends_dir, exist_ok=True)
+    lock = lock_file(os.path.join(trends_dir, WRITE_LOCK_FILE))
+    try:
+        start = time.time()
+        current = load_trends(trends_dir)
+        if not full and current and current["state"]["date_column"] == date_column and current["state"]["ngram_range"] == tuple(ngram_range):
+            # The live version stays untouched until the new one is published
+            state = copy.deepcopy(current["state"])
+        else:
+            state = _empty_state(date_column, ngram_range)
+
+        new_rows = df[~df["product_id"].isin(state["seen_ids"])]
+        # Brand names are not trends
+        brand_words = set(" ".join(df["brand"].dropna().astype(str).str.lower().unique()).split())
+        doc_counts, doc_totals = count_terms(new_rows, date_column, ngram_range, stop_words=brand_words)
+        _merge_counts(state, doc_counts, doc_totals)
+        state["seen_ids"].update(new_rows["product_id"].tolist())
+
+        scores = score_terms(state, window_days)
+        trends = {
+            "version": current["version"] + 1 if current else 1,
+            "created": time.time(),
+            "trend_string": format_trend_string(scores, top_n),
+            "keywords": list(scores.head(top_n * 2).items()),
+            "window_days": window_days,
+            "state": state,
+        }
+        _write_artifact(trends, trends_dir)
+        log(f"✅ Trends v{trends['version']}: {len(new_rows)} new products counted in {time.time() - start:.1f}s")
+    finally:
+        lock.close()
+    return trends
+
+# Parsed artifact of the last version read, so reruns only re-read the pointer
+_loaded = {}
+
+def load_trends(trends_dir: str = TRENDS_DIR) -> dict:
+    """
+    Load the live trend artifact, or None if none was published.
+    """
+    pointer = os.path.join(trends_dir, CURRENT_FILE)
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer) as f:
+        filename = f.read().strip()
+    path = os.path.join(trends_dir, filename)
+    if _loaded.get("path") != path:
+        with open(path, "rb") as f:
+            _loaded.update(path=path, trends=pickle.load(f))
+    return _loaded["trends"]
 
-def get_combined_trend_string(df=None, use_internet=False, max_desc=100, hf_token=None):
+def schedule_trend_refresh(load_df, interval: float = TREND_REFRESH_SECONDS, **refresh_kwargs) -> threading.Thread:
     """
-    Load precomputed trend keywords from Assets/trend_string.pkl.
+    Refresh the trends in a daemon thread every `interval` seconds.
+
+    Only one process per trends directory runs the scheduler: every API
+    worker or app instance calls this, and the first one to take the
+    scheduler lock keeps it until it exits. The first refresh runs at once
+    unless the live version is younger than `interval`.
+
+    Args:
+        load_df: Callable returning the current catalog DataFrame
+        interval: Seconds between refreshes
+        **refresh_kwargs: Passed to refresh_trends
+
+    Returns:
+        threading.Thread: The running scheduler, or None if another process runs it
     """
-    trend_path = "Assets/trend_string.pkl"
-    if os.path.exists(trend_path):
-        with open(trend_path, "rb") as f:
+    trends_dir = refresh_kwargs.get("trends_dir", TRENDS_DIR)
+    os.makedirs(trends_dir, exist_ok=True)
+    leader = lock_file(os.path.join(trends_dir, SCHEDULER_LOCK_FILE), blocking=False)
+    if leader is None:
+        log("Trend refresh is scheduled by another process")
+        return None
+
+    current = load_trends(trends_dir)
+    wait = max(0.0, current["created"] + interval - time.time()) if current else 0.0
+
+    def run():
+        time.sleep(wait)
+        while True:
+            try:
+                refresh_trends(load_df(), **refresh_kwargs)
+            except Exception as e:
+                log(f"❌ Trend refresh failed: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name="trend-refresh", daemon=True)
+    thread.leader_lock = leader
+    thread.start()
+    return thread
+
+def get_combined_trend_string(df=None, use_internet=False, max_desc=100, hf_token=None, trends_dir: str = TRENDS_DIR):
+    """
+    Return the current trend keywords.
+
+    Reads the live artifact from trends_dir, falling back to the legacy
+    Assets/trend_string.pkl. If neither exists and a catalog is given, the
+    trends are computed locally and published. No network call is made;
+    use_internet, max_desc and hf_token are accepted for compatibility.
+    """
+    trends = load_trends(trends_dir)
+    if trends is not None:
+        return trends["trend_string"]
+    if os.path.exists(LEGACY_TREND_PATH):
+        with open(LEGACY_TREND_PATH, "rb") as f:
             trend_string = pickle.load(f)
         print("✅ Loaded trend_string from file.")
         return trend_string
-    else:
-        print("❌ trend_string.pkl not found in Assets/. Please generate and save it first.")
-        return ""
+    if df is not None:
+        return refresh_trends(df, trends_dir)["trend_string"]
+    print("❌ No trends found. Run `python -m Modules.trends` first.")
+    return ""
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute FashionSense trend keywords from the catalog.")
+    parser.add_argument("--catalog", default=SNAPSHOT_PATH, help="Catalog snapshot (python -m Modules.dataloader)")
+    parser.add_argument("--output", default=TRENDS_DIR)
+    parser.add_argument("--date-column", default=TREND_DATE_COLUMN, help="Listing-date column for time windows")
+    parser.add_argument("--window-days", type=int, default=TREND_WINDOW_DAYS, help="Score the last N days against older listings")
+    parser.add_argument("--top-n", type=int, default=50)
+    parser.add_argument("--full", action="store_true", help="Recount the whole catalog")
+    parser.add_argument("--every", type=float, help="Keep running, refreshing every N hours")
+    args = parser.parse_args()
+
+    if args.every:
+        # In-process schedulers (API workers, the app) stand down while this runs
+        os.makedirs(args.output, exist_ok=True)
+        leader = lock_file(os.path.join(args.output, SCHEDULER_LOCK_FILE), blocking=False)
+        if leader is None:
+            print("❌ Trend refresh is already scheduled for", args.output)
+            return
+
+    while True:
+        trends = refresh_trends(
+            load_catalog_snapshot(args.catalog), args.output, args.date_column, args.window_days, args.top_n, args.full
+        )
+        print("🔥 Trend keywords:", trends["trend_string"])
+        if not args.every:
+            break
+        time.sleep(args.every * 3600)
+
+if __name__ == "__main__":
+    main()
+
+
+# python -m Modules.trends --catalog Assets/catalog.parquet            # incremental refresh
+# python -m Modules.trends --full --date-column listing_date --window-days 30 --every 6
+# (the snapshot must keep that column: python -m Modules.dataloader --date-column listing_date)
+
+# from Modules.trends import get_combined_trend_string, schedule_trend_refresh
+# trend_string = get_combined_trend_string(df)
+# schedule_trend_refresh(lambda: df, interval=6 * 3600)
@@ -1,5 +1,14 @@
+import os
+import sqlite3
+import threading
+import numpy as np
 import pandas as pd
 
+PROFILE_DB_PATH = os.path.join("Assets", "user_profiles.db")
+
+# Weight kept by the taste vector per new interaction; lower forgets older views faster
+TASTE_DECAY = 0.9
+
 def clean_style_attr(style_attr) -> str:
     """
     Standardize style_attributes field.
@@ -17,44 +26,264 @@ def clean_style_attr(style_attr) -> str:
     else:
         return "Unknown"
 
-def summarize_user_preferences(user_id: str, df: pd.DataFrame, history_dict: dict, top_k: int = 5):
+class UserProfileStore:
+    """
+    Per-user preference aggregates persisted in SQLite.
+
+    Each profile keeps brand and style counts over the distinct products a
+    user interacted with, plus a ring buffer of their most recent product
+    descriptions. Counts are updated incrementally as products are added,
+    and an index on (user, kind, count) lets top-k summaries read only k
+    rows instead of re-scanning the user's history or the catalog.
+
+    Each user also has a taste vector: a recency-weighted centroid of the
+    combined vectors of the products they viewed, stored as float16.
+    """
+
+    def __init__(self, db_path: str = PROFILE_DB_PATH, recent_size: int = 10, taste_decay: float = TASTE_DECAY):
+        """
+        Args:
+            db_path: SQLite database file (":memory:" for a throwaway store)
+            recent_size: Descriptions kept in each user's ring buffer
+            taste_decay: Weight kept by the taste vector per new interaction
+        """
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.recent_size = recent_size
+        self.taste_decay = taste_decay
+        # One connection shared by Streamlit's script threads, serialized by a lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS profile_products (
+                    user_id TEXT, product_id TEXT, PRIMARY KEY (user_id, product_id)
+                );
+                CREATE TABLE IF NOT EXISTS profile_counts (
+                    user_id TEXT, kind TEXT, value TEXT, count INTEGER, first_seen INTEGER,
+                    PRIMARY KEY (user_id, kind, value)
+                );
+                CREATE INDEX IF NOT EXISTS profile_counts_top
+                    ON profile_counts (user_id, kind, count DESC, first_seen);
+                CREATE TABLE IF NOT EXISTS profile_recent (
+                    user_id TEXT, slot INTEGER, description TEXT, PRIMARY KEY (user_id, slot)
+                );
+                CREATE TABLE IF NOT EXISTS profile_meta (
+                    user_id TEXT PRIMARY KEY, n_products INTEGER, next_slot INTEGER
+                );
+                CREATE TABLE IF NOT EXISTS profile_taste (
+                    user_id TEXT PRIMARY KEY, vector BLOB, weight REAL
+                );
+            """)
+
+    def add_products(self, user_id: str, rows: pd.DataFrame) -> int:
+        """
+        Fold newly seen products into a user's profile.
+
+        Products already in the profile are ignored, so replaying history is safe.
+
+        Args:
+            user_id: Unique user ID
+            rows: Product metadata rows with product_id, brand,
+                style_attributes and meta_info columns (e.g. Catalog.get_rows(ids, columns=None))
+
+        Returns:
+            int: Number of products added
+        """
+        with self._lock, self._conn:
+            meta = self._conn.execute(
+                "SELECT n_products, next_slot FROM profile_meta WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            n_products, next_slot = meta or (0, 0)
+            added = 0
+            for _, row in rows.iterrows():
+                inserted = self._conn.execute(
+                    "INSERT OR IGNORE INTO profile_products VALUES (?, ?)", (user_id, row["product_id"])
+                ).rowcount
+                if not inserted:
+                    continue
+                values = [("style", clean_style_attr(row.get("style_attributes")))]
+                if pd.notna(row.get("brand")):
+                    values.append(("brand", str(row["brand"])))
+                for kind, value in values:
+                    self._conn.execute(
+                        """INSERT INTO profile_counts VALUES (?, ?, ?, 1, ?)
+                           ON CONFLICT (user_id, kind, value) DO UPDATE SET count = count + 1""",
+                        (user_id, kind, value, n_products + added)
+                    )
+                if pd.notna(row.get("meta_info")):
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO profile_recent VALUES (?, ?, ?)",
+                        (user_id, next_slot % self.recent_size, str(row["meta_info"]))
+                    )
+                    next_slot += 1
+                added += 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO profile_meta VALUES (?, ?, ?)", (user_id, n_products + added, next_slot)
+            )
+        return added
+
+    def update_taste(self, user_id: str, vectors: np.ndarray):
+        """
+        Move a user's taste vector towards newly viewed products.
+
+        Each view costs O(d): the stored centroid is decayed and the new
+        vector averaged in, so the history itself is never re-read.
+
+        Args:
+            user_id: Unique user ID
+            vectors: Combined vectors of the viewed products, oldest first
+                (one row per interaction; repeated views count again)
+        """
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        with self._lock, self._conn:
+            stored = self._conn.execute(
+                "SELECT vector, weight FROM profile_taste WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if stored:
+                taste, weight = np.frombuffer(stored[0], dtype=np.float16).astype(np.float32), stored[1]
+            else:
+                taste, weight = np.zeros(vectors.shape[1], dtype=np.float32), 0.0
+            for vector in vectors:
+                weight *= self.taste_decay
+                taste = (taste * weight + vector) / (weight + 1.0)
+                weight += 1.0
+            self._conn.execute(
+                "INSERT OR REPLACE INTO profile_taste VALUES (?, ?, ?)",
+                (user_id, taste.astype(np.float16).tobytes(), weight)
+            )
+
+    def get_taste(self, user_id: str) -> np.ndarray:
+        """
+        Return a user's taste vector (float32), or None before their first view.
+        """
+        with self._lock:
+            stored = self._conn.execute("SELECT vector FROM profile_taste WHERE user_id = ?", (user_id,)).fetchone()
+        return np.frombuffer(stored[0], dtype=np.float16).astype(np.float32) if stored else None
+
+    def reset(self, user_id: str):
+        """
+        Delete a user's profile.
+        """
+        with self._lock, self._conn:
+            for table in ["profile_products", "profile_counts", "profile_recent", "profile_meta", "profile_taste"]:
+                self._conn.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+
+    def product_ids(self, user_id: str) -> list[str]:
+        """
+        Products in a user's profile, in the order they were first added.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT product_id FROM profile_products WHERE user_id = ? ORDER BY rowid", (user_id,)
+            ).fetchall()
+        return [pid for (pid,) in rows]
+
+    def top_values(self, user_id: str, kind: str, top_k: int = 5) -> list[str]:
+        """
+        Most frequent brands or styles of a user, read straight off the index.
+
+        Args:
+            kind: "brand" or "style"
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT value FROM profile_counts WHERE user_id = ? AND kind = ?
+                   ORDER BY count DESC, first_seen LIMIT ?""",
+                (user_id, kind, top_k)
+            ).fetchall()
+        return [value for (value,) in rows]
+
+    def recent_descriptions(self, user_id: str, limit: int = None) -> list[str]:
+        """
+        Most recent product descriptions of a user, newest first.
+        """
+        with self._lock:
+            meta = self._conn.execute("SELECT next_slot FROM profile_meta WHERE user_id = ?", (user_id,)).fetchone()
+            if not meta:
+                return []
+            slots = [(meta[0] - 1 - i) % self.recent_size for i in range(min(meta[0], self.recent_size, limit or self.recent_size))]
+            found = dict(self._conn.execute(
+                f"SELECT slot, description FROM profile_recent WHERE user_id = ? AND slot IN ({','.join('?' * len(slots))})",
+                (user_id, *slots)
+            ).fetchall()) if slots else {}
+        return [found[slot] for slot in slots if slot in found]
+
+    def summarize(self, user_id: str, top_k: int = 5):
+        """
+        Same summary as summarize_user_preferences, from the stored aggregates.
+
+        Returns:
+            Tuple[str, str, str]: (top brands, top styles, recent description text)
+        """
+        brands = self.top_values(user_id, "brand", top_k)
+        styles = self.top_values(user_id, "style", top_k)
+        descriptions = self.recent_descriptions(user_id, top_k * 2)
+        if not (brands or styles or descriptions):
+            return "No Brands", "No Styles", "No Description"
+        return ", ".join(brands), ", ".join(styles), " ".join(descriptions) if descriptions else "No Description"
+
+def _top_values(values: pd.Series, top_k: int) -> list[str]:
+    # Most frequent first, ties in order of first appearance (as UserProfileStore.top_values)
+    counts = values.value_counts(sort=False).sort_values(ascending=False, kind="stable")
+    return counts.index.tolist()[:top_k]
+
+def summarize_user_preferences(user_id: str, df: pd.DataFrame, history_dict: dict, top_k: int = 5, catalog=None, store=None):
     """
     Generate a summary of user’s fashion preferences.
 
     Args:
         user_id (str): Unique user ID
         df (pd.DataFrame): Product metadata
-        history_dict (dict): Dict containing product_id lists per user
+        history_dict (dict): Dict containing product_id lists per user, oldest first
         top_k (int): Number of top brands/styles to return
+        catalog (Catalog): Optional product lookup used instead of scanning df
+        store (UserProfileStore): Optional incremental profiles, read instead
+            of history_dict. Profiles outlive sessions, so each session needs
+            its own user_id (see SearchService.new_user_id)
 
     Returns:
-        Tuple[str, str, str]: (top brands, top styles, sample description text)
+        Tuple[str, str, str]: (top brands, top styles, recent description text,
+        newest first)
     """
-    # Get product_ids user has interacted with
-    pids = history_dict.get(user_id, [])
-    rows = df[df["product_id"].isin(pids)]
+    if store is not None:
+        return store.summarize(user_id, top_k)
+
+    # Get product_ids user has interacted with; repeat views count once
+    pids = list(dict.fromkeys(history_dict.get(user_id, [])))
+    if catalog is not None:
+        rows = catalog.get_rows(pids, columns=None)
+    else:
+        rows = df[df["product_id"].isin(pids)].drop_duplicates("product_id")
+        rows = rows.iloc[rows["product_id"].map({pid: i for i, pid in enumerate(pids)}).argsort()]
 
     if rows.empty:
         return "No Brands", "No Styles", "No Description"
 
     # Top brands
-    brands = rows["brand"].dropna().astype(str).value_counts().index.tolist()[:top_k]
+    brands = _top_values(rows["brand"].dropna().astype(str), top_k)
 
     # Top style attributes
-    styles_cleaned = rows["style_attributes"].apply(clean_style_attr)
-    styles = styles_cleaned.value_counts().index.tolist()[:top_k]
+    styles = _top_values(rows["style_attributes"].apply(clean_style_attr), top_k)
 
-    # Description summary (meta_info)
-    descriptions = rows["meta_info"].dropna().astype(str).tolist()
+    # Description summary (meta_info), newest first like the store's ring buffer
+    descriptions = rows["meta_info"].dropna().astype(str).tolist()[::-1]
     summary = " ".join(descriptions[:top_k * 2]) if descriptions else "No Description"
 
     return ", ".join(brands), ", ".join(styles), summary
 
-
 # from modules.user_profile import summarize_user_preferences
 
 # brands, styles, summary = summarize_user_preferences("user123", df, user_history, top_k=5)
 
 # print("👕 Brands:", brands)
 # print("🎨 Styles:", styles)
-# print("📝 Summary:", summary)
\ No newline at end of file
+# print("📝 Summary:", summary)
+
+# # Incremental profiles that survive restarts
+# store = UserProfileStore("Assets/user_profiles.db")
+# store.add_products("user123", catalog.get_rows(new_product_ids, columns=None))
+# brands, styles, summary = store.summarize("user123", top_k=5)
+# store.update_taste("user123", reconstruct_vectors(faiss_index, [catalog.label_of[pid] for pid in new_product_ids], vectors))
+# taste = store.get_taste("user123")  # see Modules.search.search_by_taste
\ No newline at end of file
@@ -1,6 +1,8 @@
 import os
 import pickle
+import threading
 import numpy as np
+from collections import OrderedDict
 from datetime import datetime
 
 def save_pickle(obj, filepath):
@@ -31,6 +33,108 @@ def load_numpy(filepath):
     """
     return np.load(filepath)
 
+class LRUCache:
+    """
+    Small thread-safe LRU cache with hit/miss counters.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key):
+        """
+        Return the cached value (marking it recently used), or None.
+        """
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """
+        Store a value, evicting the least recently used entry when full.
+        """
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """
+        Drop every entry (counters are kept).
+        """
+        with self._lock:
+            self._data.clear()
+
+class NpyAppender:
+    """
+    Stream rows into a .npy file without holding the whole array in memory.
+
+    Rows are appended to a temporary file behind a fixed-size placeholder
+    header; close() writes the real header with the final shape and moves
+    the file into place. Callers publishing several artifacts together can
+    finish() first and os.replace `tmp_path` themselves, or discard().
+    """
+    HEADER_SIZE = 128
+
+    def __init__(self, filepath: str, dtype: str = "float32"):
+        self.filepath = filepath
+        self.dtype = np.dtype(dtype)
+        self.dim = None
+        self.rows = 0
+        self.tmp_path = filepath + ".tmp"
+        self._f = open(self.tmp_path, "wb")
+        self._f.write(b"\0" * self.HEADER_SIZE)
+
+    def append(self, rows: np.ndarray):
+        """
+        Append a 2D block of rows.
+        """
+        rows = np.ascontiguousarray(rows, dtype=self.dtype)
+        if self.dim is None:
+            self.dim = rows.shape[1]
+        elif rows.shape[1] != self.dim:
+            raise ValueError(f"Row dim {rows.shape[1]} does not match file dim {self.dim}")
+        self._f.write(rows.tobytes())
+        self.rows += len(rows)
+
+    def finish(self) -> str:
+        """
+        Finalize the header, leaving the complete array at `tmp_path`.
+        """
+        header = "{'descr': %r, 'fortran_order': False, 'shape': (%d, %d), }" % (self.dtype.str, self.rows, self.dim or 0)
+        header = header.ljust(self.HEADER_SIZE - 11) + "\n"
+        self._f.seek(0)
+        self._f.write(b"\x93NUMPY\x01\x00" + len(header).to_bytes(2, "little") + header.encode("latin1"))
+        self._f.close()
+        return self.tmp_path
+
+    def close(self):
+        """
+        Finalize the header and atomically replace the target file.
+        """
+        os.replace(self.finish(), self.filepath)
+        log(f"✅ Saved NumPy array: {self.filepath} ({self.rows} rows)")
+
+    def discard(self):
+        """
+        Drop the rows written so far, leaving the target file untouched.
+        """
+        self._f.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
 def resolve_image_path(product_id: str, image_folder: str) -> str:
     """
     Construct full path to image using product_id.
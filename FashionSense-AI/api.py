@@ -0,0 +1,206 @@
+import io
+import os
+import base64
+import asyncio
+import binascii
+import argparse
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.responses import JSONResponse, StreamingResponse
+from PIL import Image, UnidentifiedImageError
+from pydantic import BaseModel, Field, field_validator
+from Modules.catalog import RANGE_FILTER_COLUMNS, SET_FILTER_COLUMNS
+from Modules.search_service import SearchService
+from Modules.models import warmup, is_loaded
+
+# Threads per worker process running model inference and FAISS searches;
+# requests beyond this queue instead of oversubscribing the CPU
+INFERENCE_THREADS = int(os.environ.get("FASHIONSENSE_API_THREADS", "4"))
+# Outfit streams drained concurrently per worker; they wait on the LLM, not the CPU
+OUTFIT_STREAMS = int(os.environ.get("FASHIONSENSE_OUTFIT_STREAMS", "32"))
+# Worker processes, each with its own models and pool (assets are memory-mapped and shared)
+API_WORKERS = int(os.environ.get("FASHIONSENSE_API_WORKERS", "1"))
+ASSETS_DIR = os.environ.get("FASHIONSENSE_ASSETS_DIR", "Assets")
+
+class SearchRequest(BaseModel):
+    text: str = ""
+    image_base64: Optional[str] = Field(None, description="Encoded image file (jpg/png), base64")
+    top_k: int = Field(5, ge=1, le=100)
+    image_weight: float = Field(0.5, ge=0.0, le=1.0)
+    filters: dict[str, Union[list, str, int, float]] = Field(default_factory=dict, description="See Catalog.filter_mask")
+
+    @field_validator("filters")
+    @classmethod
+    def check_filter_shapes(cls, filters: dict) -> dict:
+        # Price ranges are [min, max] pairs, null for an open end; brand and
+        # category take one value or a list. Unknown columns are left to the catalog.
+        for column, condition in filters.items():
+            if column in RANGE_FILTER_COLUMNS:
+                if not (isinstance(condition, list) and len(condition) == 2
+                        and all(bound is None or isinstance(bound, (int, float)) for bound in condition)):
+                    raise ValueError(f"Filter {column!r} takes a [min, max] pair of numbers or nulls, got {condition!r}")
+            elif column in SET_FILTER_COLUMNS and isinstance(condition, list):
+                if not all(isinstance(value, (str, int, float)) for value in condition):
+                    raise ValueError(f"Filter {column!r} takes a value or a list of values, got {condition!r}")
+        return filters
+
+class ProductsRequest(BaseModel):
+    product_ids: list[str]
+
+class HistoryRequest(BaseModel):
+    product_ids: list[str]
+    replace: bool = False
+
+class OutfitRequest(BaseModel):
+    product_id: str
+    user_id: str
+    hf_token: str
+    number_of_suggestions: int = Field(5, ge=1, le=20)
+
+state = {}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Encoders load in the background while the catalog loads
+    warmup(background=True)
+    state["executor"] = ThreadPoolExecutor(max_workers=INFERENCE_THREADS, thread_name_prefix="inference")
+    state["io_executor"] = ThreadPoolExecutor(max_workers=OUTFIT_STREAMS, thread_name_prefix="llm-io")
+    state["service"] = await asyncio.get_running_loop().run_in_executor(state["executor"], SearchService, ASSETS_DIR)
+    # Every worker asks; only the first to take the scheduler lock runs the refresh
+    state["service"].start_trend_refresh()
+    yield
+    state["executor"].shutdown(wait=False, cancel_futures=True)
+    state["io_executor"].shutdown(wait=False, cancel_futures=True)
+
+app = FastAPI(title="FashionSense search API", lifespan=lifespan)
+
+@app.exception_handler(RequestValidationError)
+async def filter_validation_error(request: Request, exc: RequestValidationError):
+    # Malformed filters are a bad search like an unknown filter column: 400, not 422
+    errors = exc.errors()
+    if errors and all(tuple(error["loc"][:2]) == ("body", "filters") for error in errors):
+        return JSONResponse(status_code=400, content={"detail": "; ".join(error["msg"] for error in errors)})
+    return await request_validation_exception_handler(request, exc)
+
+async def run_in_pool(fn, *args):
+    """
+    Run blocking work (model inference, FAISS, SQLite) on the bounded pool.
+    """
+    return await asyncio.get_running_loop().run_in_executor(state["executor"], fn, *args)
+
+async def run_in_io(fn, *args):
+    """
+    Run blocking network waits (LLM streams) on the I/O pool, leaving the
+    inference pool to CPU work.
+    """
+    return await asyncio.get_running_loop().run_in_executor(state["io_executor"], fn, *args)
+
+def _decode_image(image_base64: str) -> bytes:
+    image = base64.b64decode(image_base64, validate=True)
+    # Reads only the header: rejects non-images before they queue for the encoder
+    Image.open(io.BytesIO(image))
+    return image
+
+def _records(df) -> list[dict]:
+    # NaN is not valid JSON
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+@app.get("/health")
+async def health():
+    service = state.get("service")
+    return {"status": "ok" if service else "loading", "models_loaded": is_loaded(), "products": len(service.catalog) if service else 0}
+
+@app.get("/filters/{column}")
+async def filter_values(column: str):
+    try:
+        return {"values": state["service"].filter_values(column)}
+    except KeyError:
+        raise HTTPException(404, f"No filter values for column {column!r}")
+
+@app.post("/search")
+async def search(request: SearchRequest):
+    try:
+        image = _decode_image(request.image_base64) if request.image_base64 else None
+        product_ids = await run_in_pool(
+            state["service"].search, image, request.text, request.top_k, request.filters, request.image_weight
+        )
+    except binascii.Error as e:
+        raise HTTPException(400, f"image_base64 is not valid base64: {e}")
+    except UnidentifiedImageError:
+        raise HTTPException(400, "image_base64 is not a supported image file")
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {"product_ids": product_ids}
+
+@app.post("/products")
+async def products(request: ProductsRequest):
+    rows = await run_in_pool(state["service"].get_products, request.product_ids)
+    return {"products": _records(rows)}
+
+@app.get("/products/sample")
+async def sample_products(n: int = Query(5, ge=1, le=100)):
+    return {"product_ids": state["service"].sample_product_ids(n)}
+
+@app.post("/users")
+async def new_user():
+    return {"user_id": state["service"].new_user_id()}
+
+@app.get("/users/{user_id}/history")
+async def get_history(user_id: str):
+    return {"product_ids": await run_in_pool(state["service"].get_history, user_id)}
+
+@app.post("/users/{user_id}/history")
+async def add_history(user_id: str, request: HistoryRequest):
+    update = state["service"].set_history if request.replace else state["service"].add_history
+    await run_in_pool(update, user_id, request.product_ids)
+    return {"product_ids": await run_in_pool(state["service"].get_history, user_id)}
+
+@app.get("/users/{user_id}/recommendations")
+async def recommendations(user_id: str, top_k: int = Query(5, ge=1, le=100)):
+    return {"product_ids": await run_in_pool(state["service"].recommend, user_id, top_k)}
+
+@app.get("/trends")
+async def trends():
+    return {"trend_string": await run_in_pool(state["service"].trend_string)}
+
+@app.post("/outfit")
+async def outfit(request: OutfitRequest):
+    service = state["service"]
+    if request.product_id not in service.catalog:
+        raise HTTPException(404, f"Unknown product {request.product_id!r}")
+    chunks = await run_in_pool(
+        service.stream_outfit, request.product_id, request.user_id, request.hf_token, request.number_of_suggestions
+    )
+
+    async def stream():
+        # Pull each chunk on the I/O pool: a completion takes seconds of network
+        # waits that must block neither the event loop nor an inference thread
+        done = object()
+        while (chunk := await run_in_io(next, chunks, done)) is not done:
+            yield chunk
+
+    return StreamingResponse(stream(), media_type="text/plain; charset=utf-8")
+
+@app.get("/outfit/cache")
+async def outfit_cache_stats():
+    return state["service"].outfit_cache_stats()
+
+def main():
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Serve FashionSense search over HTTP.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="Worker processes (FASHIONSENSE_API_WORKERS)")
+    args = parser.parse_args()
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers)
+
+if __name__ == "__main__":
+    main()
+
+
+# FASHIONSENSE_API_WORKERS=2 FASHIONSENSE_API_THREADS=4 python api.py --port 8000
+# FASHIONSENSE_API_URL=http://localhost:8000 streamlit run app.py
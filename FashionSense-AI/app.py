@@ -1,17 +1,12 @@
+import os
 import streamlit as st
-import pandas as pd
-from PIL import Image
-import tempfile
-import random
-import requests
-
-from Modules.dataloader import load_csvs, verify_column_match, merge_datasets, clean_price_fields, filter_columns
-from Modules.preprocessing import fill_missing_fields
-from Modules.faiss_index import load_faiss_assets
-from Modules.search import search_similar
-from Modules.outfit_suggester import generate_outfit_gemma
-from Modules.user_profile import summarize_user_preferences
-from Modules.trends import get_combined_trend_string
+
+from Modules.search_service import SearchService
+from Modules.api_client import SearchClient
+from Modules.models import warmup
+
+# Set to use a shared search tier (python api.py) instead of loading models in this process
+API_URL = os.environ.get("FASHIONSENSE_API_URL")
 
 # --- CONFIG ---
 st.set_page_config(page_title="👗 Fashion Assistant", layout="wide")
@@ -56,31 +51,24 @@ if not st.session_state.get("HF_TOKEN"):
         st.image("Src/Animation.gif", width=250)
     st.stop()
 
-# --- LOAD DATA ---
+# --- LOAD SERVICE ---
 @st.cache_resource
-def load_assets(hf_token):
-    dress, jeans = load_csvs(
-        "Data/dresses_bd_processed_data.csv",
-        "Data/jeans_bd_processed_data.csv"
-    )
-    assert verify_column_match(dress, jeans), "Column mismatch in dress and jeans data."
-
-    df = merge_datasets(dress, jeans)
-    df = clean_price_fields(df)
-    df = filter_columns(df)
-    df = fill_missing_fields(df)
-
-    faiss_index, product_ids, _ = load_faiss_assets("Assets")
-    trend_string = get_combined_trend_string(df, use_internet=True, hf_token=hf_token)
-
-    return df, faiss_index, product_ids, trend_string
+def load_service():
+    if API_URL:
+        return SearchClient(API_URL)
+    # Encoders load in the background while the catalog loads; searches wait for them
+    warmup(background=True)
+    service = SearchService("Assets")
+    service.start_trend_refresh()
+    return service
 
 # --- REQUIRE TOKEN TO LOAD DATA ---
-df, faiss_index, product_ids, trend_string = load_assets(st.session_state["HF_TOKEN"])
+service = load_service()
 
 # --- SESSION STATE ---
 if "user_id" not in st.session_state:
-    st.session_state.user_id = "user123"
+    # Profiles are persisted and shared by every session, so each browser session gets its own ID
+    st.session_state.user_id = service.new_user_id()
 if "user_history" not in st.session_state:
     st.session_state.user_history = {}
 
@@ -93,6 +81,19 @@ uploaded_file = st.file_uploader("📄 Upload a clothing image", type=["jpg", "j
 text_query = st.text_input("🎯 Enter style query (e.g. 'floral, oversized')", "")
 top_k = st.number_input("🔢 Number of similar results (you want to see and write in multiple of 5)", min_value=1, max_value=30, value=15, step=1)
 
+with st.expander("🎛️ Filters"):
+    max_price = st.number_input("💰 Max selling price (₹, 0 = any)", min_value=0, value=0, step=500)
+    brands = st.multiselect("🏷️ Brands", service.filter_values("brand"))
+    categories = st.multiselect("🗂️ Categories", service.filter_values("category_id"))
+
+filters = {}
+if max_price:
+    filters["selling_price"] = (None, max_price)
+if brands:
+    filters["brand"] = brands
+if categories:
+    filters["category_id"] = categories
+
 # --- PREPARE STYLING ---
 st.markdown("""
     <style>
@@ -118,22 +119,9 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# --- SEARCH ---
-st.markdown("## 🔍 Top Matching Products")
-top_ids = []
-temp_image_path = None
-if uploaded_file or text_query.strip():
-    if uploaded_file:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp:
-            tmp.write(uploaded_file.read())
-            temp_image_path = tmp.name
-        st.image(temp_image_path, caption="📸 Uploaded Image", width=300)
-
-    top_ids = search_similar(faiss_index, product_ids, temp_image_path, text_query, top_k)
-
+def render_product_cards(ids):
     cols = st.columns(5)
-    for i, pid in enumerate(top_ids):
-        row = df[df["product_id"] == pid].iloc[0]
+    for i, (_, row) in enumerate(service.get_products(ids).iterrows()):
         with cols[i % 5]:
             st.markdown(f"""
                 <div class="product-card">
@@ -142,57 +130,41 @@ if uploaded_file or text_query.strip():
                 </div>
             """, unsafe_allow_html=True)
 
+# --- SEARCH ---
+st.markdown("## 🔍 Top Matching Products")
+top_ids = []
+uploaded_image = None
+if uploaded_file or text_query.strip():
+    if uploaded_file:
+        uploaded_image = uploaded_file.getvalue()
+        st.image(uploaded_image, caption="📸 Uploaded Image", width=300)
+
+    top_ids = service.search(uploaded_image, text_query, top_k, filters=filters)
+    render_product_cards(top_ids)
+
 st.markdown("---")
 
 # --- USER HISTORY SIMULATION ---
 if st.button("🧪 Simulate Fake History"):
-    random_ids = df.sample(top_k)["product_id"].tolist()
-    combined_ids = list(set(random_ids + top_ids))
+    random_ids = service.sample_product_ids(top_k)
+    # Ordered de-dup: the history is oldest first and the taste vector weights recent views more
+    combined_ids = list(dict.fromkeys(random_ids + top_ids))
     user_history[user_id] = combined_ids
+    # The fake history replaces the old one, so the profile is rebuilt from it
+    service.set_history(user_id, combined_ids)
     st.success("✅ Fake history created using random and visually similar products.")
 
     st.markdown("### 🌐 Fake History Products")
-    cols3 = st.columns(5)
-    for i, pid in enumerate(combined_ids):
-        row = df[df["product_id"] == pid].iloc[0]
-        with cols3[i % 5]:
-            st.markdown(f"""
-                <div class="product-card">
-                    <img src=\"{row['feature_image_s3']}\" class="product-img" />
-                    <div class="caption">{row['product_name']}<br/>₹{row['selling_price']}</div>
-                </div>
-            """, unsafe_allow_html=True)
+    render_product_cards(combined_ids)
 
 # --- SUGGESTIONS BASED ON HISTORY ---
 st.markdown("## 👤 Suggestions Based on User History")
 if user_id in user_history and user_history[user_id]:
-    history_ids = user_history[user_id]
-    all_similar = []
-    for pid in history_ids:
-        image_url = df[df["product_id"] == pid]["feature_image_s3"].values[0]
-        try:
-            image_content = requests.get(image_url).content
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp:
-                tmp.write(image_content)
-                local_path = tmp.name
-            similar = search_similar(faiss_index, product_ids, local_path, "", 3)
-            all_similar.extend(similar)
-        except Exception as e:
-            st.warning(f"Skipping image {image_url} due to error: {e}")
-
-    suggestion_ids = list(set(all_similar) - set(history_ids))[:top_k]
+    # One query around the user's taste vector, history excluded
+    suggestion_ids = service.recommend(user_id, top_k)
 
     if suggestion_ids:
-        cols2 = st.columns(5)
-        for i, pid in enumerate(suggestion_ids):
-            row = df[df["product_id"] == pid].iloc[0]
-            with cols2[i % 5]:
-                st.markdown(f"""
-                    <div class="product-card">
-                        <img src=\"{row['feature_image_s3']}\" class="product-img" />
-                        <div class="caption">{row['product_name']}<br/>₹{row['selling_price']}</div>
-                    </div>
-                """, unsafe_allow_html=True)
+        render_product_cards(suggestion_ids)
     else:
         st.info("No new suggestions found based on history.")
 
@@ -202,18 +174,14 @@ st.markdown("---")
 st.markdown("## 💡 Outfit Completion Suggestions")
 if user_history.get(user_id):
     reference_id = top_ids[0] if top_ids else user_history[user_id][0]
-    top_row = df[df["product_id"] == reference_id].iloc[0]
-    image_url = top_row["feature_image_s3"]
 
     if st.button("🧠 Generate Outfit"):
-        suggestions = generate_outfit_gemma(
-            image_url=image_url,
-            row=top_row,
+        # Render tokens as they arrive instead of waiting for the whole completion
+        st.write_stream(service.stream_outfit(
+            product_id=reference_id,
             user_id=user_id,
-            df=df,
-            user_history=user_history,
-            trend_string=trend_string,
-            number_of_suggestions=5,
-            hf_token=st.session_state["HF_TOKEN"]
-        )
-        st.markdown(suggestions)
\ No newline at end of file
+            hf_token=st.session_state["HF_TOKEN"],
+            number_of_suggestions=5
+        ))
+        stats = service.outfit_cache_stats()
+        st.caption(f"📊 Outfit cache: {stats['hits']} hits / {stats['misses']} misses ({stats['hit_rate']:.0%})")
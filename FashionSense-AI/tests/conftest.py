@@ -0,0 +1,111 @@
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+import pytest
+from Modules import outfit_suggester, models, embedding, search
+from Modules.utils import LRUCache
+
+BRANDS = ["Aarong", "Yellow", "Ecstasy", "Richman"]
+
+def make_catalog(n: int = 40, prefix: str = "p") -> pd.DataFrame:
+    """
+    Raw catalog rows in the layout of the dress/jeans CSVs.
+    """
+    return pd.DataFrame({
+        "product_id": [f"{prefix}{i}" for i in range(n)],
+        "feature_image_s3": [f"https://img.example/{prefix}{i}.jpg" for i in range(n)],
+        "product_name": [f"{'Floral' if i % 2 else 'Denim'} item {i}" for i in range(n)],
+        "brand": [BRANDS[i % len(BRANDS)] for i in range(n)],
+        "description": [f"{'floral maxi dress' if i % 2 else 'slim fit jeans'} number {i}" for i in range(n)],
+        "category_id": [i % 3 for i in range(n)],
+        "style_attributes": [f"{{'color': '{'red' if i % 2 else 'blue'}', 'fit': 'regular'}}" for i in range(n)],
+        "mrp": [f"{{'INR': {1000.0 + 100 * i}}}" for i in range(n)],
+        "selling_price": [f"{{'USD': {10.0 + i}}}" for i in range(n)],
+        "meta_info": ["cotton" for _ in range(n)],
+    })
+
+def unit_rows(n: int, d: int, seed: int = 0) -> np.ndarray:
+    rows = np.random.default_rng(seed).standard_normal((n, d)).astype("float32")
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+class StubTextModel:
+    """
+    SentenceTransformer stand-in: a fixed unit vector per text, records each call.
+    """
+    def __init__(self):
+        self.calls = []
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return 384
+
+    def encode(self, texts, batch_size: int = 32, show_progress_bar: bool = False):
+        self.calls.append(texts)
+        batch = [texts] if isinstance(texts, str) else list(texts)
+        rows = np.stack([unit_rows(1, 384, zlib.crc32(text.encode()))[0] for text in batch])
+        return rows[0] if isinstance(texts, str) else rows
+
+def stub_clip_processor(images, return_tensors: str = "np") -> dict:
+    pixels = np.asarray(images.resize((224, 224)), dtype=np.float32).transpose(2, 0, 1) / 255.0
+    return {"pixel_values": pixels[np.newaxis]}
+
+def stub_embed_pixel_batch(pixel_values: np.ndarray) -> np.ndarray:
+    # 3 * 224 * 224 = 512 * 294
+    features = pixel_values.reshape(len(pixel_values), 512, 294).sum(axis=2)
+    return (features / np.linalg.norm(features, axis=1, keepdims=True)).astype("float32")
+
+@pytest.fixture
+def stub_encoders(monkeypatch):
+    """
+    Replace the CLIP and text encoders with stubs and start with empty query caches.
+    """
+    text_model = StubTextModel()
+    monkeypatch.setattr(models, "BACKEND", "torch")
+    monkeypatch.setitem(models._models, "text", text_model)
+    monkeypatch.setitem(models._models, "clip_processor", stub_clip_processor)
+    monkeypatch.setattr(embedding, "embed_pixel_batch", stub_embed_pixel_batch)
+    monkeypatch.setattr(search, "embed_pixel_batch", stub_embed_pixel_batch)
+    monkeypatch.setattr(search, "text_query_cache", LRUCache(maxsize=1024))
+    monkeypatch.setattr(search, "image_query_cache", LRUCache(maxsize=256))
+    return text_model
+
+@pytest.fixture
+def catalog_csvs(tmp_path):
+    dress_path, jeans_path = tmp_path / "dresses.csv", tmp_path / "jeans.csv"
+    make_catalog(30, "d").to_csv(dress_path, index=False)
+    make_catalog(20, "j").to_csv(jeans_path, index=False)
+    return str(dress_path), str(jeans_path)
+
+class FakeLLM(BaseHTTPRequestHandler):
+    """
+    Answers each POST with the next scripted (status, body) response.
+    """
+    responses = []
+    requests = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        type(self).requests += 1
+        status, body = self.responses.pop(0)
+        self.send_response(status)
+        self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def llm(monkeypatch):
+    FakeLLM.responses, FakeLLM.requests = [], 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeLLM)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # Fresh shared session, with its retrying adapter also serving plain http
+    monkeypatch.setattr(outfit_suggester, "_session", None)
+    session = outfit_suggester.get_session()
+    session.mount("http://", session.adapters["https://"])
+    monkeypatch.setattr(outfit_suggester, "API_URL", f"http://127.0.0.1:{server.server_port}/v1/chat/completions")
+    yield FakeLLM
+    server.shutdown()
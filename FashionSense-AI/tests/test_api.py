@@ -0,0 +1,117 @@
+import io
+import base64
+import threading
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+import api
+from Modules import search
+from Modules.dataloader import build_catalog_snapshot
+from Modules.faiss_index import build_faiss_index, write_faiss_assets, IMAGE_DIM
+from tests.conftest import unit_rows
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, catalog_csvs):
+    # SearchService reads Assets/ relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    df = build_catalog_snapshot(*catalog_csvs, "Assets/catalog.parquet")
+    vectors = np.hstack([unit_rows(len(df), IMAGE_DIM), unit_rows(len(df), 384, 1)])
+    index, product_ids = build_faiss_index(dict(zip(df["product_id"], vectors)))
+    write_faiss_assets(index, product_ids, vectors, "Assets")
+    # No encoder downloads: queries are embedded as stored catalog vectors
+    monkeypatch.setattr(api, "warmup", lambda background=False: None)
+    monkeypatch.setattr(search, "encode_text", lambda text: vectors[3, IMAGE_DIM:])
+    monkeypatch.setattr(search, "encode_image", lambda image: vectors[5, :IMAGE_DIM])
+    with TestClient(api.app) as client:
+        client.product_ids = product_ids
+        yield client
+
+def _png() -> str:
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 4), "red").save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+def test_health_and_filters(client):
+    assert client.get("/health").json() == {"status": "ok", "models_loaded": False, "products": 50}
+    assert client.get("/filters/brand").json()["values"] == ["Aarong", "Ecstasy", "Richman", "Yellow"]
+    assert client.get("/filters/color").status_code == 404
+
+def test_search(client):
+    found = client.post("/search", json={"text": "floral maxi", "top_k": 3}).json()["product_ids"]
+    assert found[0] == client.product_ids[3] and len(found) == 3
+
+    found = client.post("/search", json={"image_base64": _png(), "image_weight": 1.0, "top_k": 1}).json()["product_ids"]
+    assert found == [client.product_ids[5]]
+
+    filtered = client.post("/search", json={"text": "floral", "top_k": 50, "filters": {"brand": ["Yellow"]}}).json()["product_ids"]
+    assert filtered and set(client.post("/products", json={"product_ids": filtered}).json()["products"][0]) >= {"product_id", "product_name"}
+
+@pytest.mark.parametrize("payload", [
+    {"image_base64": "not base64!"},
+    {"image_base64": base64.b64encode(b"plain text, not an image").decode()},
+    {"text": "floral", "filters": {"color": ["red"]}},
+    {"text": "floral", "filters": {"selling_price": 2000}},
+    {"text": "floral", "filters": {"selling_price": [None, 2000, 3000]}},
+    {"text": "floral", "filters": {"mrp": ["cheap", None]}},
+    {"text": "floral", "filters": {"brand": [["Yellow"]]}},
+])
+def test_bad_search_requests_are_rejected(client, payload):
+    response = client.post("/search", json=payload)
+    assert response.status_code == 400, response.text
+
+def test_filter_shapes_are_checked_before_searching(client):
+    response = client.post("/search", json={"text": "floral", "filters": {"selling_price": 2000}})
+    assert response.status_code == 400 and "[min, max]" in response.json()["detail"]
+    found = client.post("/search", json={"text": "floral", "top_k": 50, "filters": {"selling_price": [None, 20]}})
+    assert found.status_code == 200 and len(found.json()["product_ids"]) == 22  # USD 10..20 in both CSVs
+    # Other invalid fields keep FastAPI's 422
+    assert client.post("/search", json={"text": "floral", "top_k": 0}).status_code == 422
+
+def test_products_and_samples(client):
+    products = client.post("/products", json={"product_ids": ["j3", "unknown", "d1"]}).json()["products"]
+    assert [row["product_id"] for row in products] == ["j3", "d1"]
+    assert set(products[0]) == {"product_id", "feature_image_s3", "product_name", "selling_price"}
+
+    sample = client.get("/products/sample", params={"n": 5}).json()["product_ids"]
+    assert len(set(sample)) == 5 and set(sample) <= set(client.product_ids)
+
+def test_users_get_their_own_history_and_recommendations(client):
+    alice, bob = client.post("/users").json()["user_id"], client.post("/users").json()["user_id"]
+    assert alice != bob
+
+    client.post(f"/users/{alice}/history", json={"product_ids": ["d2", "d1"], "replace": True})
+    history = client.post(f"/users/{alice}/history", json={"product_ids": ["j0", "d2"]}).json()["product_ids"]
+    assert history == ["d2", "d1", "j0"]
+    assert client.get(f"/users/{bob}/history").json()["product_ids"] == []
+
+    recommended = client.get(f"/users/{alice}/recommendations", params={"top_k": 5}).json()["product_ids"]
+    assert len(recommended) == 5 and not set(recommended) & set(history)
+    assert client.get(f"/users/{bob}/recommendations").json()["product_ids"] == []
+
+def test_trends(client):
+    assert "floral maxi" in client.get("/trends").json()["trend_string"]
+
+def test_outfit_stream_runs_on_the_io_pool(client, monkeypatch):
+    threads = []
+
+    def stream_outfit(product_id, user_id, hf_token, number_of_suggestions=5):
+        for chunk in ["- white ", "sneakers"]:
+            threads.append(threading.current_thread().name)
+            yield chunk
+
+    monkeypatch.setattr(api.state["service"], "stream_outfit", stream_outfit)
+    payload = {"product_id": "d1", "user_id": "u", "hf_token": "hf_test"}
+    response = client.post("/outfit", json=payload)
+
+    assert response.text == "- white sneakers"
+    assert threads and all(name.startswith("llm-io") for name in threads)
+    assert client.post("/outfit", json={**payload, "product_id": "unknown"}).status_code == 404
+
+def test_outfit_stream_end_to_end(client, llm):
+    llm.responses = [(200, b'data: {"choices": [{"delta": {"content": "- belt"}}]}\n\ndata: [DONE]\n\n')]
+    payload = {"product_id": "d1", "user_id": client.post("/users").json()["user_id"], "hf_token": "hf_test"}
+
+    assert client.post("/outfit", json=payload).text == "- belt"
+    assert client.post("/outfit", json=payload).text == "- belt"
+    assert llm.requests == 1 and client.get("/outfit/cache").json()["hits"] == 1
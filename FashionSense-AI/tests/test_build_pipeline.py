@@ -0,0 +1,76 @@
+import os
+import pickle
+import zlib
+import numpy as np
+import pytest
+from Modules import build_pipeline
+from Modules.faiss_index import load_faiss_assets, MODALITY_FILES
+from Modules.utils import NpyAppender
+from tests.conftest import unit_rows
+
+def _fake_embeddings(monkeypatch, embed_images: bool = True):
+    # Deterministic per-product vectors instead of the CLIP / MiniLM encoders
+    def image_embeddings(df, image_base_dir, cache=None):
+        if not embed_images:
+            return {}
+        return {pid: unit_rows(1, 8, seed=zlib.crc32(pid.encode()))[0] for pid in df["product_id"]}
+
+    def text_embeddings(df, text_inputs, cache=None):
+        return {pid: unit_rows(1, 4, seed=zlib.crc32(pid.encode()) + 1)[0] for pid in df["product_id"]}
+
+    monkeypatch.setattr(build_pipeline, "generate_all_image_embeddings", image_embeddings)
+    monkeypatch.setattr(build_pipeline, "generate_all_text_embeddings", text_embeddings)
+
+def test_npy_appender_close_publishes_rows(tmp_path):
+    path = str(tmp_path / "rows.npy")
+    appender = NpyAppender(path)
+    appender.append(np.ones((2, 3)))
+    appender.append(np.zeros((1, 3)))
+    with pytest.raises(ValueError):
+        appender.append(np.zeros((1, 4)))
+    appender.close()
+
+    assert np.load(path).tolist() == [[1, 1, 1], [1, 1, 1], [0, 0, 0]]
+    assert not os.path.exists(appender.tmp_path)
+
+def test_npy_appender_discard_keeps_target(tmp_path):
+    path = str(tmp_path / "rows.npy")
+    np.save(path, np.full((1, 2), 7.0))
+    appender = NpyAppender(path)
+    appender.append(np.zeros((5, 2)))
+    appender.discard()
+
+    assert np.load(path).tolist() == [[7.0, 7.0]]
+    assert not os.path.exists(appender.tmp_path)
+
+@pytest.mark.parametrize("spec", ["flat", "ivf_flat"])
+def test_streaming_build_writes_matching_assets(tmp_path, monkeypatch, catalog_csvs, spec):
+    _fake_embeddings(monkeypatch)
+    count = build_pipeline.build_assets_streaming(*catalog_csvs, "images", str(tmp_path), chunksize=7, index_spec=spec, min_train=20)
+
+    index, product_ids, vectors = load_faiss_assets(str(tmp_path), nprobe=64)
+    assert count == 50 and len(product_ids) == index.ntotal == len(vectors) == 50
+    _, found = index.search(np.ascontiguousarray(vectors), 1)
+    assert found[:, 0].tolist() == list(range(50))
+
+def test_failed_build_keeps_previous_assets(tmp_path, monkeypatch, catalog_csvs):
+    _fake_embeddings(monkeypatch)
+    build_pipeline.build_assets_streaming(*catalog_csvs, "images", str(tmp_path), chunksize=25)
+    before = {name: open(tmp_path / name, "rb").read() for name in ["combined_vectors.npy", "faiss_index.index", "product_ids.pkl"]}
+
+    _fake_embeddings(monkeypatch, embed_images=False)
+    with pytest.raises(ValueError, match="No products could be embedded"):
+        build_pipeline.build_assets_streaming(*catalog_csvs, "images", str(tmp_path), chunksize=25)
+
+    assert {name: open(tmp_path / name, "rb").read() for name in before} == before
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+    with open(tmp_path / "product_ids.pkl", "rb") as f:
+        assert len(pickle.load(f)) == 50
+
+def test_rebuild_drops_stale_modality_indexes(tmp_path, monkeypatch, catalog_csvs):
+    _fake_embeddings(monkeypatch)
+    for filename in MODALITY_FILES.values():
+        (tmp_path / filename).write_bytes(b"left by an earlier build")
+    build_pipeline.build_assets_streaming(*catalog_csvs, "images", str(tmp_path), chunksize=25)
+
+    assert not [filename for filename in MODALITY_FILES.values() if os.path.exists(tmp_path / filename)]
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+from Modules.catalog import Catalog, DISPLAY_COLUMNS
+from Modules.faiss_index import build_faiss_index, make_id_selector, search_index
+
+def _df() -> pd.DataFrame:
+    return pd.DataFrame({
+        "product_id": ["a", "b", "c", "a", "d"],
+        "feature_image_s3": ["ia", "ib", "ic", "ia2", "id"],
+        "product_name": ["A", "B", "C", "A again", "D"],
+        "selling_price": [10.0, 25.0, None, 99.0, 40.0],
+        "mrp": [20.0, 30.0, 15.0, 99.0, 50.0],
+        "brand": ["Zara", "Aarong", "Zara", "Zara", None],
+        "category_id": [1, 2, 1, 1, 3],
+    })
+
+def test_lookups_use_first_row_of_duplicated_ids():
+    catalog = Catalog(_df(), ["c", None, "a", "x", "d"])
+
+    assert len(catalog) == 5 and "a" in catalog and "x" not in catalog
+    assert catalog.get_row("a")["product_name"] == "A"
+    assert catalog.label_of == {"c": 0, "a": 2, "x": 3, "d": 4}
+    assert catalog.get_rows(["d", "x", "a"])["product_id"].tolist() == ["d", "a"]
+    assert list(catalog.get_rows(["b"]).columns) == DISPLAY_COLUMNS
+
+def test_rows_for_labels_skips_deleted_and_unknown():
+    catalog = Catalog(_df(), ["c", None, "a", "x", "d"])
+    rows = catalog.rows_for_labels([4, -1, 1, 3, 0, 99])
+    assert rows["product_id"].tolist() == ["d", "c"]
+
+def test_filter_mask_ranges_and_sets():
+    catalog = Catalog(_df(), ["a", "b", "c", None, "d", "gone"])
+
+    assert catalog.filter_mask({}).tolist() == [True, True, True, False, True, False]
+    assert catalog.filter_mask({"selling_price": (None, 25)}).tolist() == [True, True, False, False, False, False]
+    assert catalog.filter_mask({"selling_price": (20, None), "mrp": (None, 45)}).tolist() == [False, True, False, False, False, False]
+    assert catalog.filter_mask({"brand": "Zara"}).tolist() == [True, False, True, False, False, False]
+    assert catalog.filter_mask({"brand": ["Aarong", "Unknown"], "category_id": [2, 3]}).tolist() == [False, True, False, False, False, False]
+    assert not catalog.filter_mask({"brand": ["Unknown"]}).any()
+
+def test_filter_mask_rejects_unknown_columns():
+    with pytest.raises(ValueError, match="Cannot filter on column 'color'"):
+        Catalog(_df(), ["a"]).filter_mask({"color": "red"})
+
+def test_filtered_search_only_returns_matching_labels():
+    catalog = Catalog(_df(), ["a", "b", "c", "d"])
+    vectors = np.random.default_rng(0).standard_normal((4, 8)).astype("float32")
+    index, _ = build_faiss_index({pid: v for pid, v in zip(["a", "b", "c", "d"], vectors)})
+
+    selector = make_id_selector(catalog.filter_mask({"brand": ["Zara"]}))
+    assert sorted(search_index(index, vectors[1], top_k=4, selector=selector)) == [-1, -1, 0, 2]
+
+def test_selector_rejects_labels_past_the_mask():
+    # The mask was built before 1000 more products were upserted
+    vectors = np.random.default_rng(0).standard_normal((2000, 8)).astype("float32")
+    index, _ = build_faiss_index({f"p{i}": v for i, v in enumerate(vectors)})
+    mask = np.ones(1000, dtype=bool)
+    mask[::10] = False
+
+    found = np.array([search_index(index, v, top_k=20, selector=make_id_selector(mask)) for v in vectors[1000::50]])
+    assert ((found >= 0) & (found < 1000)).all() and mask[found].all()
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from Modules.faiss_index import build_faiss_index, write_faiss_assets, load_faiss_assets, IMAGE_DIM
+from Modules.dedup import cluster_duplicates, find_duplicates, load_canonical_ids, collapse_duplicates
+from tests.conftest import unit_rows
+
+def _near_copy(vector: np.ndarray, seed: int) -> np.ndarray:
+    # Perturb each unit half slightly and renormalize it
+    noisy = vector + 0.01 * np.random.default_rng(seed).standard_normal(len(vector)).astype("float32")
+    halves = [noisy[:IMAGE_DIM], noisy[IMAGE_DIM:]]
+    return np.concatenate([half / np.linalg.norm(half) for half in halves])
+
+@pytest.fixture(params=["flat", "ivf_flat"])
+def assets(request, tmp_path):
+    vectors = np.hstack([unit_rows(1000, IMAGE_DIM), unit_rows(1000, 384, 1)])
+    # Clusters: p10 ~ p11 ~ p12 and p500 ~ p900
+    vectors[11] = _near_copy(vectors[10], 1)
+    vectors[12] = _near_copy(vectors[11], 2)
+    vectors[900] = _near_copy(vectors[500], 3)
+    index, product_ids = build_faiss_index({f"p{i}": v for i, v in enumerate(vectors)}, request.param)
+    write_faiss_assets(index, product_ids, vectors, str(tmp_path))
+    return str(tmp_path)
+
+def test_cluster_duplicates_maps_to_smallest_label():
+    pairs = np.array([[3, 5], [1, 5], [7, 8], [3, 4]])
+    assert cluster_duplicates(pairs, 9).tolist() == [0, 1, 2, 1, 1, 1, 6, 7, 7]
+    assert cluster_duplicates(np.empty((0, 2), dtype=np.int64), 3).tolist() == [0, 1, 2]
+
+def test_find_duplicates_writes_canonical_map(assets):
+    canonical_ids = find_duplicates(assets, threshold=0.97)
+
+    assert canonical_ids == {"p11": "p10", "p12": "p10", "p900": "p500"}
+    assert load_canonical_ids(assets) == canonical_ids
+
+def test_collapse_keeps_one_product_per_cluster(assets):
+    collapse_duplicates(assets, find_duplicates(assets, threshold=0.97))
+
+    index, product_ids, vectors = load_faiss_assets(assets, nprobe=10_000)
+    assert {"p11", "p12", "p900"}.isdisjoint(product_ids) and {"p10", "p500"} <= set(product_ids)
+    live = [label for label, pid in enumerate(product_ids) if pid is not None]
+    _, found = index.search(np.ascontiguousarray(vectors[live]), 1)
+    assert [product_ids[label] for label in found[:, 0]] == [product_ids[label] for label in live]
@@ -0,0 +1,33 @@
+import numpy as np
+from PIL import Image
+from Modules.embedding import embed_image_paths, encode_texts
+from tests.conftest import stub_clip_processor, stub_embed_pixel_batch
+
+def test_unreadable_images_are_skipped_without_shifting_ids(stub_encoders, tmp_path):
+    pids, paths, colors = [], [], {}
+    for i in range(7):
+        path = tmp_path / f"p{i}.jpg"
+        if i in (1, 4):
+            path.write_bytes(b"not an image")
+        elif i != 5:  # p5 has no file at all
+            colors[f"p{i}"] = (30 * i, 255 - 30 * i, 90)
+            Image.new("RGB", (40, 30), colors[f"p{i}"]).save(path, format="PNG")  # lossless, decodes to the same pixels
+        pids.append(f"p{i}")
+        paths.append(str(path))
+
+    embeddings = embed_image_paths(pids, paths, batch_size=3, num_workers=2)
+
+    assert sorted(embeddings) == sorted(colors)
+    for pid, color in colors.items():
+        pixels = stub_clip_processor(Image.new("RGB", (40, 30), color))["pixel_values"]
+        assert np.allclose(embeddings[pid], stub_embed_pixel_batch(pixels)[0], atol=1e-6)
+
+def test_texts_are_encoded_by_length_and_returned_in_input_order(stub_encoders):
+    texts = ["a much longer product description", "short", "mid length text", "", "tiny", "another fairly long one"]
+
+    embeddings = encode_texts(texts, batch_size=2)
+
+    assert [len(batch) for batch in stub_encoders.calls] == [2, 2, 2]
+    lengths = [len(text) for batch in stub_encoders.calls for text in batch]
+    assert lengths == sorted(lengths)
+    assert np.allclose(embeddings, stub_encoders.encode(texts))
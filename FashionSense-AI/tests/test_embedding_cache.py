@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+from Modules import embedding, models
+from Modules.embedding_cache import EmbeddingCache, hash_text
+
+def _rows(n: int, d: int = 4, start: int = 0) -> np.ndarray:
+    return np.arange(start, start + n * d, dtype="float32").reshape(n, d)
+
+def test_round_trip_survives_reopen(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "org/model-a")
+    keys = [hash_text(t) for t in ["red dress", "blue jeans"]]
+    cache.put(keys, _rows(2))
+    cache.save()
+
+    reopened = EmbeddingCache(str(tmp_path), "org/model-a")
+    found = reopened.get_many([keys[1], "missing", None, keys[0]])
+    assert found[1] is None and found[2] is None
+    assert found[0].tolist() == _rows(2)[1].tolist() and found[3].tolist() == _rows(2)[0].tolist()
+    assert len(EmbeddingCache(str(tmp_path), "org/model-b")) == 0
+
+def test_put_ignores_known_keys_and_checks_dim(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "m")
+    cache.put(["a", "b", "a"], _rows(3))
+    cache.put(["a"], _rows(1, start=100))
+    assert len(cache) == 2 and cache.get_many(["a"])[0].tolist() == _rows(1)[0].tolist()
+    with pytest.raises(ValueError):
+        cache.put(["c"], _rows(1, d=5))
+
+def test_unsaved_rows_are_dropped_on_reopen(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "m")
+    cache.put(["a"], _rows(1))
+    cache.save()
+    cache.put(["b"], _rows(1, start=10))  # interrupted build: appended, never saved
+
+    reopened = EmbeddingCache(str(tmp_path), "m")
+    assert len(reopened) == 1 and reopened.get_many(["b"]) == [None]
+    reopened.put(["c"], _rows(1, start=20))
+    assert reopened.get_many(["c"])[0].tolist() == _rows(1, start=20)[0].tolist()
+
+def test_prune_evicts_oldest_unreferenced_entries(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "m")
+    cache.put(list("abcdef"), _rows(6))
+    cache.save()
+
+    reopened = EmbeddingCache(str(tmp_path), "m", max_entries=3)
+    reopened.get_many(["a", "e"])  # still in the catalog
+    reopened.save()
+
+    assert set(reopened.keys) == {"a", "e", "f"}
+    found = EmbeddingCache(str(tmp_path), "m").get_many(["a", "e", "f", "b"])
+    assert [row.tolist() for row in found[:3]] == _rows(6)[[0, 4, 5]].tolist() and found[3] is None
+
+def test_cache_namespace_separates_backends(tmp_path, monkeypatch):
+    assert models.cache_namespace(models.CLIP_MODEL_NAME) == models.CLIP_MODEL_NAME
+
+    monkeypatch.setattr(models, "BACKEND", "onnx")
+    monkeypatch.setattr(models, "ONNX_MODEL_DIR", str(tmp_path))
+    assert models.cache_namespace(models.TEXT_MODEL_NAME) == f"{models.TEXT_MODEL_NAME}@onnx-fp32"
+    (tmp_path / "clip_image.int8.onnx").write_bytes(b"")
+    assert models.cache_namespace(models.CLIP_MODEL_NAME) == f"{models.CLIP_MODEL_NAME}@onnx-int8"
+    assert models.cache_namespace(models.TEXT_MODEL_NAME) == f"{models.TEXT_MODEL_NAME}@onnx-fp32"
+
+    # A cache filled by the PyTorch encoder is refused while the ONNX one is active
+    torch_cache = EmbeddingCache(str(tmp_path / "cache"), models.TEXT_MODEL_NAME)
+    df = pd.DataFrame({"product_id": ["p0"]})
+    with pytest.raises(ValueError, match="does not match the active encoder"):
+        embedding.generate_all_text_embeddings(df, ["red dress"], cache=torch_cache)
@@ -0,0 +1,108 @@
+import faiss
+import numpy as np
+import pytest
+from Modules.faiss_index import (
+    build_faiss_index, write_faiss_assets, load_faiss_assets, remove_products, upsert_products,
+    compact_faiss_assets, apply_catalog_delta, remove_from_faiss_assets, ensure_id_map, is_labeled, make_index, train_index, set_search_params
+)
+
+# ivf_pq with m=8 keeps the codes fine enough that a vector's nearest entry is itself
+SPECS = ["flat", "ivf_flat", {"type": "ivf_pq", "m": 8}, "hnsw"]
+
+def _vectors(n: int = 2000, d: int = 32, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((n, d)).astype("float32")
+
+def _build(vectors: np.ndarray, spec) -> tuple:
+    index, ids = build_faiss_index({f"p{i}": v for i, v in enumerate(vectors)}, spec)
+    # Visit every IVF list so results are exact and failures can only come from labeling
+    set_search_params(index, nprobe=10_000, ef_search=256)
+    return index, list(ids)
+
+def _self_hits(index, product_ids: list, vectors: np.ndarray) -> list:
+    live = [label for label, pid in enumerate(product_ids) if pid is not None]
+    _, found = index.search(np.ascontiguousarray(vectors[live]), 1)
+    return [product_ids[label] for label in found[:, 0]], [product_ids[label] for label in live]
+
+@pytest.mark.parametrize("spec", SPECS, ids=str)
+def test_search_by_own_vector_after_delete(spec):
+    vectors = _vectors()
+    index, ids = _build(vectors, spec)
+    vectors = remove_products(index, ids, vectors, [f"p{i}" for i in range(0, 1000, 3)])
+
+    found, expected = _self_hits(index, ids, vectors)
+    assert found == expected
+
+@pytest.mark.parametrize("spec", SPECS, ids=str)
+def test_search_after_upsert_and_delete(spec):
+    vectors = _vectors()
+    index, ids = _build(vectors, spec)
+    replacement = _vectors(1, seed=1)[0]
+    vectors = remove_products(index, ids, vectors, ["p7"])
+    vectors = upsert_products(index, ids, vectors, {"p5": replacement, "new": vectors[7]})
+
+    _, found = index.search(np.stack([replacement, vectors[8]]), 1)
+    assert [ids[label] for label in found[:, 0]] == ["p5", "p8"]
+    assert "p7" not in ids and ids[-1] == "new"
+    found, expected = _self_hits(index, ids, vectors)
+    assert found == expected
+
+@pytest.mark.parametrize("spec", ["flat", "ivf_flat"])
+def test_apply_catalog_delta_keeps_labels(tmp_path, spec):
+    vectors = _vectors()
+    index, ids = _build(vectors, spec)
+    write_faiss_assets(index, ids, vectors, str(tmp_path))
+
+    apply_catalog_delta(upserts={"p5": vectors[6]}, removals=["p7"], load_dir=str(tmp_path))
+    index, ids, stored = load_faiss_assets(str(tmp_path), nprobe=10_000, mmap=True)
+
+    _, found = index.search(vectors[[6, 8]], 2)
+    assert {ids[label] for label in found[0]} == {"p5", "p6"}
+    assert ids[found[1][0]] == "p8"
+    assert ids[7] is None and not stored[7].any()
+
+@pytest.mark.parametrize("spec", SPECS, ids=str)
+def test_compaction_renumbers_live_products(spec):
+    vectors = _vectors(500)
+    index, ids = _build(vectors, spec)
+    vectors = remove_products(index, ids, vectors, [f"p{i}" for i in range(0, 500, 2)])
+
+    index, ids, vectors = compact_faiss_assets(index, ids, vectors)
+    set_search_params(index, nprobe=10_000, ef_search=256)
+    assert ids == [f"p{i}" for i in range(1, 500, 2)] and len(vectors) == 250
+    found, expected = _self_hits(index, ids, vectors)
+    assert found == expected
+
+def test_legacy_idmap_ivf_is_unwrapped():
+    vectors = _vectors()
+    base = make_index(vectors.shape[1], "ivf_flat", n_train=len(vectors))
+    train_index(base, vectors)
+    legacy = faiss.IndexIDMap2(base)
+    legacy.add_with_ids(vectors, np.arange(len(vectors), dtype="int64"))
+    assert not is_labeled(legacy)
+
+    index = ensure_id_map(legacy, vectors)
+    assert is_labeled(index) and index.ntotal == len(vectors)
+    ids = [f"p{i}" for i in range(len(vectors))]
+    set_search_params(index, nprobe=10_000)
+    vectors = remove_products(index, ids, vectors, ids[:500:2])
+    found, expected = _self_hits(index, ids, vectors)
+    assert found == expected
+
+@pytest.mark.parametrize("spec", SPECS, ids=str)
+@pytest.mark.parametrize("n_removed", [50, 900])
+def test_streamed_removal_matches_catalog_delta(tmp_path, spec, n_removed):
+    vectors = _vectors()
+    index, ids = _build(vectors, spec)
+    removals = [f"p{i}" for i in range(1, 2 * n_removed, 2)] + ["unknown"]
+    for name in ["delta", "streamed"]:
+        write_faiss_assets(index, ids, vectors, str(tmp_path / name))
+
+    apply_catalog_delta(removals=removals, load_dir=str(tmp_path / "delta"))
+    assert remove_from_faiss_assets(removals, load_dir=str(tmp_path / "streamed"), batch_size=300) == n_removed
+
+    expected = load_faiss_assets(str(tmp_path / "delta"), nprobe=10_000, ef_search=256)
+    index, ids, stored = load_faiss_assets(str(tmp_path / "streamed"), nprobe=10_000, ef_search=256, mmap=True)
+    assert ids == expected[1] and np.array_equal(stored, expected[2])
+    assert (None in ids) == (n_removed == 50)
+    found, live = _self_hits(index, ids, stored)
+    assert found == live
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from Modules.faiss_index import build_faiss_index, write_faiss_assets, apply_catalog_delta, load_faiss_assets, IMAGE_DIM
+from Modules.knn_graph import build_knn_graph, merge_knn_shards, load_knn_graph, refresh_knn_graph
+from tests.conftest import unit_rows
+
+N_NEIGHBORS = 5
+
+def _combined(n: int, seed: int = 0) -> np.ndarray:
+    return np.hstack([unit_rows(n, IMAGE_DIM, seed), unit_rows(n, 384, seed + 1)])
+
+@pytest.fixture
+def assets(tmp_path):
+    vectors = _combined(300)
+    index, product_ids = build_faiss_index({f"p{i}": v for i, v in enumerate(vectors)})
+    write_faiss_assets(index, product_ids, vectors, str(tmp_path))
+    return str(tmp_path)
+
+def _exact_neighbors(load_dir: str) -> dict:
+    # Brute-force top neighbors of every live product, by product ID
+    _, product_ids, vectors = load_faiss_assets(load_dir)
+    live = np.array([label for label, pid in enumerate(product_ids) if pid is not None])
+    similarity = vectors[live] @ vectors[live].T
+    np.fill_diagonal(similarity, -np.inf)
+    order = np.argsort(-similarity, axis=1)[:, :N_NEIGHBORS]
+    return {product_ids[label]: [product_ids[live[j]] for j in row] for label, row in zip(live, order)}
+
+def _graph_neighbors(load_dir: str) -> dict:
+    _, product_ids, _ = load_faiss_assets(load_dir)
+    neighbors, _ = load_knn_graph(load_dir, product_ids)
+    return {pid: [product_ids[j] for j in neighbors[label] if j >= 0] for label, pid in enumerate(product_ids) if pid is not None}
+
+def test_build_matches_brute_force(assets):
+    neighbors, scores = build_knn_graph(assets, N_NEIGHBORS, batch_size=64, num_workers=2)
+
+    assert _graph_neighbors(assets) == _exact_neighbors(assets)
+    _, _, vectors = load_faiss_assets(assets)
+    expected = (vectors[0] @ vectors[neighbors[0]].T) / 2  # cosine of two unit halves
+    assert np.allclose(scores[0].astype("float32"), expected, atol=2e-3)
+    assert (np.diff(scores.astype("float32"), axis=1) <= 1e-3).all()
+
+def test_merged_shards_equal_full_build(assets):
+    full_neighbors, full_scores = build_knn_graph(assets, N_NEIGHBORS)
+    for shard in range(3):
+        build_knn_graph(assets, N_NEIGHBORS, shard=(shard, 3))
+    merge_knn_shards(assets, 3)
+
+    neighbors, scores = load_knn_graph(assets)
+    assert np.array_equal(neighbors, full_neighbors) and np.array_equal(scores, full_scores)
+
+@pytest.mark.parametrize("compact_ratio", [0.9, 0.0])
+def test_refresh_after_delta_tracks_changed_products(assets, compact_ratio):
+    build_knn_graph(assets, N_NEIGHBORS)
+    _, _, vectors = load_faiss_assets(assets)
+    upserts = {"p3": vectors[200] * 0.99 + vectors[3] * 0.01, "new": vectors[100]}
+    apply_catalog_delta(upserts=upserts, removals=["p7", "p8"], load_dir=assets, compact_ratio=compact_ratio)
+
+    refresh_knn_graph(assets, changed_ids=list(upserts))
+    refreshed, exact = _graph_neighbors(assets), _exact_neighbors(assets)
+    assert refreshed.keys() == exact.keys()
+    for pid in ["p3", "new", "p100", "p200"]:
+        assert refreshed[pid] == exact[pid]
+    assert not {"p7", "p8", None} & {neighbor for row in refreshed.values() for neighbor in row}
+
+def test_refresh_without_graph_builds_it(assets):
+    neighbors, _ = refresh_knn_graph(assets, changed_ids=["p1"], n_neighbors=N_NEIGHBORS)
+
+    assert neighbors.shape == (300, N_NEIGHBORS)
+    assert _graph_neighbors(assets) == _exact_neighbors(assets)
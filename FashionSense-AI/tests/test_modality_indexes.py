@@ -0,0 +1,73 @@
+import faiss
+import numpy as np
+import pytest
+from Modules.faiss_index import (
+    build_faiss_index, build_modality_indexes, write_faiss_assets, write_modality_indexes,
+    load_faiss_assets, load_modality_indexes, apply_catalog_delta, MODALITY_SLICES, IMAGE_DIM
+)
+from Modules.search import search_modalities
+from tests.conftest import unit_rows
+
+def _combined(n: int, seed: int = 0) -> np.ndarray:
+    return np.hstack([unit_rows(n, IMAGE_DIM, seed), unit_rows(n, 384, seed + 1)])
+
+def _write_assets(save_dir: str, vectors: np.ndarray, spec) -> list:
+    index, product_ids = build_faiss_index({f"p{i}": v for i, v in enumerate(vectors)}, spec)
+    write_faiss_assets(index, product_ids, vectors, save_dir)
+    write_modality_indexes(build_modality_indexes(vectors, product_ids, spec), save_dir)
+    return product_ids
+
+def _assert_modalities_find_themselves(load_dir: str):
+    _, product_ids, vectors = load_faiss_assets(load_dir)
+    modality_indexes = load_modality_indexes(load_dir, nprobe=10_000, mmap=True)
+    live = [label for label, pid in enumerate(product_ids) if pid is not None]
+    for name, cols in MODALITY_SLICES.items():
+        for label in live[::7]:
+            found = search_modalities(modality_indexes, **{f"{name}_embedding": vectors[label, cols]}, top_k=1)
+            assert product_ids[found[0]] == product_ids[label], name
+
+@pytest.mark.parametrize("spec", ["flat", "ivf_flat"])
+def test_modality_indexes_follow_catalog_deltas(tmp_path, spec):
+    vectors = _combined(1200)
+    _write_assets(str(tmp_path), vectors, spec)
+    new_vectors = _combined(3, seed=5)
+
+    apply_catalog_delta(
+        upserts={"p5": new_vectors[0], "new0": new_vectors[1], "new1": new_vectors[2]},
+        removals=[f"p{i}" for i in range(0, 200, 2)],
+        load_dir=str(tmp_path)
+    )
+    _assert_modalities_find_themselves(str(tmp_path))
+    modality_indexes = load_modality_indexes(str(tmp_path))
+    assert all(index.ntotal == 1200 - 100 + 2 for index in modality_indexes.values())
+
+    # Deleting past compact_ratio renumbers every label
+    apply_catalog_delta(removals=[f"p{i}" for i in range(200, 600)], load_dir=str(tmp_path))
+    _, product_ids, _ = load_faiss_assets(str(tmp_path))
+    assert None not in product_ids and "new1" in product_ids
+    _assert_modalities_find_themselves(str(tmp_path))
+
+def test_legacy_wrapped_ivf_modality_index_is_migrated(tmp_path):
+    vectors = _combined(1200)
+    product_ids = _write_assets(str(tmp_path), vectors, "flat")
+    # Older builds wrapped IVF sub-indexes in IndexIDMap2
+    cols = MODALITY_SLICES["image"]
+    quantizer = faiss.IndexFlatL2(IMAGE_DIM)
+    base = faiss.IndexIVFFlat(quantizer, IMAGE_DIM, 16)
+    base.train(np.ascontiguousarray(vectors[:, cols]))
+    legacy = faiss.IndexIDMap2(base)
+    legacy.add_with_ids(np.ascontiguousarray(vectors[:, cols]), np.arange(len(product_ids), dtype="int64"))
+    write_modality_indexes({"image": legacy, "text": load_modality_indexes(str(tmp_path))["text"]}, str(tmp_path))
+
+    apply_catalog_delta(removals=[f"p{i}" for i in range(0, 100, 3)], load_dir=str(tmp_path))
+    assert isinstance(load_modality_indexes(str(tmp_path))["image"], faiss.IndexIVFFlat)
+    _assert_modalities_find_themselves(str(tmp_path))
+
+def test_sub_indexes_of_another_catalog_are_skipped(tmp_path):
+    _write_assets(str(tmp_path), _combined(300), "flat")
+    # A rebuild of the combined index alone leaves the old sub-indexes behind
+    index, product_ids = build_faiss_index({f"q{i}": v for i, v in enumerate(_combined(200, seed=3))})
+    write_faiss_assets(index, product_ids, _combined(200, seed=3), str(tmp_path))
+
+    assert load_modality_indexes(str(tmp_path), ntotal=index.ntotal) == {}
+    assert set(load_modality_indexes(str(tmp_path), ntotal=300)) == {"image", "text"}
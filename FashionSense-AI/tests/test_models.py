@@ -0,0 +1,32 @@
+import time
+import threading
+from Modules import models
+
+def test_concurrent_first_calls_load_each_model_once(monkeypatch):
+    monkeypatch.setattr(models, "_models", {})
+    monkeypatch.setattr(models, "BACKEND", "torch")
+    loads = {"clip_processor": 0, "clip": 0, "text": 0}
+
+    def slow_loader(name):
+        def load():
+            loads[name] += 1
+            time.sleep(0.05)  # keep the other threads waiting on the lock
+            return object()
+        return load
+
+    for name, loader in [("clip_processor", "_load_clip_processor"), ("clip", "_load_clip_model"), ("text", "_load_text_model")]:
+        monkeypatch.setattr(models, loader, slow_loader(name))
+
+    results = []
+    def use_models():
+        results.append((*models.get_clip(), models.get_text_model()))
+
+    threads = [threading.Thread(target=use_models) for _ in range(8)]
+    assert not models.is_loaded()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loads == {"clip_processor": 1, "clip": 1, "text": 1}
+    assert len(set(results)) == 1 and models.is_loaded()
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from PIL import Image
+from Modules import models, onnx_backend
+from Modules.onnx_backend import check_parity, PARITY_MIN_COSINE
+from tests.conftest import StubTextModel, stub_clip_processor, stub_embed_pixel_batch, unit_rows
+
+torch = pytest.importorskip("torch")
+
+class StubClip:
+    device = "cpu"
+
+    def get_image_features(self, pixel_values):
+        return torch.from_numpy(stub_embed_pixel_batch(pixel_values.numpy()))
+
+def _drifted(embeddings: np.ndarray, drift: float) -> np.ndarray:
+    noisy = embeddings + drift * unit_rows(len(embeddings), embeddings.shape[1], 9)
+    return noisy / np.linalg.norm(noisy, axis=1, keepdims=True)
+
+def _fake_onnx(monkeypatch, text_drift: float, image_drift: float):
+    class FakeText:
+        def __init__(self, model_dir, intra_op_threads=None):
+            pass
+        def encode(self, texts):
+            return _drifted(StubTextModel().encode(texts), text_drift)
+
+    class FakeImage:
+        def __init__(self, model_dir, intra_op_threads=None):
+            pass
+        def embed(self, pixels):
+            return _drifted(stub_embed_pixel_batch(pixels), image_drift)
+
+    monkeypatch.setattr(onnx_backend, "OnnxTextEncoder", FakeText)
+    monkeypatch.setattr(onnx_backend, "OnnxImageEncoder", FakeImage)
+
+@pytest.fixture
+def torch_models(monkeypatch):
+    monkeypatch.setitem(models._models, "text", StubTextModel())
+    monkeypatch.setitem(models._models, "clip_processor", stub_clip_processor)
+    monkeypatch.setitem(models._models, "clip", StubClip())
+
+IMAGES = [Image.new("RGB", (32, 32), (40 * i, 200 - 40 * i, 90)) for i in range(4)]
+
+@pytest.mark.parametrize("text_drift, image_drift, passed", [
+    (0.0, 0.0, {"text": True, "image": True}),
+    (0.1, 0.1, {"text": True, "image": True}),    # cosine ~0.995
+    (0.3, 0.1, {"text": False, "image": True}),   # text cosine ~0.96
+    (0.1, 0.5, {"text": True, "image": False}),   # image cosine ~0.9
+])
+def test_parity_thresholds(torch_models, monkeypatch, text_drift, image_drift, passed):
+    _fake_onnx(monkeypatch, text_drift, image_drift)
+    report = check_parity("unused", images=IMAGES)
+    assert {modality: stats["passed"] for modality, stats in report.items()} == passed
+    assert report["image"]["n"] == 4 and report["text"]["min_cosine"] <= report["text"]["mean_cosine"]
+    if text_drift == 0.0:
+        assert report["text"]["min_cosine"] == pytest.approx(1.0, abs=1e-6)
+
+def test_thresholds_can_be_overridden(torch_models, monkeypatch):
+    _fake_onnx(monkeypatch, 0.3, 0.0)
+    report = check_parity("unused", min_cosine={"text": 0.9})
+    assert report["text"]["passed"] and "image" not in report
+    assert PARITY_MIN_COSINE["text"] > report["text"]["min_cosine"]
@@ -0,0 +1,52 @@
+import pytest
+from Modules import outfit_cache
+from Modules.outfit_cache import OutfitCache, outfit_cache_key
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(outfit_cache.time, "time", lambda: now[0])
+    return now
+
+def test_key_covers_every_input():
+    base = ("p1", ("Zara", "casual", "cotton"), "v1", 5, "gemma")
+    keys = {
+        outfit_cache_key(*base),
+        outfit_cache_key("p2", *base[1:]),
+        outfit_cache_key("p1", ("Zara", "formal", "cotton"), *base[2:]),
+        outfit_cache_key(*base[:2], "v2", *base[3:]),
+        outfit_cache_key(*base[:3], 3, "gemma"),
+        outfit_cache_key(*base[:4], "other-model"),
+    }
+    assert len(keys) == 6 and outfit_cache_key(*base) in keys
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = OutfitCache(str(tmp_path / "outfits.db"), ttl=60)
+    cache.put("k", "- sneakers")
+    clock[0] += 59
+    assert cache.get("k") == "- sneakers"
+    clock[0] += 2
+    assert cache.get("k") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "entries": 1}
+
+    cache.put("other", "- belt")  # writes drop expired entries
+    assert len(cache) == 1
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = OutfitCache(str(tmp_path / "outfits.db"), max_entries=2)
+    cache.put("a", "A")
+    clock[0] += 1
+    cache.put("b", "B")
+    clock[0] += 1
+    cache.get("a")
+    clock[0] += 1
+    cache.put("c", "C")
+
+    assert [cache.get(key) for key in "abc"] == ["A", None, "C"]
+
+def test_entries_persist_across_instances(tmp_path):
+    OutfitCache(str(tmp_path / "outfits.db")).put("k", "- sneakers")
+    reopened = OutfitCache(str(tmp_path / "outfits.db"))
+    assert reopened.get("k") == "- sneakers"
+    reopened.clear()
+    assert len(reopened) == 0
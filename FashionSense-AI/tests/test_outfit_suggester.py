@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+from Modules import outfit_suggester
+from Modules.outfit_cache import OutfitCache
+
+ROW = pd.Series({
+    "product_id": "p1", "product_name": "Floral dress", "brand": "Zara", "style_attributes": "casual",
+    "description": "floral maxi dress", "selling_price": 2500.0, "meta_info": "cotton", "feature_image_s3": "https://img/p1.jpg",
+})
+
+def _generate(**kwargs):
+    return outfit_suggester.generate_outfit_gemma(
+        ROW["feature_image_s3"], ROW, "u", pd.DataFrame([ROW]), {"u": ["p1"]}, "floral", hf_token="hf_test", **kwargs
+    )
+
+def _completion(text: str) -> bytes:
+    return ('{"choices": [{"message": {"content": "%s"}}]}' % text).encode()
+
+def test_rate_limited_requests_are_retried(llm):
+    llm.responses = [(429, b"slow down"), (200, _completion("- white sneakers"))]
+    assert _generate() == "- white sneakers"
+    assert llm.requests == 2
+
+@pytest.mark.parametrize("status", [500, 503])
+def test_server_errors_are_not_resent(llm, status):
+    llm.responses = [(status, b"upstream failed"), (200, _completion("billed twice"))]
+    assert _generate().startswith("❌ Error generating outfit")
+    assert llm.requests == 1
+
+def _sse(*tokens: str, done: bool = True) -> bytes:
+    events = ['data: {"choices": [{"delta": {"content": "%s"}}]}\n\n' % token for token in tokens]
+    return "".join(events + (["data: [DONE]\n\n"] if done else [])).encode()
+
+def _stream(cache) -> str:
+    return "".join(outfit_suggester.stream_outfit_gemma(
+        ROW["feature_image_s3"], ROW, "u", pd.DataFrame([ROW]), {"u": ["p1"]}, "floral", hf_token="hf_test", cache=cache
+    ))
+
+def test_complete_stream_is_cached(llm, tmp_path):
+    cache = OutfitCache(str(tmp_path / "outfits.db"))
+    llm.responses = [(200, _sse("- white ", "sneakers"))]
+
+    assert _stream(cache) == "- white sneakers"
+    assert _stream(cache) == "- white sneakers"
+    assert llm.requests == 1 and cache.stats()["hits"] == 1
+
+def test_truncated_stream_is_not_cached(llm, tmp_path):
+    cache = OutfitCache(str(tmp_path / "outfits.db"))
+    llm.responses = [(200, _sse("- white ", done=False)), (200, _sse("- white ", "sneakers"))]
+
+    assert _stream(cache) == "- white "
+    assert len(cache) == 0
+    assert _stream(cache) == "- white sneakers"
+    assert llm.requests == 2 and len(cache) == 1
@@ -0,0 +1,172 @@
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from PIL import Image
+from Modules import search
+from Modules.catalog import Catalog
+from Modules.faiss_index import (
+    build_faiss_index, build_modality_indexes, write_faiss_assets, remove_products, set_search_params, MODALITY_SLICES, IMAGE_DIM
+)
+from Modules.knn_graph import build_knn_graph
+from Modules.search import (
+    encode_image, encode_text, search_by_taste, search_by_product_ids, search_similar, search_similar_batch
+)
+from Modules.user_profile import UserProfileStore
+from Modules.utils import LRUCache
+from tests.conftest import unit_rows, stub_embed_pixel_batch
+
+@pytest.mark.parametrize("spec", ["flat", "ivf_flat"])
+def test_taste_recommendations_exclude_history(tmp_path, spec):
+    vectors = np.hstack([unit_rows(1000, IMAGE_DIM), unit_rows(1000, 384, 1)])
+    index, product_ids = build_faiss_index({f"p{i}": v for i, v in enumerate(vectors)}, spec)
+    set_search_params(index, nprobe=10_000)
+    vectors = remove_products(index, product_ids, vectors, ["p3", "p4"])
+    history = ["p10", "p11", "p12"]
+    store = UserProfileStore(str(tmp_path / "profiles.db"))
+    store.update_taste("u", vectors[[10, 11, 12]])
+
+    found = search_by_taste(index, product_ids, store.get_taste("u"), exclude_ids=history, top_k=10)
+
+    query = store.get_taste("u")
+    for columns in MODALITY_SLICES.values():
+        query[columns] /= np.linalg.norm(query[columns])
+    distances = ((vectors - query) ** 2).sum(axis=1)
+    distances[[3, 4, 10, 11, 12]] = np.inf
+    assert found == [product_ids[label] for label in np.argsort(distances)[:10]]
+
+def _flat_catalog(n: int = 400):
+    vectors = np.hstack([unit_rows(n, IMAGE_DIM), unit_rows(n, 384, 1)])
+    index, product_ids = build_faiss_index({f"p{i}": v for i, v in enumerate(vectors)}, "flat")
+    df = pd.DataFrame({
+        "product_id": product_ids,
+        "brand": [["Zara", "Aarong", "Yellow", "Richman"][i % 4] for i in range(n)],
+        "selling_price": [float(100 + 7 * i % 1000) for i in range(n)],
+    })
+    return index, product_ids, vectors, Catalog(df, product_ids)
+
+FILTERS = [None, {"brand": ["Zara", "Yellow"]}, {"selling_price": (None, 400), "brand": "Aarong"}]
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_batch_matches_single_searches(stub_encoders, filters):
+    index, product_ids, vectors, catalog = _flat_catalog()
+    texts = ["Floral  Maxi dress", "black jeans", "linen shirt"]
+    query_ids = ["p5", "p17", "p240"]
+
+    batch, _ = search_similar_batch(
+        index, product_ids, query_texts=texts, top_k=10, filters=filters, catalog=catalog, vectors=vectors
+    )
+    assert batch == [
+        search_similar(index, product_ids, query_text=text, top_k=10, filters=filters, catalog=catalog, vectors=vectors)
+        for text in texts
+    ]
+
+    batch, _ = search_similar_batch(
+        index, product_ids, query_product_ids=query_ids, top_k=10, filters=filters, catalog=catalog, vectors=vectors
+    )
+    assert batch == [
+        search_similar(index, product_ids, query_product_id=pid, top_k=10, filters=filters, catalog=catalog, vectors=vectors)
+        for pid in query_ids
+    ]
+    assert all(len(ids) == 10 and pid not in ids for pid, ids in zip(query_ids, batch))
+
+def test_similar_to_history_with_and_without_graph(tmp_path):
+    vectors = np.hstack([unit_rows(300, IMAGE_DIM), unit_rows(300, 384, 1)])
+    # p1 is a near copy of p0, so the closest neighbor of p0 is another history item
+    vectors[1] = vectors[0] + 0.01 * np.hstack([unit_rows(1, IMAGE_DIM, 2), unit_rows(1, 384, 3)])[0]
+    for columns in MODALITY_SLICES.values():
+        vectors[1, columns] /= np.linalg.norm(vectors[1, columns])
+    index, product_ids = build_faiss_index({f"p{i}": v for i, v in enumerate(vectors)})
+    write_faiss_assets(index, product_ids, vectors, str(tmp_path))
+    history, top_k = ["p0", "p1", "p42"], 4
+    knn_graph = build_knn_graph(str(tmp_path), n_neighbors=top_k + len(history), batch_size=64, num_workers=2)
+
+    # Brute force: each query's top_k + len(history) hits, merged by distance
+    labels = [0, 1, 42]
+    distances = ((vectors[labels][:, np.newaxis] - vectors[np.newaxis]) ** 2).sum(axis=2)
+    nearest = np.argsort(distances, axis=1)[:, :top_k + len(history)]
+    hits = sorted((distances[q, j], product_ids[j]) for q, row in enumerate(nearest) for j in row)
+    expected = list(dict.fromkeys(pid for _, pid in hits if pid not in history))
+    per_query = {pid for row in nearest for pid in [product_ids[j] for j in row if product_ids[j] not in history][:top_k]}
+
+    batched = search_by_product_ids(index, product_ids, history, top_k=top_k, vectors=vectors)
+    from_graph = search_by_product_ids(index, product_ids, history, top_k=top_k, vectors=vectors, knn_graph=knn_graph)
+
+    assert batched == expected
+    for found in [batched, from_graph]:
+        assert len(found) == len(set(found)) and not set(found) & set(history)
+        assert per_query <= set(found)
+
+def test_text_queries_are_cached_by_normalized_text(stub_encoders, monkeypatch):
+    first = encode_text("Floral Maxi")
+    assert encode_text("  floral   MAXI ") is first and stub_encoders.calls == ["floral maxi"]
+    assert not first.flags.writeable
+
+    monkeypatch.setattr(search, "text_query_cache", LRUCache(maxsize=2))
+    for query in ["a", "b", "a", "c", "a", "b"]:
+        encode_text(query)
+    # "a" was used again before "c" came in, so "b" was evicted and re-encoded
+    assert stub_encoders.calls[1:] == ["a", "b", "c", "b"]
+
+def test_image_queries_are_cached_by_content(stub_encoders, monkeypatch, tmp_path):
+    batches = []
+    def counting_embed(pixel_values):
+        batches.append(len(pixel_values))
+        return stub_embed_pixel_batch(pixel_values)
+    monkeypatch.setattr(search, "embed_pixel_batch", counting_embed)
+
+    image = Image.new("RGB", (64, 48), (200, 30, 90))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    (tmp_path / "query.png").write_bytes(buffer.getvalue())
+
+    from_bytes = encode_image(buffer.getvalue())
+    # The same upload, and the same file on disk, hash to the same key
+    assert encode_image(buffer.getvalue()) is from_bytes
+    assert encode_image(str(tmp_path / "query.png")) is from_bytes
+    from_pil = encode_image(image)
+    assert encode_image(image.copy()) is from_pil
+    assert np.allclose(from_pil, from_bytes) and len(batches) == 2
+    assert encode_image(Image.new("RGB", (64, 48), (10, 30, 90))) is not from_pil and len(batches) == 3
+
+@pytest.mark.parametrize("filters", FILTERS[1:])
+def test_filter_paths_match_brute_force(stub_encoders, monkeypatch, filters):
+    index, product_ids, vectors, catalog = _flat_catalog()
+    mask = catalog.filter_mask(filters)
+    query = np.concatenate([np.zeros(IMAGE_DIM, dtype=np.float32), encode_text("floral maxi dress")])
+    distances = np.where(mask, ((vectors - query) ** 2).sum(axis=1), np.inf)
+    expected = [product_ids[label] for label in np.argsort(distances)[:10]]
+
+    def run(**kwargs):
+        return search_similar(index, product_ids, query_text="floral maxi dress", top_k=10, filters=filters, catalog=catalog, **kwargs)
+
+    exact = run(vectors=vectors)
+    with_selector = run()
+    monkeypatch.setattr(search, "EXACT_FILTER_LIMIT", 0)
+    assert exact == with_selector == run(vectors=vectors) == expected
+
+def test_modality_search_respects_filters(stub_encoders):
+    index, product_ids, vectors, catalog = _flat_catalog()
+    modality_indexes = build_modality_indexes(vectors, product_ids)
+    filters = {"brand": ["Zara", "Yellow"], "selling_price": (300, None)}
+    mask = catalog.filter_mask(filters)
+    image = Image.new("RGB", (32, 32), (120, 60, 200))
+    image_sims = vectors[:, MODALITY_SLICES["image"]] @ encode_image(image)
+    text_sims = vectors[:, MODALITY_SLICES["text"]] @ encode_text("floral maxi dress")
+
+    def brute_force(sims: np.ndarray) -> list:
+        return [product_ids[label] for label in np.argsort(-np.where(mask, sims, -np.inf))[:10]]
+
+    def run(**kwargs):
+        return search_similar(
+            index, product_ids, query_text="floral maxi dress", top_k=10, modality_indexes=modality_indexes,
+            filters=filters, catalog=catalog, **kwargs
+        )
+
+    # Exact ranking of the candidates is the weighted cosine itself
+    assert run(query_image_path=image, image_weight=0.3, vectors=vectors) == brute_force(0.3 * image_sims + 0.7 * text_sims)
+    # Late fusion over the selector-restricted indexes only sees matching products
+    fused = run(query_image_path=image, image_weight=0.3)
+    assert len(fused) == 10 and all(mask[product_ids.index(pid)] for pid in fused)
+    # A single modality searches one restricted index, exactly on a flat index
+    assert run() == run(vectors=vectors) == brute_force(text_sims)
@@ -0,0 +1,116 @@
+import os
+import time
+import threading
+import pandas as pd
+from Modules.dataloader import build_catalog_snapshot, load_catalog_snapshot, CATALOG_COLUMNS
+from Modules.trends import (
+    refresh_trends, load_trends, count_terms, get_combined_trend_string, schedule_trend_refresh, KEEP_VERSIONS
+)
+from tests.conftest import make_catalog
+
+def _catalog(styles: list, start: int = 0, dates: list = None) -> pd.DataFrame:
+    df = pd.DataFrame({
+        "product_id": [f"p{start + i}" for i in range(len(styles))],
+        "brand": ["Zara" if i % 2 else "Aarong" for i in range(len(styles))],
+        "description": [f"{style} cotton Zara" for style in styles],
+        "style_attributes": [{"pattern": style.split()[0]} for style in styles],
+    })
+    if dates is not None:
+        df["listed"] = dates
+    return df
+
+FIRST = _catalog(["floral maxi"] * 4 + ["denim jacket"] * 3 + ["linen shirt"] * 3)
+SECOND = _catalog(["floral maxi"] * 2 + ["denim jacket"] * 3 + ["sequin gown"] * 5, start=10)
+
+def test_count_terms_per_period():
+    df = _catalog(["floral maxi", "floral midi", "denim"], dates=["2026-01-01", "2026-01-01", "2026-01-02"])
+    doc_counts, doc_totals = count_terms(df, "listed", ngram_range=(1, 1))
+    assert doc_totals == {"2026-01-01": 2, "2026-01-02": 1}
+    assert doc_counts["2026-01-01"]["floral"] == 2 and doc_counts["2026-01-02"] == {"cotton": 1, "denim": 1, "zara": 1}
+
+def test_incremental_refresh_matches_full_rebuild(tmp_path):
+    incremental_dir, full_dir = str(tmp_path / "incremental"), str(tmp_path / "full")
+    refresh_trends(FIRST, incremental_dir)
+    incremental = refresh_trends(pd.concat([FIRST, SECOND]), incremental_dir)
+    full = refresh_trends(pd.concat([FIRST, SECOND]), full_dir, full=True)
+
+    assert incremental["version"] == 2 and full["version"] == 1
+    assert incremental["state"]["doc_counts"] == full["state"]["doc_counts"]
+    assert incremental["trend_string"] == full["trend_string"]
+    assert "sequin gown" in full["trend_string"] and "zara" not in full["trend_string"]
+
+def test_versions_are_published_and_pruned(tmp_path):
+    trends_dir = str(tmp_path / "trends")
+    for i in range(KEEP_VERSIONS + 3):
+        refresh_trends(_catalog(["floral maxi"] * 3, start=10 * i), trends_dir)
+
+    assert load_trends(trends_dir)["version"] == KEEP_VERSIONS + 3
+    artifacts = sorted(name for name in os.listdir(trends_dir) if name.endswith(".pkl"))
+    assert len(artifacts) == KEEP_VERSIONS + 1 and artifacts[-1] == f"trends-{KEEP_VERSIONS + 3:06d}.pkl"
+    assert not [name for name in os.listdir(trends_dir) if name.endswith(".tmp")]
+    assert get_combined_trend_string(trends_dir=trends_dir) == load_trends(trends_dir)["trend_string"]
+
+def test_window_scores_recent_listings_against_older(tmp_path):
+    old = _catalog(["denim jacket"] * 6 + ["floral maxi"] * 6, dates=["2026-01-01"] * 12)
+    new = _catalog(["sequin gown"] * 4 + ["denim jacket"], start=12, dates=["2026-03-01"] * 5)
+    trends = refresh_trends(pd.concat([old, new]), str(tmp_path), date_column="listed", window_days=30)
+    top = trends["trend_string"].split(", ")[:3]
+    assert all("sequin" in term or "gown" in term for term in top)
+
+def test_snapshot_keeps_the_date_column_for_windows(tmp_path):
+    rows = make_catalog(16)
+    rows["description"] = ["denim jacket"] * 6 + ["floral maxi"] * 6 + ["sequin gown"] * 4
+    rows["listed"] = ["2026-01-01"] * 12 + ["2026-03-01"] * 4
+    rows.iloc[:8].to_csv(tmp_path / "dresses.csv", index=False)
+    rows.iloc[8:].to_csv(tmp_path / "jeans.csv", index=False)
+    snapshot = str(tmp_path / "catalog.parquet")
+    build_catalog_snapshot(str(tmp_path / "dresses.csv"), str(tmp_path / "jeans.csv"), snapshot, date_column="listed")
+
+    df = load_catalog_snapshot(snapshot, columns=CATALOG_COLUMNS + ["listed"])
+    trends = refresh_trends(df, str(tmp_path / "trends"), date_column="listed", window_days=30)
+    assert set(trends["state"]["doc_totals"]) == {"2026-01-01", "2026-03-01"}
+    assert all("sequin" in term or "gown" in term for term in trends["trend_string"].split(", ")[:3])
+
+def test_concurrent_refreshes_publish_distinct_versions(tmp_path):
+    trends_dir = str(tmp_path / "trends")
+    threads = [
+        threading.Thread(target=refresh_trends, args=(_catalog(["floral maxi"] * 3, start=10 * i), trends_dir))
+        for i in range(6)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    trends = load_trends(trends_dir)
+    assert trends["version"] == 6 and len(trends["state"]["seen_ids"]) == 18
+    assert not [name for name in os.listdir(trends_dir) if name.endswith(".tmp")]
+
+def test_only_one_scheduler_per_trends_dir(tmp_path):
+    trends_dir = str(tmp_path / "trends")
+    leader = schedule_trend_refresh(lambda: FIRST, interval=3600, trends_dir=trends_dir)
+    assert leader is not None and leader.is_alive()
+    assert schedule_trend_refresh(lambda: FIRST, interval=3600, trends_dir=trends_dir) is None
+    # A scheduler for another directory is independent
+    assert schedule_trend_refresh(lambda: FIRST, interval=3600, trends_dir=str(tmp_path / "other")) is not None
+
+def _wait_for_version(trends_dir: str, timeout: float = 10.0) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        trends = load_trends(trends_dir)
+        if trends is not None:
+            return trends
+        time.sleep(0.05)
+    return None
+
+def test_scheduler_refreshes_at_startup_unless_fresh(tmp_path):
+    # No published trends: the first refresh does not wait for the interval
+    trends_dir = str(tmp_path / "new")
+    schedule_trend_refresh(lambda: FIRST, interval=3600, trends_dir=trends_dir)
+    assert _wait_for_version(trends_dir)["version"] == 1
+
+    fresh_dir = str(tmp_path / "fresh")
+    refresh_trends(FIRST, fresh_dir)
+    schedule_trend_refresh(lambda: SECOND, interval=3600, trends_dir=fresh_dir)
+    time.sleep(0.3)
+    assert load_trends(fresh_dir)["version"] == 1
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+from Modules.catalog import Catalog
+from Modules.user_profile import UserProfileStore, summarize_user_preferences
+
+def _rows(brands: list, styles: list = None, start: int = 0) -> pd.DataFrame:
+    return pd.DataFrame({
+        "product_id": [f"p{start + i}" for i in range(len(brands))],
+        "brand": brands,
+        "style_attributes": styles or ["casual"] * len(brands),
+        "meta_info": [f"desc {start + i}" for i in range(len(brands))],
+    })
+
+@pytest.fixture
+def store(tmp_path):
+    return UserProfileStore(str(tmp_path / "profiles.db"), recent_size=3, taste_decay=0.5)
+
+def test_counts_are_incremental_and_ignore_repeats(store):
+    assert store.add_products("u", _rows(["Zara", "Aarong", "Zara"], ["casual", "formal", "formal"])) == 3
+    assert store.add_products("u", _rows(["Zara", "Yellow"], start=2)) == 1  # p2 already seen
+
+    assert store.top_values("u", "brand") == ["Zara", "Aarong", "Yellow"]
+    assert store.top_values("u", "style", top_k=1) == ["casual"]
+    assert store.product_ids("u") == ["p0", "p1", "p2", "p3"]
+    assert store.top_values("someone else", "brand") == []
+
+def test_recent_descriptions_are_a_ring_buffer(store):
+    store.add_products("u", _rows(["A", "B", "C", "D", "E"]))
+    assert store.recent_descriptions("u") == ["desc 4", "desc 3", "desc 2"]
+    assert store.recent_descriptions("u", limit=1) == ["desc 4"]
+    assert store.summarize("u", top_k=1) == ("A", "casual", "desc 4 desc 3")
+
+def test_taste_vector_is_a_decayed_centroid(store):
+    assert store.get_taste("u") is None
+    store.update_taste("u", np.array([[1.0, 0.0]]))
+    store.update_taste("u", np.array([[0.0, 1.0]]))
+    # weights after decay 0.5: older view 0.5, newer view 1
+    assert np.allclose(store.get_taste("u"), [1 / 3, 2 / 3], atol=1e-3)
+
+def test_profiles_persist_and_reset(tmp_path, store):
+    store.add_products("u", _rows(["Zara"]))
+    store.update_taste("u", np.ones((1, 4)))
+    reopened = UserProfileStore(str(tmp_path / "profiles.db"))
+    assert reopened.product_ids("u") == ["p0"] and reopened.get_taste("u") is not None
+
+    reopened.reset("u")
+    assert reopened.product_ids("u") == [] and reopened.get_taste("u") is None
+    assert reopened.summarize("u") == ("No Brands", "No Styles", "No Description")
+
+def test_summary_matches_between_store_and_history(store):
+    df = _rows(["Zara", "Aarong", "Yellow", "Aarong", "Zara"], ["casual", "formal", "boho", "formal", "casual"])
+    catalog = Catalog(df, df["product_id"].tolist())
+    # Repeat views and a history order unlike the catalog order
+    history = ["p2", "p4", "p0", "p4", "p1"]
+    store.add_products("u", catalog.get_rows(history, columns=None))
+
+    expected = ("Zara, Yellow, Aarong", "casual, boho, formal", "desc 1 desc 0 desc 4")
+    assert store.summarize("u", top_k=3) == expected
+    assert summarize_user_preferences("u", df, {"u": history}, top_k=3, store=store) == expected
+    assert summarize_user_preferences("u", df, {"u": history}, top_k=3, catalog=catalog)[:2] == expected[:2]
+    # recent_size=3 truncates the store's descriptions; the history has them all
+    assert summarize_user_preferences("u", df, {"u": history}, top_k=3)[2] == "desc 1 desc 0 desc 4 desc 2"
+    assert summarize_user_preferences("nobody", df, {}, store=store) == ("No Brands", "No Styles", "No Description")